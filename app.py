@@ -1,12 +1,56 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import (
     SQLALCHEMY_DATABASE_URI,
     SQLALCHEMY_TRACK_MODIFICATIONS,
     SWAGGER,
     GOOGLE_CLIENT_ID,
     GOOGLE_CLIENT_SECRET,
-    GOOGLE_DISCOVERY_URL
+    GOOGLE_DISCOVERY_URL,
+    AUDITORIA_COLA_MAX,
+    AUDITORIA_LOTE,
+    AUDITORIA_INTERVALO,
+    AUDITORIA_ESPERA,
+    BARRIDO_INTERVALO,
+    RESERVAS_REQUIERE_CHECKIN,
+    EXPORTACION_DIR,
+    EXPORTACION_LOTE,
+    JSON_RAPIDO,
+    COMPRESION_MINIMO,
+    COMPRESION_NIVEL_GZIP,
+    COMPRESION_BROTLI,
+    COMPRESION_NIVEL_BROTLI,
+    LIMITE_ACTIVO,
+    LIMITE_REDIS_URL,
+    LIMITE_FALLOS_UMBRAL,
+    LIMITE_BLOQUEO_BASE,
+    LIMITE_BLOQUEO_MAXIMO,
+    LIMITE_FALLOS_OLVIDO,
+    LIMITE_LOGIN_IP,
+    LIMITE_LOGIN_USUARIO,
+    LIMITE_BARRIDO,
+    PROXY_SALTOS,
+    CLAVES_METODO,
+    CLAVES_PROCESOS,
+    CLAVES_COLA,
+    CLAVES_ESPERA,
+    PLAZO_DEFECTO,
+    PLAZOS_RUTAS,
+    PRIORIDADES_RUTAS,
+    CARGA_MAX_EN_CURSO,
+    CARGA_ESPERA_POOL,
+    CARGA_POOL_TAMANO,
+    CARGA_POOL_DESBORDE,
+    CARGA_REINTENTO,
+    EVENTOS_LATIDO,
+    EVENTOS_HISTORIAL,
+    EVENTOS_COLA,
+    EVENTOS_MAX_CLIENTES,
+    CATALOGO_DIR,
+    CATALOGO_REVISION,
+    ASIGNACION_MIN_HUECO,
+    ESPERA_OFERTA_HORAS
 )
 from models import db
 from flasgger import Swagger
@@ -20,6 +64,23 @@ from routes.reportes_routes import reportes_bp
 from routes.servicios_routes import servicios_bp
 from routes.clientes_routes import clientes_bp
 from routes.tipo_habitacion_routes import tipo_habitacion_bp
+from routes.pagos_routes import pagos_bp
+from routes.exportaciones_routes import exportaciones_bp
+from routes.hoteles_routes import hoteles_bp
+from routes.eventos_routes import eventos_bp
+from routes.espera_routes import espera_bp
+from services.auditoria import init_auditoria
+from services.respuestas import init_respuestas
+from services.tenencia import init_tenencia
+from services.borrado import init_borrado
+from services.limites import init_limites
+from services.carga import init_carga
+from services.eventos import init_eventos
+from services.cambios import init_cambios
+from services.huespedes import init_huespedes
+from services.catalogo import init_catalogo
+from services.barrido import iniciar_planificador
+from commands import init_commands
 import os
 
 os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
@@ -34,6 +95,53 @@ def create_app():
     app.config['GOOGLE_CLIENT_ID'] = GOOGLE_CLIENT_ID
     app.config['GOOGLE_CLIENT_SECRET'] = GOOGLE_CLIENT_SECRET
     app.config['GOOGLE_DISCOVERY_URL'] = GOOGLE_DISCOVERY_URL
+    app.config['AUDITORIA_COLA_MAX'] = AUDITORIA_COLA_MAX
+    app.config['AUDITORIA_LOTE'] = AUDITORIA_LOTE
+    app.config['AUDITORIA_INTERVALO'] = AUDITORIA_INTERVALO
+    app.config['AUDITORIA_ESPERA'] = AUDITORIA_ESPERA
+    app.config['BARRIDO_INTERVALO'] = BARRIDO_INTERVALO
+    app.config['RESERVAS_REQUIERE_CHECKIN'] = RESERVAS_REQUIERE_CHECKIN
+    app.config['EXPORTACION_DIR'] = EXPORTACION_DIR
+    app.config['EXPORTACION_LOTE'] = EXPORTACION_LOTE
+    app.config['JSON_RAPIDO'] = JSON_RAPIDO
+    app.config['COMPRESION_MINIMO'] = COMPRESION_MINIMO
+    app.config['COMPRESION_NIVEL_GZIP'] = COMPRESION_NIVEL_GZIP
+    app.config['COMPRESION_BROTLI'] = COMPRESION_BROTLI
+    app.config['COMPRESION_NIVEL_BROTLI'] = COMPRESION_NIVEL_BROTLI
+    app.config['LIMITE_ACTIVO'] = LIMITE_ACTIVO
+    app.config['LIMITE_REDIS_URL'] = LIMITE_REDIS_URL
+    app.config['LIMITE_FALLOS_UMBRAL'] = LIMITE_FALLOS_UMBRAL
+    app.config['LIMITE_BLOQUEO_BASE'] = LIMITE_BLOQUEO_BASE
+    app.config['LIMITE_BLOQUEO_MAXIMO'] = LIMITE_BLOQUEO_MAXIMO
+    app.config['LIMITE_FALLOS_OLVIDO'] = LIMITE_FALLOS_OLVIDO
+    app.config['LIMITE_LOGIN_IP'] = LIMITE_LOGIN_IP
+    app.config['LIMITE_LOGIN_USUARIO'] = LIMITE_LOGIN_USUARIO
+    app.config['LIMITE_BARRIDO'] = LIMITE_BARRIDO
+    app.config['PROXY_SALTOS'] = PROXY_SALTOS
+    app.config['CLAVES_METODO'] = CLAVES_METODO
+    app.config['CLAVES_PROCESOS'] = CLAVES_PROCESOS
+    app.config['CLAVES_COLA'] = CLAVES_COLA
+    app.config['CLAVES_ESPERA'] = CLAVES_ESPERA
+    app.config['PLAZO_DEFECTO'] = PLAZO_DEFECTO
+    app.config['PLAZOS_RUTAS'] = PLAZOS_RUTAS
+    app.config['PRIORIDADES_RUTAS'] = PRIORIDADES_RUTAS
+    app.config['CARGA_MAX_EN_CURSO'] = CARGA_MAX_EN_CURSO
+    app.config['CARGA_REINTENTO'] = CARGA_REINTENTO
+    app.config['CARGA_POOL_DESBORDE'] = CARGA_POOL_DESBORDE
+    app.config['EVENTOS_LATIDO'] = EVENTOS_LATIDO
+    app.config['EVENTOS_HISTORIAL'] = EVENTOS_HISTORIAL
+    app.config['EVENTOS_COLA'] = EVENTOS_COLA
+    app.config['EVENTOS_MAX_CLIENTES'] = EVENTOS_MAX_CLIENTES
+    app.config['CATALOGO_DIR'] = CATALOGO_DIR
+    app.config['CATALOGO_REVISION'] = CATALOGO_REVISION
+    app.config['ASIGNACION_MIN_HUECO'] = ASIGNACION_MIN_HUECO
+    app.config['ESPERA_OFERTA_HORAS'] = ESPERA_OFERTA_HORAS
+    if SQLALCHEMY_DATABASE_URI.startswith('postgresql'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_timeout': CARGA_ESPERA_POOL,
+            'pool_size': CARGA_POOL_TAMANO,
+            'max_overflow': CARGA_POOL_DESBORDE
+        }
     app.config["FRONTEND_URL"] = "https://const-reservas-hotel-front-2025.vercel.app"
 
     # Permitir frontend
@@ -43,6 +151,11 @@ def create_app():
 
     # DESCOMENTAR LA SIGUIENTE LINEA PARA USAR EN LOCAL
     # CORS(app, origins=["http://localhost:5173"], supports_credentials=True)
+
+    # Detrás del proxy del despliegue remote_addr sería siempre el del proxy (límites por IP)
+    if app.config['PROXY_SALTOS'] > 0:
+        saltos = app.config['PROXY_SALTOS']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=saltos, x_proto=saltos, x_host=saltos)
     
 
     # Inicializa extensiones
@@ -52,6 +165,20 @@ def create_app():
     jwt = JWTManager(app)
 
     init_google_client(app)
+    init_tenencia(app)
+    init_borrado(app)
+    init_limites(app)
+    init_carga(app)
+    init_eventos(app)
+    init_cambios(app)
+    init_huespedes(app)
+    init_catalogo(app)
+    init_auditoria(app)
+    init_respuestas(app)
+    init_commands(app)
+
+    if app.config['BARRIDO_INTERVALO'] > 0:
+        iniciar_planificador(app, app.config['BARRIDO_INTERVALO'])
 
     # Registra rutas
     app.register_blueprint(auth_bp)
@@ -62,6 +189,11 @@ def create_app():
     app.register_blueprint(servicios_bp)
     app.register_blueprint(clientes_bp)
     app.register_blueprint(tipo_habitacion_bp)
+    app.register_blueprint(pagos_bp)
+    app.register_blueprint(exportaciones_bp)
+    app.register_blueprint(hoteles_bp)
+    app.register_blueprint(espera_bp)
+    app.register_blueprint(eventos_bp)
 
     @app.route('/')
     def home():
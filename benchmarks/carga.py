@@ -0,0 +1,303 @@
+"""Generador de carga: reproduce sesiones de reserva realistas contra un servidor local.
+
+Cada agente (hilo) inicia sesión y repite sesiones de cliente: busca
+``disponibles`` para una estancia, cotiza las habitaciones elegidas y,
+con cierta probabilidad, reserva, cambia de habitación y cancela. Las
+antelaciones siguen una Zipf (casi todo se reserva con poca antelación y
+queda una cola larga), las fechas de llegada una estacionalidad anual con
+más peso en fines de semana, y las duraciones otra Zipf.
+
+    python benchmarks/carga.py --url http://127.0.0.1:5000 --concurrencia 32 --duracion 120
+
+El límite de login por usuario (LIMITE_LOGIN_USUARIO) frena a muchos
+agentes con la misma cuenta: arranque el servidor con LIMITE_ACTIVO=false
+o reparta agentes entre varias cuentas con --usuario repetido.
+
+Al terminar informa por operación: peticiones, throughput, percentiles de
+latencia, errores (5xx y fallos de red), rechazos por carga (429/503/504),
+conflictos de edición (412) y la sobreventa que dejaron las reservas de
+la prueba según ``/api/reservas/conflictos``.
+"""
+import argparse
+import bisect
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+import requests
+
+RECHAZOS = (429, 503, 504)
+
+
+def zipf(n, s, inicio=0):
+    """Pesos acumulados de una Zipf sobre ``inicio .. inicio + n - 1``."""
+    return list(itertools.accumulate(1.0 / (k + 1) ** s for k in range(n))), inicio
+
+
+class Distribuciones:
+    def __init__(self, args, hoy):
+        self.hoy = hoy
+        self.pico = args.pico_estacion
+        self.amplitud = args.estacionalidad
+        self.fin_de_semana = args.fin_de_semana
+        self.antelacion = zipf(args.max_antelacion + 1, args.zipf_antelacion)
+        self.noches = zipf(args.max_noches, args.zipf_noches, inicio=1)
+        self.habitaciones = zipf(args.max_habitaciones, 2.0, inicio=1)
+
+    @staticmethod
+    def _elegir(rng, distribucion):
+        acumulados, inicio = distribucion
+        return inicio + bisect.bisect_left(acumulados, rng.random() * acumulados[-1])
+
+    def _peso_fecha(self, d):
+        estacion = 1 + self.amplitud * math.cos(2 * math.pi * (d.timetuple().tm_yday - self.pico) / 365.25)
+        return estacion * (self.fin_de_semana if d.weekday() >= 4 else 1.0)
+
+    def estancia(self, rng):
+        """(llegada, salida): antelación Zipf aceptada según el peso estacional de la fecha."""
+        maximo = (1 + self.amplitud) * max(self.fin_de_semana, 1.0)
+        while True:
+            llegada = self.hoy + timedelta(days=self._elegir(rng, self.antelacion))
+            if rng.random() * maximo <= self._peso_fecha(llegada):
+                break
+        return llegada, llegada + timedelta(days=self._elegir(rng, self.noches))
+
+    def cuantas_habitaciones(self, rng):
+        return self._elegir(rng, self.habitaciones)
+
+    def escoger(self, rng, opciones, n):
+        """Las primeras de la lista son las más buscadas: concentra la contención como en la realidad."""
+        elegidas = []
+        restantes = list(opciones)
+        while restantes and len(elegidas) < n:
+            pesos = [1.0 / (k + 1) for k in range(len(restantes))]
+            elegidas.append(restantes.pop(rng.choices(range(len(restantes)), weights=pesos)[0]))
+        return elegidas
+
+
+class Metricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = defaultdict(list)
+        self.estados = defaultdict(lambda: defaultdict(int))
+        self.reservas = []
+
+    def anotar(self, operacion, estado, segundos):
+        with self._lock:
+            self.latencias[operacion].append(segundos)
+            self.estados[operacion][estado] += 1
+
+    def reserva_creada(self, reserva_id):
+        with self._lock:
+            self.reservas.append(reserva_id)
+
+
+class Agente:
+    def __init__(self, n, args, dist, metricas, fin):
+        self.args = args
+        self.url = args.url.rstrip('/')
+        self.dist = dist
+        self.metricas = metricas
+        self.fin = fin
+        self.rng = random.Random(None if args.semilla is None else args.semilla + n)
+        self.http = requests.Session()
+        self.usuario = args.usuario[n % len(args.usuario)]
+
+    def pedir(self, operacion, metodo, ruta, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            resp = self.http.request(metodo, self.url + ruta, timeout=self.args.timeout, **kwargs)
+            estado = resp.status_code
+        except requests.RequestException:
+            resp, estado = None, 'red'
+        self.metricas.anotar(operacion, estado, time.perf_counter() - inicio)
+        return resp
+
+    def login(self):
+        resp = self.pedir('login', 'POST', '/api/auth/login',
+                          json={'username': self.usuario, 'password': self.args.password})
+        if resp is None or resp.status_code != 200:
+            return False
+        self.http.headers['Authorization'] = 'Bearer ' + resp.json()['token']
+        return True
+
+    def pausa(self):
+        if self.args.pausa > 0:
+            time.sleep(self.rng.expovariate(1 / self.args.pausa))
+
+    def sesion(self):
+        rng = self.rng
+        llegada, salida = self.dist.estancia(rng)
+        resp = self.pedir('disponibles', 'GET', '/api/habitaciones/disponibles',
+                          params={'start': llegada.isoformat(), 'end': salida.isoformat()})
+        if resp is None or resp.status_code == 401:
+            self.login()
+            return
+        if resp.status_code != 200 or not resp.json():
+            return
+
+        elegidas = self.dist.escoger(rng, resp.json(), self.dist.cuantas_habitaciones(rng))
+        self.pausa()
+        for h in elegidas:
+            self.pedir('cotizar', 'GET', f"/api/habitaciones/{h['id']}")
+        if rng.random() >= self.args.p_reservar:
+            return
+
+        self.pausa()
+        resp = self.pedir('reservar', 'POST', '/api/reservas/registrar', json={
+            'cliente_id': self.args.cliente,
+            'fecha_inicio': llegada.isoformat(),
+            'fecha_fin': salida.isoformat(),
+            'habitaciones': [h['id'] for h in elegidas]
+        })
+        if resp is None or resp.status_code != 201:
+            return
+        reserva_id = resp.json()['reserva_id']
+        self.metricas.reserva_creada(reserva_id)
+
+        if rng.random() < self.args.p_cambiar:
+            self.pausa()
+            actual = self.pedir('ver_reserva', 'GET', f'/api/reservas/{reserva_id}')
+            libres = self.pedir('disponibles', 'GET', '/api/habitaciones/disponibles',
+                                params={'start': llegada.isoformat(), 'end': salida.isoformat()})
+            if actual is not None and actual.status_code == 200 and libres is not None and libres.status_code == 200:
+                nuevas = self.dist.escoger(rng, libres.json(), len(elegidas))
+                if nuevas:
+                    self.pedir('cambiar', 'PUT', f'/api/reservas/{reserva_id}/habitaciones',
+                               json={'habitaciones': [h['id'] for h in nuevas]},
+                               headers={'If-Match': actual.headers.get('ETag', '*')})
+
+        if rng.random() < self.args.p_cancelar:
+            self.pausa()
+            self.pedir('cancelar', 'PUT', f'/api/reservas/{reserva_id}/cancelar')
+
+    def __call__(self):
+        if not self.login():
+            return
+        while time.monotonic() < self.fin:
+            self.sesion()
+            self.pausa()
+
+
+def percentil(ordenadas, p):
+    if not ordenadas:
+        return 0.0
+    return ordenadas[min(len(ordenadas) - 1, max(0, math.ceil(p / 100 * len(ordenadas)) - 1))]
+
+
+def resumen(metricas, segundos):
+    filas = {}
+    for operacion in sorted(metricas.latencias):
+        lat = sorted(metricas.latencias[operacion])
+        estados = metricas.estados[operacion]
+        n = len(lat)
+        errores = sum(c for e, c in estados.items() if e == 'red' or e >= 500 and e not in RECHAZOS)
+        filas[operacion] = {
+            'peticiones': n,
+            'rps': n / segundos,
+            'p50_ms': percentil(lat, 50) * 1000,
+            'p90_ms': percentil(lat, 90) * 1000,
+            'p99_ms': percentil(lat, 99) * 1000,
+            'max_ms': lat[-1] * 1000,
+            'errores': errores / n,
+            'rechazos': sum(estados.get(e, 0) for e in RECHAZOS) / n,
+            'conflictos': estados.get(412, 0) / n,
+            'estados': {str(e): c for e, c in sorted(estados.items(), key=lambda x: str(x[0]))},
+        }
+    return filas
+
+
+def sobreventa(args, reservas):
+    """Pares solapados en una habitación en los que participa alguna reserva de la prueba."""
+    http = requests.Session()
+    resp = http.post(args.url.rstrip('/') + '/api/auth/login',
+                     json={'username': args.usuario[0], 'password': args.password}, timeout=args.timeout)
+    if resp.status_code != 200:
+        return None
+    resp = http.get(args.url.rstrip('/') + '/api/reservas/conflictos', params={'limite': 100000},
+                    headers={'Authorization': 'Bearer ' + resp.json()['token']}, timeout=args.timeout * 10)
+    if resp.status_code != 200:
+        return None
+    propias = set(reservas)
+    return sum(1 for c in resp.json()['conflictos'] if {c['reserva_a'], c['reserva_b']} & propias)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--usuario', action='append', help='repetible; los agentes se reparten las cuentas')
+    parser.add_argument('--password', default='123456')
+    parser.add_argument('--cliente', type=int, default=1, help='cliente_id de las reservas')
+    parser.add_argument('--concurrencia', type=int, default=10, help='agentes simultáneos')
+    parser.add_argument('--duracion', type=float, default=60, help='segundos')
+    parser.add_argument('--rampa', type=float, default=5, help='segundos hasta arrancar todos los agentes')
+    parser.add_argument('--pausa', type=float, default=0.2, help='tiempo medio de reflexión entre pasos (s)')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--semilla', type=int)
+    parser.add_argument('--p-reservar', type=float, default=0.3)
+    parser.add_argument('--p-cambiar', type=float, default=0.15)
+    parser.add_argument('--p-cancelar', type=float, default=0.1)
+    parser.add_argument('--max-antelacion', type=int, default=365)
+    parser.add_argument('--zipf-antelacion', type=float, default=0.9)
+    parser.add_argument('--max-noches', type=int, default=14)
+    parser.add_argument('--zipf-noches', type=float, default=1.6)
+    parser.add_argument('--max-habitaciones', type=int, default=3)
+    parser.add_argument('--estacionalidad', type=float, default=0.5, help='amplitud (0 = sin estación)')
+    parser.add_argument('--pico-estacion', type=int, default=200, help='día del año de máxima demanda')
+    parser.add_argument('--fin-de-semana', type=float, default=1.4, help='peso de llegadas vie-dom')
+    parser.add_argument('--json', help='guarda el resumen en este fichero')
+    args = parser.parse_args()
+    args.usuario = args.usuario or ['admin']
+
+    dist = Distribuciones(args, date.today())
+    metricas = Metricas()
+    inicio = time.monotonic()
+    fin = inicio + args.rampa + args.duracion
+    hilos = []
+    for n in range(args.concurrencia):
+        hilo = threading.Thread(target=Agente(n, args, dist, metricas, fin), daemon=True)
+        hilo.start()
+        hilos.append(hilo)
+        if args.concurrencia > 1:
+            time.sleep(args.rampa / args.concurrencia)
+    for hilo in hilos:
+        hilo.join()
+    segundos = time.monotonic() - inicio
+
+    operaciones = resumen(metricas, segundos)
+    total = sum(o['peticiones'] for o in operaciones.values())
+    reservas = len(metricas.reservas)
+    solapes = sobreventa(args, metricas.reservas)
+
+    print(f"{'operación':<14}{'pet':>8}{'rps':>8}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}"
+          f"{'max ms':>9}{'error':>8}{'rechazo':>9}{'412':>7}")
+    for nombre, o in operaciones.items():
+        print(f"{nombre:<14}{o['peticiones']:>8}{o['rps']:>8.1f}{o['p50_ms']:>9.1f}{o['p90_ms']:>9.1f}"
+              f"{o['p99_ms']:>9.1f}{o['max_ms']:>9.1f}{o['errores']:>8.1%}{o['rechazos']:>9.1%}"
+              f"{o['conflictos']:>7.1%}")
+    print(f"\n{total} peticiones en {segundos:.1f}s ({total / segundos:.1f} rps) con {args.concurrencia} agentes")
+    print(f"reservas creadas: {reservas}")
+    if solapes is None:
+        print('sobreventa: no se pudo consultar /api/reservas/conflictos')
+    else:
+        print(f"sobreventa: {solapes} solapes ({solapes / reservas if reservas else 0:.1%} de las reservas)")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'segundos': segundos,
+                'concurrencia': args.concurrencia,
+                'peticiones': total,
+                'reservas': reservas,
+                'sobreventa': solapes,
+                'operaciones': operaciones
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""Compara el coste por fila de las lecturas ORM frente al modelo de lectura Core.
+
+Usa una base SQLite en memoria con datos sintéticos, así que se puede
+ejecutar sin Postgres:
+
+    python benchmarks/lecturas.py --reservas 20000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from models import db, Cliente, TipoHabitacion, Habitacion, Reserva, DetalleReserva
+from services import lecturas
+
+
+def crear_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    # listar_habitaciones lee del catálogo compartido (services.catalogo)
+    app.config['CATALOGO_DIR'] = tempfile.mkdtemp(prefix='catalogo-bench-')
+    db.init_app(app)
+    return app
+
+
+def poblar(n_reservas, n_habitaciones=500):
+    tipo = TipoHabitacion(nombre='Doble')
+    db.session.add(tipo)
+    db.session.flush()
+    db.session.execute(db.insert(Habitacion), [
+        {'numero': str(100 + i), 'tipo_id': tipo.id, 'precio': 100.0, 'estado': 'disponible'}
+        for i in range(n_habitaciones)
+    ])
+    db.session.execute(db.insert(Cliente), [
+        {'nombre': f'Cliente {i}', 'email': f'c{i}@example.com', 'dni': str(i)}
+        for i in range(n_reservas // 2)
+    ])
+    hoy = date.today()
+    db.session.execute(db.insert(Reserva), [
+        {'cliente_id': 1 + i % (n_reservas // 2), 'fecha_inicio': hoy + timedelta(days=i % 300),
+         'fecha_fin': hoy + timedelta(days=i % 300 + 3), 'estado': 'planificada', 'total': 300.0}
+        for i in range(n_reservas)
+    ])
+    db.session.execute(db.insert(DetalleReserva), [
+        {'reserva_id': 1 + i, 'habitacion_id': 1 + i % n_habitaciones, 'precio': 100.0}
+        for i in range(n_reservas)
+    ])
+    db.session.commit()
+
+
+# Réplica de la ruta anterior basada en entidades ORM
+def listar_reservas_orm():
+    return [{
+        "id": r.id,
+        "cliente": r.cliente.nombre if r.cliente else None,
+        "cliente_id": r.cliente_id,
+        "fecha_inicio": r.fecha_inicio.isoformat(),
+        "fecha_fin": r.fecha_fin.isoformat(),
+        "estado": r.estado,
+        "total": r.total,
+        "habitaciones": [
+            {"id": d.habitacion.id, "numero": d.habitacion.numero, "precio": d.precio}
+            for d in r.detalles
+        ]
+    } for r in Reserva.query.all()]
+
+
+def listar_clientes_orm():
+    return [{
+        "id": c.id, "nombre": c.nombre, "email": c.email, "telefono": c.telefono, "dni": c.dni
+    } for c in Cliente.query.all()]
+
+
+def listar_habitaciones_orm():
+    return [{
+        "id": h.id, "numero": h.numero, "tipo_id": h.tipo_id,
+        "tipo": h.tipo.nombre if h.tipo else None, "precio": h.precio, "estado": h.estado
+    } for h in Habitacion.query.filter(Habitacion.estado != "inactivo").all()]
+
+
+def medir(funcion, repeticiones):
+    mejor = None
+    filas = 0
+    for _ in range(repeticiones):
+        db.session.expunge_all()
+        inicio = time.perf_counter()
+        filas = len(funcion())
+        transcurrido = time.perf_counter() - inicio
+        mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+    return mejor, filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reservas', type=int, default=20000)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    app = crear_app()
+    with app.app_context():
+        db.create_all()
+        poblar(args.reservas)
+
+        casos = [
+            ('listar_reservas', listar_reservas_orm, lecturas.listar_reservas),
+            ('listar_clientes', listar_clientes_orm, lecturas.listar_clientes),
+            ('listar_habitaciones', listar_habitaciones_orm, lecturas.listar_habitaciones),
+        ]
+        print(f"{'ruta':<22}{'filas':>8}{'ORM us/fila':>14}{'Core us/fila':>14}{'mejora':>9}")
+        for nombre, orm, core in casos:
+            t_orm, filas = medir(orm, args.repeticiones)
+            t_core, _ = medir(core, args.repeticiones)
+            print(f"{nombre:<22}{filas:>8}{t_orm / filas * 1e6:>14.2f}"
+                  f"{t_core / filas * 1e6:>14.2f}{t_orm / t_core:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
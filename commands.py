@@ -0,0 +1,171 @@
+import click
+from flask.cli import with_appcontext
+from datetime import datetime, date, timedelta
+from flask import current_app
+from services.pagos import conciliar_saldos
+from services.barrido import barrer_estados
+from services.conflictos import detectar_conflictos
+from services.exportacion import exportar, formatos_disponibles
+from services.particiones import crear_particiones
+from services.archivo import archivar_reservas
+from services.cambios import compactar_cambios
+from services.huespedes import reconstruir as reconstruir_resumen_clientes
+from services.asignacion import reoptimizar
+from services.espera import depurar as depurar_lista_espera
+from services.tenencia import comprobar_aislamiento
+
+
+@click.command('conciliar-pagos')
+@with_appcontext
+def conciliar_pagos_command():
+    """Recalcula pagado/saldo de todas las reservas a partir de pagos."""
+    corregidas = conciliar_saldos()
+    click.echo(f"Reservas corregidas: {corregidas}")
+
+
+@click.command('barrer-estados')
+@click.option('--fecha', help='Fecha de referencia YYYY-MM-DD (por defecto hoy)')
+@with_appcontext
+def barrer_estados_command(fecha):
+    """Avanza estados de reservas y habitaciones según la fecha."""
+    hoy = datetime.strptime(fecha, '%Y-%m-%d').date() if fecha else None
+    conteos = barrer_estados(hoy, current_app.config.get('RESERVAS_REQUIERE_CHECKIN', False))
+    for clave, cantidad in conteos.items():
+        click.echo(f"{clave}: {cantidad}")
+
+
+@click.command('detectar-conflictos')
+@click.option('--lote', default=1000, show_default=True, help='Filas por lote del cursor')
+@with_appcontext
+def detectar_conflictos_command(lote):
+    """Lista las reservas solapadas en una misma habitación."""
+    total = 0
+    for c in detectar_conflictos(lote):
+        total += 1
+        click.echo(
+            f"habitacion={c['habitacion_id']} reservas={c['reserva_a']},{c['reserva_b']} "
+            f"{c['desde']}..{c['hasta']}"
+        )
+    click.echo(f"Conflictos: {total}")
+
+
+@click.command('exportar-analitica')
+@click.option('--salida', required=True, type=click.Path(file_okay=False), help='Carpeta destino')
+@click.option('--formato', type=click.Choice(['parquet', 'arrow', 'npz']), help='Por defecto el mejor disponible')
+@click.option('--lote', default=10000, show_default=True, help='Filas por lote del cursor')
+@with_appcontext
+def exportar_analitica_command(salida, formato, lote):
+    """Exporta reservas, detalles y pagos en formato columnar."""
+    if formato and formato not in formatos_disponibles():
+        raise click.ClickException(f"Formato no disponible: {formato}")
+    try:
+        resultado = exportar(salida, formato, lote)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    for tabla, (ruta, filas) in resultado.items():
+        click.echo(f"{tabla}: {filas} filas -> {ruta}")
+
+
+@click.command('crear-particiones')
+@click.option('--meses', default=12, show_default=True, help='Meses por delante a cubrir')
+@with_appcontext
+def crear_particiones_command(meses):
+    """Crea las particiones mensuales que falten (solo Postgres)."""
+    creadas = crear_particiones(meses)
+    for nombre in creadas:
+        click.echo(f"Creada {nombre}")
+    click.echo(f"Particiones creadas: {len(creadas)}")
+
+
+@click.command('archivar-reservas')
+@click.option('--antes', help='Fecha de corte YYYY-MM-DD (por defecto, hace 3 años)')
+@with_appcontext
+def archivar_reservas_command(antes):
+    """Mueve a archivo_reservas las reservas terminadas antes del corte."""
+    if antes:
+        corte = datetime.strptime(antes, '%Y-%m-%d').date()
+    else:
+        hoy = date.today()
+        corte = date(hoy.year - 3, hoy.month, 1)
+    total = 0
+    for hotel_id, periodo, cantidad in archivar_reservas(corte):
+        total += cantidad
+        click.echo(f"hotel={hotel_id} {periodo:%Y-%m}: {cantidad} reservas")
+    click.echo(f"Reservas archivadas: {total}")
+
+
+@click.command('compactar-cambios')
+@with_appcontext
+def compactar_cambios_command():
+    """Deja en cambios solo la última entrada de cada reserva/habitación."""
+    borradas = compactar_cambios()
+    click.echo(f"Entradas compactadas: {borradas}")
+
+
+@click.command('reconstruir-resumen-clientes')
+@with_appcontext
+def reconstruir_resumen_clientes_command():
+    """Recalcula resumen_clientes entero desde reservas, detalles, servicios y pagos."""
+    total = reconstruir_resumen_clientes()
+    click.echo(f"Clientes con resumen: {total}")
+
+
+@click.command('reoptimizar-asignaciones')
+@click.option('--desde', help='Inicio de la ventana YYYY-MM-DD (por defecto mañana)')
+@click.option('--hasta', required=True, help='Fin de la ventana YYYY-MM-DD (exclusivo)')
+@click.option('--hotel', type=int, help='Solo este hotel')
+@click.option('--simular', is_flag=True, help='Calcula el resultado sin mover nada')
+@with_appcontext
+def reoptimizar_asignaciones_command(desde, hasta, hotel, simular):
+    """Recoloca las estancias futuras no fijadas para dejar menos huecos invendibles."""
+    desde = datetime.strptime(desde, '%Y-%m-%d').date() if desde else date.today() + timedelta(days=1)
+    hasta = datetime.strptime(hasta, '%Y-%m-%d').date()
+    if hasta <= desde:
+        raise click.ClickException('--hasta debe ser posterior a --desde')
+
+    movidas = 0
+    for t in reoptimizar(desde, hasta, hotel, aplicar=not simular):
+        movidas += t['movidas']
+        click.echo(
+            f"hotel={t['hotel_id']} tipo={t['tipo_id']} habitaciones={t['habitaciones']} "
+            f"movibles={t['movibles']} movidas={t['movidas']} "
+            f"huecos={t['huecos_antes']}->{t['huecos_despues']}"
+        )
+    click.echo(f"Estancias {'a mover' if simular else 'movidas'}: {movidas}")
+
+
+@click.command('depurar-lista-espera')
+@with_appcontext
+def depurar_lista_espera_command():
+    """Caduca entradas y ofertas vencidas de la lista de espera y reofrece lo que quede libre."""
+    r = depurar_lista_espera()
+    click.echo(
+        f"Entradas caducadas: {r['caducadas']}, ofertas vencidas: {r['ofertas_vencidas']}, "
+        f"nuevas ofertas: {r['ofrecidas']}"
+    )
+
+
+@click.command('comprobar-tenencia')
+@with_appcontext
+def comprobar_tenencia_command():
+    """Comprueba en la base configurada que cada hotel solo ve sus filas (no deja datos)."""
+    fallos = comprobar_aislamiento()
+    for fallo in fallos:
+        click.echo(fallo)
+    if fallos:
+        raise click.ClickException(f'{len(fallos)} fallos de aislamiento')
+    click.echo('Aislamiento entre hoteles correcto')
+
+
+def init_commands(app):
+    app.cli.add_command(conciliar_pagos_command)
+    app.cli.add_command(barrer_estados_command)
+    app.cli.add_command(detectar_conflictos_command)
+    app.cli.add_command(exportar_analitica_command)
+    app.cli.add_command(crear_particiones_command)
+    app.cli.add_command(archivar_reservas_command)
+    app.cli.add_command(compactar_cambios_command)
+    app.cli.add_command(reconstruir_resumen_clientes_command)
+    app.cli.add_command(reoptimizar_asignaciones_command)
+    app.cli.add_command(depurar_lista_espera_command)
+    app.cli.add_command(comprobar_tenencia_command)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,13 +12,84 @@ POSTGRES = {
     'port': os.getenv('DB_PORT', '5432'),
 }
 
-SQLALCHEMY_DATABASE_URI = (
+# DATABASE_URL (p. ej. sqlite:///local.db o un Postgres local sin SSL) manda sobre DB_*
+SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL') or (
     f"postgresql://{POSTGRES['user']}:{POSTGRES['pw']}"
     f"@{POSTGRES['host']}:{POSTGRES['port']}/{POSTGRES['db']}?sslmode=require"
 )
+# SQLAlchemy 2 ya no acepta el esquema abreviado postgres://
+if SQLALCHEMY_DATABASE_URI.startswith('postgres://'):
+    SQLALCHEMY_DATABASE_URI = 'postgresql://' + SQLALCHEMY_DATABASE_URI[len('postgres://'):]
 
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+# Auditoría (historial_acceso)
+AUDITORIA_COLA_MAX = int(os.getenv('AUDITORIA_COLA_MAX', '10000'))
+AUDITORIA_LOTE = int(os.getenv('AUDITORIA_LOTE', '500'))
+AUDITORIA_INTERVALO = float(os.getenv('AUDITORIA_INTERVALO', '1.0'))
+AUDITORIA_ESPERA = float(os.getenv('AUDITORIA_ESPERA', '0.05'))
+
+# Barrido de estados de reservas/habitaciones (0 = desactivado en proceso)
+BARRIDO_INTERVALO = int(os.getenv('BARRIDO_INTERVALO', '0'))
+RESERVAS_REQUIERE_CHECKIN = os.getenv('RESERVAS_REQUIERE_CHECKIN', 'false').lower() == 'true'
+
+# Exportación columnar para BI
+EXPORTACION_DIR = os.getenv('EXPORTACION_DIR', os.path.join(tempfile.gettempdir(), 'hotel_exportaciones'))
+EXPORTACION_LOTE = int(os.getenv('EXPORTACION_LOTE', '10000'))
+
+# Serialización JSON y compresión de respuestas
+JSON_RAPIDO = os.getenv('JSON_RAPIDO', 'true').lower() == 'true'
+COMPRESION_MINIMO = int(os.getenv('COMPRESION_MINIMO', '1024'))  # bytes; 0 = sin compresión
+COMPRESION_NIVEL_GZIP = int(os.getenv('COMPRESION_NIVEL_GZIP', '5'))
+COMPRESION_BROTLI = os.getenv('COMPRESION_BROTLI', 'true').lower() == 'true'
+COMPRESION_NIVEL_BROTLI = int(os.getenv('COMPRESION_NIVEL_BROTLI', '4'))
+
+# Límite de intentos (cubetas de tokens) y bloqueo progresivo
+LIMITE_ACTIVO = os.getenv('LIMITE_ACTIVO', 'true').lower() == 'true'
+LIMITE_REDIS_URL = os.getenv('LIMITE_REDIS_URL')  # vacío = en memoria del proceso
+LIMITE_LOGIN_IP = int(os.getenv('LIMITE_LOGIN_IP', '20'))  # intentos por minuto
+LIMITE_LOGIN_USUARIO = int(os.getenv('LIMITE_LOGIN_USUARIO', '5'))
+LIMITE_FALLOS_UMBRAL = int(os.getenv('LIMITE_FALLOS_UMBRAL', '5'))
+LIMITE_BLOQUEO_BASE = int(os.getenv('LIMITE_BLOQUEO_BASE', '30'))  # segundos
+LIMITE_BLOQUEO_MAXIMO = int(os.getenv('LIMITE_BLOQUEO_MAXIMO', '3600'))
+LIMITE_FALLOS_OLVIDO = int(os.getenv('LIMITE_FALLOS_OLVIDO', '900'))
+LIMITE_BARRIDO = int(os.getenv('LIMITE_BARRIDO', '60'))  # segundos entre purgas de claves inactivas (en memoria)
+# Proxies de confianza delante de la app (X-Forwarded-For); 0 = conexión directa
+PROXY_SALTOS = int(os.getenv('PROXY_SALTOS', '0'))
+
+# Hashing de contraseñas (formato de método de werkzeug; 0 procesos = en línea)
+CLAVES_METODO = os.getenv('CLAVES_METODO', 'scrypt:32768:8:1')
+CLAVES_PROCESOS = int(os.getenv('CLAVES_PROCESOS', '2'))
+CLAVES_COLA = int(os.getenv('CLAVES_COLA', '32'))
+CLAVES_ESPERA = float(os.getenv('CLAVES_ESPERA', '2.0'))  # segundos esperando cupo
+
+# Plazos por ruta y control de admisión (0 = desactivado)
+PLAZO_DEFECTO = float(os.getenv('PLAZO_DEFECTO', '0'))  # segundos
+PLAZOS_RUTAS = os.getenv('PLAZOS_RUTAS', 'reportes_bp=10,reservas_bp.listar_reservas=5')
+PRIORIDADES_RUTAS = os.getenv('PRIORIDADES_RUTAS', 'reportes_bp=baja,exportaciones_bp=baja')
+CARGA_MAX_EN_CURSO = int(os.getenv('CARGA_MAX_EN_CURSO', '64'))  # por proceso
+CARGA_ESPERA_POOL = float(os.getenv('CARGA_ESPERA_POOL', '2'))  # segundos esperando conexión
+CARGA_POOL_TAMANO = int(os.getenv('CARGA_POOL_TAMANO', '5'))  # conexiones fijas del pool (Postgres)
+CARGA_POOL_DESBORDE = int(os.getenv('CARGA_POOL_DESBORDE', '10'))  # conexiones extra (max_overflow)
+CARGA_REINTENTO = int(os.getenv('CARGA_REINTENTO', '1'))  # Retry-After
+
+# Feed SSE de disponibilidad
+EVENTOS_LATIDO = int(os.getenv('EVENTOS_LATIDO', '15'))  # segundos entre latidos
+EVENTOS_HISTORIAL = int(os.getenv('EVENTOS_HISTORIAL', '1000'))  # eventos para reanudar
+EVENTOS_COLA = int(os.getenv('EVENTOS_COLA', '100'))  # pendientes por cliente antes de cortarlo
+# Clientes SSE por proceso (0 = sin tope). Cada uno ocupa un hilo o greenlet del worker
+EVENTOS_MAX_CLIENTES = int(os.getenv('EVENTOS_MAX_CLIENTES', '200'))
+
+# Catálogo de habitaciones compartido por mmap entre workers
+CATALOGO_DIR = os.getenv('CATALOGO_DIR', os.path.join(tempfile.gettempdir(), 'hotel_catalogo'))
+CATALOGO_REVISION = float(os.getenv('CATALOGO_REVISION', '2'))  # segundos entre consultas de versión
+
+# Asignación automática de habitaciones: huecos más cortos que esto (noches) no se venden
+ASIGNACION_MIN_HUECO = int(os.getenv('ASIGNACION_MIN_HUECO', '2'))
+
+# Lista de espera: horas que el cliente tiene para confirmar una oferta
+ESPERA_OFERTA_HORAS = float(os.getenv('ESPERA_OFERTA_HORAS', '24'))
+
 # Swagger
 SWAGGER = {
     'title': 'API Hotel - Sistema de Reservas',
@@ -0,0 +1,252 @@
+"""esquema base: tablas originales, hoteles, hotel_id, versiones y saldos de reservas
+
+Revision ID: 0b8d3f5a1c26
+Revises:
+Create Date: 2026-10-19 11:00:00.000000
+
+Primera revisión de la serie. Crea las tablas del esquema original (el que
+hacía seed.py con db.create_all()) si no existen y le añade lo que las
+revisiones siguientes ya dan por hecho:
+
+- ``hoteles`` y ``hotel_id`` en usuarios y en las tablas por hotel (las filas
+  existentes quedan con NULL = del grupo); habitaciones.numero pasa a ser
+  único por hotel.
+- ``version`` en clientes, habitaciones, reservas y servicios (ETag/If-Match).
+- ``pagado``/``saldo`` en reservas, calculados con los pagos existentes, y
+  ``tipo`` en pagos.
+
+Los índices de pagos los crea 3f1c9a7d2b10 al particionarla.
+
+Como las demás, solo aplica cambios en Postgres. Cada paso comprueba el
+estado actual, así que sirve igual para una base vacía, para una creada con
+el esquema original y para una creada ya con db.create_all().
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b8d3f5a1c26'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Tablas con hotel_id (HotelMixin), en orden de dependencias
+POR_HOTEL = (
+    'tipos_habitacion', 'habitaciones', 'reservas', 'detalles_reserva',
+    'servicios', 'reserva_servicio', 'pagos',
+)
+CON_VERSION = ('clientes', 'habitaciones', 'reservas', 'servicios')
+INDICES = (
+    ('ix_reservas_hotel_fechas', 'reservas', ['hotel_id', 'fecha_inicio', 'fecha_fin'], None),
+    ('ix_reservas_saldo_pendiente', 'reservas', ['saldo'], 'saldo > 0'),
+    ('ix_detalles_reserva_hotel_habitacion', 'detalles_reserva', ['hotel_id', 'habitacion_id'], None),
+)
+
+
+def _es_postgres():
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def _columnas(bind, tabla):
+    return {c['name'] for c in sa.inspect(bind).get_columns(tabla)}
+
+
+def _esquema_original(existentes):
+    """Tablas tal como las creaba el esquema original, en orden de dependencias."""
+    tablas = (
+        ('roles', (
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('nombre', sa.String(80), unique=True, nullable=False),
+        )),
+        ('permisos', (
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('nombre', sa.String(120), unique=True, nullable=False),
+        )),
+        ('roles_permisos', (
+            sa.Column('role_id', sa.Integer(), sa.ForeignKey('roles.id'), primary_key=True),
+            sa.Column('permiso_id', sa.Integer(), sa.ForeignKey('permisos.id'), primary_key=True),
+        )),
+        ('usuarios', (
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('username', sa.String(80), unique=True, nullable=False),
+            sa.Column('nombre', sa.String(120)),
+            sa.Column('email', sa.String(120), unique=True),
+            sa.Column('password_hash', sa.String(255)),
+            sa.Column('role_id', sa.Integer(), sa.ForeignKey('roles.id')),
+        )),
+        ('clientes', (
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('nombre', sa.String(120)),
+            sa.Column('email', sa.String(120), unique=True),
+            sa.Column('telefono', sa.String(30)),
+            sa.Column('dni', sa.String(20), unique=True),
+        )),
+        ('puestos_trabajo', (
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('nombre', sa.String(120)),
+        )),
+        ('empleados', (
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('nombre', sa.String(120)),
+            sa.Column('puesto_id', sa.Integer(), sa.ForeignKey('puestos_trabajo.id')),
+        )),
+        ('tipos_habitacion', (
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('nombre', sa.String(80)),
+            sa.Column('descripcion', sa.String(255)),
+            sa.Column('activo', sa.Boolean(), nullable=False),
+        )),
+        ('habitaciones', (
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('numero', sa.String(20), unique=True),
+            sa.Column('tipo_id', sa.Integer(), sa.ForeignKey('tipos_habitacion.id')),
+            sa.Column('precio', sa.Float()),
+            sa.Column('estado', sa.String(30)),
+        )),
+        ('reservas', (
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('cliente_id', sa.Integer(), sa.ForeignKey('clientes.id')),
+            sa.Column('fecha_inicio', sa.Date()),
+            sa.Column('fecha_fin', sa.Date()),
+            sa.Column('estado', sa.String(30)),
+            sa.Column('total', sa.Float()),
+        )),
+        ('detalles_reserva', (
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('reserva_id', sa.Integer(), sa.ForeignKey('reservas.id')),
+            sa.Column('habitacion_id', sa.Integer(), sa.ForeignKey('habitaciones.id')),
+            sa.Column('precio', sa.Float()),
+        )),
+        ('servicios', (
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('nombre', sa.String(120)),
+            sa.Column('precio', sa.Float()),
+        )),
+        ('reserva_servicio', (
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('reserva_id', sa.Integer(), sa.ForeignKey('reservas.id')),
+            sa.Column('servicio_id', sa.Integer(), sa.ForeignKey('servicios.id')),
+            sa.Column('cantidad', sa.Integer()),
+        )),
+        ('pagos', (
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('reserva_id', sa.Integer(), sa.ForeignKey('reservas.id'), nullable=True),
+            sa.Column('monto', sa.Float(), nullable=False),
+            sa.Column('metodo', sa.String(50)),
+            sa.Column('fecha', sa.DateTime()),
+        )),
+        ('facturas', (
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('reserva_id', sa.Integer(), sa.ForeignKey('reservas.id')),
+            sa.Column('total', sa.Float()),
+            sa.Column('fecha', sa.DateTime()),
+        )),
+        ('checkins', (
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('reserva_id', sa.Integer(), sa.ForeignKey('reservas.id')),
+            sa.Column('fecha', sa.DateTime()),
+            sa.Column('empleado_id', sa.Integer(), sa.ForeignKey('empleados.id')),
+        )),
+        ('checkouts', (
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('reserva_id', sa.Integer(), sa.ForeignKey('reservas.id')),
+            sa.Column('fecha', sa.DateTime()),
+            sa.Column('empleado_id', sa.Integer(), sa.ForeignKey('empleados.id')),
+        )),
+        ('historial_acceso', (
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('usuario', sa.String(120)),
+            sa.Column('accion', sa.String(255)),
+            sa.Column('fecha', sa.DateTime()),
+        )),
+    )
+    for nombre, columnas in tablas:
+        if nombre not in existentes:
+            op.create_table(nombre, *columnas)
+
+
+def upgrade():
+    if not _es_postgres():
+        return
+    bind = op.get_bind()
+
+    existentes = set(sa.inspect(bind).get_table_names())
+    _esquema_original(existentes)
+
+    # --- hoteles y hotel_id ---
+    if 'hoteles' not in existentes:
+        op.create_table(
+            'hoteles',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('codigo', sa.String(30), unique=True, nullable=False),
+            sa.Column('nombre', sa.String(120), nullable=False),
+            sa.Column('activo', sa.Boolean(), nullable=False, server_default=sa.true()),
+        )
+    if 'hotel_id' not in _columnas(bind, 'usuarios'):
+        # None = usuario del grupo: los que ya existían lo siguen siendo
+        op.add_column('usuarios', sa.Column(
+            'hotel_id', sa.Integer(), sa.ForeignKey('hoteles.id', name='usuarios_hotel_id_fkey')
+        ))
+    for tabla in POR_HOTEL:
+        if 'hotel_id' in _columnas(bind, tabla):
+            continue
+        op.add_column(tabla, sa.Column(
+            'hotel_id', sa.Integer(), sa.ForeignKey('hoteles.id', name=f'{tabla}_hotel_id_fkey')
+        ))
+        if tabla != 'pagos':
+            op.create_index(f'ix_{tabla}_hotel_id', tabla, ['hotel_id'])
+
+    inspector = sa.inspect(bind)
+    for restriccion in inspector.get_unique_constraints('habitaciones'):
+        if restriccion['column_names'] == ['numero']:
+            op.drop_constraint(restriccion['name'], 'habitaciones', type_='unique')
+    if not any(r['name'] == 'uq_habitaciones_hotel_numero' for r in inspector.get_unique_constraints('habitaciones')):
+        op.create_unique_constraint('uq_habitaciones_hotel_numero', 'habitaciones', ['hotel_id', 'numero'])
+
+    # --- versiones de fila ---
+    for tabla in CON_VERSION:
+        if 'version' not in _columnas(bind, tabla):
+            op.add_column(tabla, sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+    # --- pagos.tipo y saldos denormalizados ---
+    if 'tipo' not in _columnas(bind, 'pagos'):
+        op.add_column('pagos', sa.Column('tipo', sa.String(20), server_default='pago'))
+    columnas = _columnas(bind, 'reservas')
+    if 'pagado' not in columnas or 'saldo' not in columnas:
+        for columna in ('pagado', 'saldo'):
+            if columna not in columnas:
+                op.add_column('reservas', sa.Column(columna, sa.Float(), nullable=False, server_default='0'))
+        # Mismo cálculo que services.pagos.conciliar_saldos
+        op.execute(
+            "UPDATE reservas r SET pagado = p.pagado, saldo = coalesce(r.total, 0) - p.pagado "
+            "FROM (SELECT r2.id, coalesce(sum(pg.monto), 0) AS pagado "
+            "      FROM reservas r2 LEFT JOIN pagos pg ON pg.reserva_id = r2.id GROUP BY r2.id) p "
+            "WHERE p.id = r.id"
+        )
+
+    for nombre, tabla, columnas, donde in INDICES:
+        filtro = f" WHERE {donde}" if donde else ''
+        op.execute(f"CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} ({', '.join(columnas)}){filtro}")
+
+
+def downgrade():
+    if not _es_postgres():
+        return
+    # Quita lo añadido sobre el esquema original; las tablas originales se quedan
+    for nombre, _, _, _ in INDICES:
+        op.execute(f"DROP INDEX IF EXISTS {nombre}")
+    op.drop_column('reservas', 'saldo')
+    op.drop_column('reservas', 'pagado')
+    op.drop_column('pagos', 'tipo')
+    for tabla in CON_VERSION:
+        op.drop_column(tabla, 'version')
+
+    # Falla si dos hoteles repiten número de habitación: hay que renumerar antes de bajar
+    op.drop_constraint('uq_habitaciones_hotel_numero', 'habitaciones', type_='unique')
+    op.create_unique_constraint('habitaciones_numero_key', 'habitaciones', ['numero'])
+    for tabla in reversed(POR_HOTEL):
+        op.execute(f"DROP INDEX IF EXISTS ix_{tabla}_hotel_id")
+        op.drop_column(tabla, 'hotel_id')
+    op.drop_column('usuarios', 'hotel_id')
+    op.drop_table('hoteles')
@@ -0,0 +1,128 @@
+"""particionar pagos por mes, BRIN en reservas y tabla archivo_reservas
+
+Revision ID: 3f1c9a7d2b10
+Revises: 0b8d3f5a1c26
+Create Date: 2026-10-19 12:00:00.000000
+
+Parte del esquema que deja 0b8d3f5a1c26 (o db.create_all() en seed.py).
+Solo aplica cambios en Postgres: en otros motores no hace nada.
+
+reservas no se particiona: detalles_reserva, pagos, facturas, checkins y
+checkouts la referencian por id, y una FK hacia una tabla particionada exige
+que la clave de partición forme parte de la clave referenciada. En su lugar
+se añade un índice BRIN por fechas (barato y casi tan selectivo en una tabla
+que crece en orden de fechas) y el archivado mueve los periodos cerrados.
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a7d2b10'
+down_revision = '0b8d3f5a1c26'
+branch_labels = None
+depends_on = None
+
+MESES_ADELANTE = 12
+
+
+def _mes_siguiente(d):
+    return date(d.year + (d.month == 12), d.month % 12 + 1, 1)
+
+
+def _es_postgres():
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def _esta_particionada(bind, tabla):
+    return bind.execute(
+        sa.text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:t)"),
+        {'t': tabla}
+    ).scalar() is not None
+
+
+def upgrade():
+    if not _es_postgres():
+        return
+    bind = op.get_bind()
+
+    if 'archivo_reservas' not in sa.inspect(bind).get_table_names():
+        op.create_table(
+            'archivo_reservas',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('hotel_id', sa.Integer(), sa.ForeignKey('hoteles.id'), index=True),
+            sa.Column('periodo', sa.Date(), nullable=False),
+            sa.Column('reservas', sa.Integer(), nullable=False),
+            sa.Column('datos', sa.LargeBinary(), nullable=False),
+            sa.Column('fecha', sa.DateTime()),
+        )
+        op.create_index('ix_archivo_reservas_hotel_periodo', 'archivo_reservas', ['hotel_id', 'periodo'])
+
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_reservas_fechas_brin "
+        "ON reservas USING brin (fecha_inicio, fecha_fin)"
+    )
+
+    if _esta_particionada(bind, 'pagos'):
+        return
+
+    # --- pagos -> tabla particionada por RANGE(fecha) mensual ---
+    op.execute("UPDATE pagos SET fecha = now() WHERE fecha IS NULL")
+    op.execute("ALTER TABLE pagos RENAME TO pagos_legacy")
+    op.execute("ALTER SEQUENCE pagos_id_seq OWNED BY NONE")
+    op.execute(
+        "CREATE TABLE pagos (LIKE pagos_legacy INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (fecha)"
+    )
+    op.execute("ALTER TABLE pagos ALTER COLUMN fecha SET NOT NULL")
+
+    primero = bind.execute(sa.text("SELECT min(fecha)::date FROM pagos_legacy")).scalar()
+    mes = (primero or date.today()).replace(day=1)
+    fin = date.today().replace(day=1)
+    for _ in range(MESES_ADELANTE):
+        fin = _mes_siguiente(fin)
+    while mes < fin:
+        siguiente = _mes_siguiente(mes)
+        op.execute(
+            f"CREATE TABLE pagos_p{mes:%Y%m} PARTITION OF pagos "
+            f"FOR VALUES FROM ('{mes.isoformat()}') TO ('{siguiente.isoformat()}')"
+        )
+        mes = siguiente
+    op.execute("CREATE TABLE pagos_pdefault PARTITION OF pagos DEFAULT")
+
+    op.execute("INSERT INTO pagos SELECT * FROM pagos_legacy")
+    op.execute("DROP TABLE pagos_legacy")
+    op.execute("ALTER SEQUENCE pagos_id_seq OWNED BY pagos.id")
+
+    # La clave primaria de una tabla particionada debe incluir la clave de partición
+    op.execute("ALTER TABLE pagos ADD CONSTRAINT pagos_pkey PRIMARY KEY (id, fecha)")
+    op.create_foreign_key('pagos_reserva_id_fkey', 'pagos', 'reservas', ['reserva_id'], ['id'])
+    op.create_foreign_key('pagos_hotel_id_fkey', 'pagos', 'hoteles', ['hotel_id'], ['id'])
+    op.create_index('ix_pagos_hotel_id', 'pagos', ['hotel_id'])
+    op.create_index('ix_pagos_hotel_fecha', 'pagos', ['hotel_id', 'fecha'])
+    op.create_index('ix_pagos_reserva_id', 'pagos', ['reserva_id'])
+
+
+def downgrade():
+    if not _es_postgres():
+        return
+    bind = op.get_bind()
+
+    if _esta_particionada(bind, 'pagos'):
+        op.execute("ALTER TABLE pagos RENAME TO pagos_particionada")
+        op.execute("ALTER SEQUENCE pagos_id_seq OWNED BY NONE")
+        op.execute("CREATE TABLE pagos (LIKE pagos_particionada INCLUDING DEFAULTS)")
+        op.execute("INSERT INTO pagos SELECT * FROM pagos_particionada")
+        op.execute("DROP TABLE pagos_particionada CASCADE")
+        op.execute("ALTER SEQUENCE pagos_id_seq OWNED BY pagos.id")
+        op.execute("ALTER TABLE pagos ADD CONSTRAINT pagos_pkey PRIMARY KEY (id)")
+        op.create_foreign_key('pagos_reserva_id_fkey', 'pagos', 'reservas', ['reserva_id'], ['id'])
+        op.create_foreign_key('pagos_hotel_id_fkey', 'pagos', 'hoteles', ['hotel_id'], ['id'])
+        op.create_index('ix_pagos_hotel_id', 'pagos', ['hotel_id'])
+        op.create_index('ix_pagos_hotel_fecha', 'pagos', ['hotel_id', 'fecha'])
+
+    op.execute("DROP INDEX IF EXISTS ix_reservas_fechas_brin")
+    op.drop_index('ix_archivo_reservas_hotel_periodo', table_name='archivo_reservas')
+    op.drop_table('archivo_reservas')
@@ -0,0 +1,147 @@
+"""bajas lógicas reales: activo/deleted_at e índices únicos parciales
+
+Revision ID: a7e4c2d9f813
+Revises: 3f1c9a7d2b10
+Create Date: 2026-10-19 18:30:00.000000
+
+Hasta ahora desactivar un cliente reescribía email y DNI con el prefijo
+``inactivo_`` y desactivar un servicio añadía `` (inactivo)`` al nombre.
+Esta revisión añade ``activo``/``deleted_at`` a clientes, servicios y
+tipos_habitacion, convierte esos datos marcados (quitando las marcas) y
+cambia los UNIQUE de clientes.email/dni por índices únicos parciales sobre
+los activos.
+
+Como la anterior, solo aplica cambios en Postgres. Cada paso comprueba el
+estado actual, así que se puede relanzar sobre una base a medio migrar o
+creada ya con db.create_all().
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7e4c2d9f813'
+down_revision = '3f1c9a7d2b10'
+branch_labels = None
+depends_on = None
+
+PREFIJO = 'inactivo_'
+SUFIJO = ' (inactivo)'
+TABLAS = ('clientes', 'servicios', 'tipos_habitacion')
+INDICES = (
+    ('uq_clientes_email_activo', 'email'),
+    ('uq_clientes_dni_activo', 'dni'),
+)
+
+
+def _es_postgres():
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def _columnas(bind, tabla):
+    return {c['name'] for c in sa.inspect(bind).get_columns(tabla)}
+
+
+def _sin_prefijo(valor):
+    while valor and valor.startswith(PREFIJO):
+        valor = valor[len(PREFIJO):]
+    return valor
+
+
+def _sin_sufijo(valor):
+    while valor and valor.endswith(SUFIJO):
+        valor = valor[:-len(SUFIJO)]
+    return valor
+
+
+def upgrade():
+    if not _es_postgres():
+        return
+    bind = op.get_bind()
+
+    for tabla in TABLAS:
+        existentes = _columnas(bind, tabla)
+        if 'activo' not in existentes:
+            op.add_column(tabla, sa.Column('activo', sa.Boolean(), nullable=False, server_default=sa.true()))
+        else:
+            op.execute(f"UPDATE {tabla} SET activo = true WHERE activo IS NULL")
+            op.alter_column(tabla, 'activo', nullable=False, server_default=sa.true())
+        if 'deleted_at' not in existentes:
+            op.add_column(tabla, sa.Column('deleted_at', sa.DateTime()))
+
+    # Los UNIQUE completos se quitan antes de tocar datos: al quitar el prefijo,
+    # un inactivo puede quedar con el mismo email/DNI que otro cliente
+    inspector = sa.inspect(bind)
+    for restriccion in inspector.get_unique_constraints('clientes'):
+        if restriccion['column_names'] in (['email'], ['dni']):
+            op.drop_constraint(restriccion['name'], 'clientes', type_='unique')
+
+    # --- clientes: inactivo_<email> / inactivo_<dni> -> activo = false ---
+    marcados = bind.execute(sa.text(
+        "SELECT id, email, dni FROM clientes "
+        "WHERE email LIKE 'inactivo\\_%' OR dni LIKE 'inactivo\\_%'"
+    )).all()
+    for id, email, dni in marcados:
+        bind.execute(
+            sa.text("UPDATE clientes SET email = :email, dni = :dni, activo = false, "
+                    "deleted_at = coalesce(deleted_at, now()) WHERE id = :id"),
+            {'id': id, 'email': _sin_prefijo(email), 'dni': _sin_prefijo(dni)}
+        )
+
+    # --- servicios: "<nombre> (inactivo)" -> activo = false ---
+    marcados = bind.execute(sa.text(
+        "SELECT id, nombre FROM servicios WHERE nombre LIKE '% (inactivo)'"
+    )).all()
+    for id, nombre in marcados:
+        bind.execute(
+            sa.text("UPDATE servicios SET nombre = :nombre, activo = false, "
+                    "deleted_at = coalesce(deleted_at, now()) WHERE id = :id"),
+            {'id': id, 'nombre': _sin_sufijo(nombre)}
+        )
+
+    # --- UNIQUE(email), UNIQUE(dni) -> únicos parciales sobre los activos ---
+    for nombre, columna in INDICES:
+        op.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {nombre} ON clientes ({columna}) WHERE activo"
+        )
+
+
+def downgrade():
+    if not _es_postgres():
+        return
+    bind = op.get_bind()
+
+    # Vuelven las marcas en los datos; si no, los UNIQUE completos chocarían con los
+    # inactivos. Varios inactivos con el mismo valor reciben el prefijo repetido
+    # (inactivo_, inactivo_inactivo_, ...), que el código anterior ya sabía quitar.
+    for columna in ('email', 'dni'):
+        op.execute(
+            f"UPDATE clientes c SET {columna} = repeat('{PREFIJO}', m.n) || c.{columna} "
+            f"FROM (SELECT id, row_number() OVER (PARTITION BY {columna} ORDER BY id) AS n "
+            f"      FROM clientes WHERE NOT activo AND {columna} IS NOT NULL) m "
+            f"WHERE c.id = m.id"
+        )
+    op.execute("UPDATE servicios SET nombre = nombre || ' (inactivo)' WHERE NOT activo")
+
+    for nombre, _ in INDICES:
+        op.execute(f"DROP INDEX IF EXISTS {nombre}")
+    existentes = {tuple(r['column_names']) for r in sa.inspect(bind).get_unique_constraints('clientes')}
+    for columna in ('email', 'dni'):
+        repetidos = bind.execute(sa.text(
+            f"SELECT {columna}, array_agg(id ORDER BY id) FROM clientes "
+            f"WHERE {columna} IS NOT NULL GROUP BY {columna} HAVING count(*) > 1"
+        )).all()
+        if repetidos:
+            detalle = '; '.join(f'{valor}: clientes {ids}' for valor, ids in repetidos)
+            raise RuntimeError(
+                f'No se puede restaurar UNIQUE({columna}), hay valores repetidos: {detalle}'
+            )
+    for columna in ('email', 'dni'):
+        if (columna,) not in existentes:
+            op.create_unique_constraint(f'clientes_{columna}_key', 'clientes', [columna])
+
+    for tabla in ('clientes', 'servicios'):
+        op.drop_column(tabla, 'deleted_at')
+        op.drop_column(tabla, 'activo')
+    # tipos_habitacion ya tenía activo antes de esta revisión
+    op.drop_column('tipos_habitacion', 'deleted_at')
@@ -0,0 +1,76 @@
+"""consumos con precio, habitación y fecha en reserva_servicio
+
+Revision ID: b5d2e8f1c604
+Revises: a7e4c2d9f813
+Create Date: 2026-10-19 21:00:00.000000
+
+Cada línea de reserva_servicio guarda ahora el precio unitario del momento,
+la habitación que consumió y la fecha. Las líneas anteriores no tenían
+precio (se leía de servicios.precio al calcular): se rellena con el precio
+actual del servicio, que es lo que se venía cobrando, para que el primer
+recálculo de Reserva.total no las deje a cero. La habitación se rellena con
+la primera de la reserva, como hace services.consumos con las nuevas.
+
+Como las anteriores, solo aplica cambios en Postgres y cada paso comprueba
+el estado actual.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d2e8f1c604'
+down_revision = 'a7e4c2d9f813'
+branch_labels = None
+depends_on = None
+
+INDICES = (
+    ('ix_reserva_servicio_reserva', ['reserva_id']),
+    ('ix_reserva_servicio_hotel_fecha', ['hotel_id', 'fecha']),
+)
+
+
+def _es_postgres():
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def upgrade():
+    if not _es_postgres():
+        return
+    bind = op.get_bind()
+    existentes = {c['name'] for c in sa.inspect(bind).get_columns('reserva_servicio')}
+
+    if 'precio' not in existentes:
+        op.add_column('reserva_servicio', sa.Column('precio', sa.Float()))
+    if 'habitacion_id' not in existentes:
+        op.add_column('reserva_servicio', sa.Column(
+            'habitacion_id', sa.Integer(), sa.ForeignKey('habitaciones.id', name='reserva_servicio_habitacion_id_fkey')
+        ))
+    if 'fecha' not in existentes:
+        op.add_column('reserva_servicio', sa.Column('fecha', sa.DateTime()))
+
+    op.execute(
+        "UPDATE reserva_servicio rs SET precio = s.precio "
+        "FROM servicios s WHERE s.id = rs.servicio_id AND rs.precio IS NULL"
+    )
+    op.execute(
+        "UPDATE reserva_servicio rs SET habitacion_id = ("
+        "  SELECT min(d.habitacion_id) FROM detalles_reserva d WHERE d.reserva_id = rs.reserva_id"
+        ") WHERE rs.habitacion_id IS NULL"
+    )
+
+    indices = {i['name'] for i in sa.inspect(bind).get_indexes('reserva_servicio')}
+    for nombre, columnas in INDICES:
+        if nombre not in indices:
+            op.create_index(nombre, 'reserva_servicio', columnas)
+
+
+def downgrade():
+    if not _es_postgres():
+        return
+    for nombre, _ in INDICES:
+        op.execute(f"DROP INDEX IF EXISTS {nombre}")
+    # El precio vuelve a salir de servicios.precio: las líneas pierden el precio histórico
+    op.drop_column('reserva_servicio', 'fecha')
+    op.drop_column('reserva_servicio', 'habitacion_id')
+    op.drop_column('reserva_servicio', 'precio')
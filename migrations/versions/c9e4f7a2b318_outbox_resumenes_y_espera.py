@@ -0,0 +1,140 @@
+"""outbox de cambios, resúmenes por huésped, versión del catálogo, asignación y lista de espera
+
+Revision ID: c9e4f7a2b318
+Revises: b5d2e8f1c604
+Create Date: 2026-10-19 22:00:00.000000
+
+Tablas y columnas que hasta ahora solo creaba db.create_all():
+
+- ``cambios`` (outbox para GET /api/reservas/cambios).
+- ``reservas.fecha_creacion``/``fecha_cancelacion`` para las curvas de ritmo.
+  Las reservas existentes quedan sin fecha_creacion (no se sabe cuándo se
+  hicieron) y no cuentan en las curvas; las nuevas la toman del servidor.
+- ``resumen_clientes`` y ``resumen_clientes_archivo``. Se crean vacías: hay
+  que rellenarlas con ``flask reconstruir-resumen-clientes`` tras migrar.
+- ``version_catalogo`` (services.catalogo crea la fila la primera vez).
+- ``detalles_reserva.fijada`` (las existentes no quedan fijadas).
+- ``lista_espera``.
+
+Como las anteriores, solo aplica cambios en Postgres y cada paso comprueba
+el estado actual.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9e4f7a2b318'
+down_revision = 'b5d2e8f1c604'
+branch_labels = None
+depends_on = None
+
+
+def _es_postgres():
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def _columnas(bind, tabla):
+    return {c['name'] for c in sa.inspect(bind).get_columns(tabla)}
+
+
+def _agregados():
+    return (
+        sa.Column('cliente_id', sa.Integer(), sa.ForeignKey('clientes.id'), primary_key=True),
+        sa.Column('estancias', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('noches', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('ingresos', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('pagado', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('primera_estancia', sa.Date()),
+        sa.Column('ultima_estancia', sa.Date()),
+    )
+
+
+def upgrade():
+    if not _es_postgres():
+        return
+    bind = op.get_bind()
+    existentes = set(sa.inspect(bind).get_table_names())
+
+    if 'cambios' not in existentes:
+        op.create_table(
+            'cambios',
+            sa.Column('id', sa.BigInteger(), primary_key=True),
+            sa.Column('hotel_id', sa.Integer(), sa.ForeignKey('hoteles.id')),
+            sa.Column('transaccion', sa.BigInteger(), nullable=False, server_default='0'),
+            sa.Column('entidad', sa.String(20), nullable=False),
+            sa.Column('entidad_id', sa.Integer(), nullable=False),
+            sa.Column('operacion', sa.String(15), nullable=False),
+            sa.Column('fecha', sa.DateTime()),
+        )
+        op.create_index('ix_cambios_hotel_id', 'cambios', ['hotel_id'])
+        op.create_index('ix_cambios_cursor', 'cambios', ['transaccion', 'id'])
+        op.create_index('ix_cambios_entidad', 'cambios', ['entidad', 'entidad_id'])
+
+    columnas = _columnas(bind, 'reservas')
+    if 'fecha_creacion' not in columnas:
+        # Sin default al añadirla: now() marcaría todas las existentes como hechas hoy
+        op.add_column('reservas', sa.Column('fecha_creacion', sa.DateTime()))
+        op.alter_column('reservas', 'fecha_creacion', server_default=sa.func.now())
+    if 'fecha_cancelacion' not in columnas:
+        op.add_column('reservas', sa.Column('fecha_cancelacion', sa.DateTime()))
+
+    if 'resumen_clientes' not in existentes:
+        op.create_table(
+            'resumen_clientes',
+            *_agregados(),
+            sa.Column('revision', sa.Integer(), nullable=False, server_default='1'),
+            sa.Column('actualizado', sa.DateTime()),
+        )
+        op.create_index('ix_resumen_clientes_ingresos', 'resumen_clientes', ['ingresos'])
+        op.create_index('ix_resumen_clientes_estancias', 'resumen_clientes', ['estancias', 'ingresos'])
+    if 'resumen_clientes_archivo' not in existentes:
+        op.create_table('resumen_clientes_archivo', *_agregados())
+
+    if 'version_catalogo' not in existentes:
+        op.create_table(
+            'version_catalogo',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('generacion', sa.String(32), nullable=False),
+            sa.Column('version', sa.BigInteger(), nullable=False, server_default='1'),
+        )
+
+    if 'fijada' not in _columnas(bind, 'detalles_reserva'):
+        op.add_column('detalles_reserva', sa.Column('fijada', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+    if 'lista_espera' not in existentes:
+        op.create_table(
+            'lista_espera',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('hotel_id', sa.Integer(), sa.ForeignKey('hoteles.id')),
+            sa.Column('cliente_id', sa.Integer(), sa.ForeignKey('clientes.id'), nullable=False),
+            sa.Column('tipo_id', sa.Integer(), sa.ForeignKey('tipos_habitacion.id'), nullable=False),
+            sa.Column('fecha_inicio', sa.Date(), nullable=False),
+            sa.Column('fecha_fin', sa.Date(), nullable=False),
+            sa.Column('cantidad', sa.Integer(), nullable=False, server_default='1'),
+            sa.Column('prioridad', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('estado', sa.String(20), nullable=False, server_default='pendiente'),
+            sa.Column('expira', sa.DateTime(), nullable=False),
+            sa.Column('fecha_creacion', sa.DateTime()),
+            sa.Column('fecha_oferta', sa.DateTime()),
+            sa.Column('oferta_expira', sa.DateTime()),
+            sa.Column('reserva_id', sa.Integer(), sa.ForeignKey('reservas.id', ondelete='SET NULL')),
+        )
+        op.create_index('ix_lista_espera_hotel_id', 'lista_espera', ['hotel_id'])
+        op.execute(
+            "CREATE INDEX ix_lista_espera_pendiente ON lista_espera (tipo_id, fecha_inicio, fecha_fin) "
+            "WHERE estado = 'pendiente'"
+        )
+
+
+def downgrade():
+    if not _es_postgres():
+        return
+    op.drop_table('lista_espera')
+    op.drop_column('detalles_reserva', 'fijada')
+    op.drop_table('version_catalogo')
+    op.drop_table('resumen_clientes_archivo')
+    op.drop_table('resumen_clientes')
+    op.drop_column('reservas', 'fecha_cancelacion')
+    op.drop_column('reservas', 'fecha_creacion')
+    op.drop_table('cambios')
@@ -1,9 +1,42 @@
+from flask import g, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import declared_attr
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 
 db = SQLAlchemy()
 
+
+def hotel_actual():
+    """Hotel del contexto actual (resuelto desde el JWT); None = todos los hoteles."""
+    return g.get('hotel_id') if has_app_context() else None
+
+
+class HotelMixin:
+    """Clave de partición por hotel. Las consultas ORM se filtran solas (ver services.tenencia)."""
+
+    @declared_attr
+    def hotel_id(cls):
+        return db.Column(db.Integer, db.ForeignKey('hoteles.id'), index=True, default=hotel_actual)
+
+
+class BorradoLogicoMixin:
+    """Baja lógica: ``activo``/``deleted_at``. Las consultas ORM excluyen las bajas (ver services.borrado)."""
+
+    activo = db.Column(db.Boolean, default=True, server_default=db.true(), nullable=False)
+    deleted_at = db.Column(db.DateTime)
+
+    def desactivar(self):
+        self.activo = False
+        self.deleted_at = datetime.utcnow()
+
+
+class Hotel(db.Model):
+    __tablename__ = 'hoteles'
+    id = db.Column(db.Integer, primary_key=True)
+    codigo = db.Column(db.String(30), unique=True, nullable=False)
+    nombre = db.Column(db.String(120), nullable=False)
+    activo = db.Column(db.Boolean, default=True, nullable=False)
+
 # Asociativa many-to-many ejemplo Roles<->Permisos
 roles_permisos = db.Table('roles_permisos',
     db.Column('role_id', db.Integer, db.ForeignKey('roles.id'), primary_key=True),
@@ -19,12 +52,21 @@ class Usuario(db.Model):
     password_hash = db.Column(db.String(255))
     role_id = db.Column(db.Integer, db.ForeignKey('roles.id'))
     role = db.relationship('Rol', back_populates='usuarios')
+    # None = usuario del grupo, puede operar en cualquier hotel
+    hotel_id = db.Column(db.Integer, db.ForeignKey('hoteles.id'))
 
     def set_password(self,password):
-        self.password_hash = generate_password_hash(password)
+        from services.claves import generar_hash
+        self.password_hash = generar_hash(password)
 
     def check_password(self,password):
-        return check_password_hash(self.password_hash,password)
+        """Verifica y, si el hash usa parámetros antiguos, lo regenera (hay que hacer commit)."""
+        from services.claves import verificar_hash, necesita_rehash
+        if not verificar_hash(self.password_hash, password):
+            return False
+        if necesita_rehash(self.password_hash):
+            self.set_password(password)
+        return True
 
 
 class Rol(db.Model):
@@ -40,13 +82,23 @@ class Permiso(db.Model):
     nombre = db.Column(db.String(120), unique=True, nullable=False)
     roles = db.relationship('Rol', secondary=roles_permisos, back_populates='permisos')
 
-class Cliente(db.Model):
+class Cliente(BorradoLogicoMixin, db.Model):
     __tablename__ = 'clientes'
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(120))
-    email = db.Column(db.String(120), unique=True)
+    email = db.Column(db.String(120))
     telefono = db.Column(db.String(30))
-    dni = db.Column(db.String(20), unique=True)
+    dni = db.Column(db.String(20))
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
+    # Únicos solo entre los activos: un cliente dado de baja no bloquea su email/DNI
+    __table_args__ = (
+        db.Index('uq_clientes_email_activo', 'email', unique=True,
+                 postgresql_where=db.text('activo'), sqlite_where=db.text('activo')),
+        db.Index('uq_clientes_dni_activo', 'dni', unique=True,
+                 postgresql_where=db.text('activo'), sqlite_where=db.text('activo')),
+    )
 
 class Empleado(db.Model):
     __tablename__ = 'empleados'
@@ -60,23 +112,28 @@ class PuestoTrabajo(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(120))
 
-class TipoHabitacion(db.Model):
+class TipoHabitacion(BorradoLogicoMixin, HotelMixin, db.Model):
     __tablename__ = 'tipos_habitacion'
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(80))
     descripcion = db.Column(db.String(255))
-    activo = db.Column(db.Boolean, default=True, nullable=False)
 
-class Habitacion(db.Model):
+class Habitacion(HotelMixin, db.Model):
     __tablename__ = 'habitaciones'
     id = db.Column(db.Integer, primary_key=True)
-    numero = db.Column(db.String(20), unique=True)
+    numero = db.Column(db.String(20))
     tipo_id = db.Column(db.Integer, db.ForeignKey('tipos_habitacion.id'))
     tipo = db.relationship('TipoHabitacion')
     precio = db.Column(db.Float)
     estado = db.Column(db.String(30), default='disponible')
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
-class Reserva(db.Model):
+    __mapper_args__ = {'version_id_col': version}
+    __table_args__ = (
+        db.UniqueConstraint('hotel_id', 'numero', name='uq_habitaciones_hotel_numero'),
+    )
+
+class Reserva(HotelMixin, db.Model):
     __tablename__ = 'reservas'
     id = db.Column(db.Integer, primary_key=True)
     cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'))
@@ -85,8 +142,23 @@ class Reserva(db.Model):
     fecha_fin = db.Column(db.Date)
     estado = db.Column(db.String(30), default='planificada')
     total = db.Column(db.Float, default=0.0)
+    # Denormalizados: se actualizan en la misma transacción que cada Pago
+    pagado = db.Column(db.Float, default=0.0, server_default='0', nullable=False)
+    saldo = db.Column(db.Float, default=0.0, server_default='0', nullable=False)
+    # Para las curvas de ritmo (on-the-books a cada antelación)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow, server_default=db.func.now())
+    fecha_cancelacion = db.Column(db.DateTime)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
+    __table_args__ = (
+        db.Index('ix_reservas_hotel_fechas', 'hotel_id', 'fecha_inicio', 'fecha_fin'),
+        db.Index('ix_reservas_saldo_pendiente', 'saldo',
+                 postgresql_where=db.text('saldo > 0'),
+                 sqlite_where=db.text('saldo > 0')),
+    )
 
-class DetalleReserva(db.Model):
+class DetalleReserva(HotelMixin, db.Model):
     __tablename__ = 'detalles_reserva'
     id = db.Column(db.Integer, primary_key=True)
     reserva_id = db.Column(db.Integer, db.ForeignKey('reservas.id'))
@@ -94,28 +166,53 @@ class DetalleReserva(db.Model):
     habitacion_id = db.Column(db.Integer, db.ForeignKey('habitaciones.id'))
     habitacion = db.relationship('Habitacion')
     precio = db.Column(db.Float)
+    # Habitación pedida expresamente: la reoptimización de asignaciones no la mueve
+    fijada = db.Column(db.Boolean, default=False, server_default=db.false(), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_detalles_reserva_hotel_habitacion', 'hotel_id', 'habitacion_id'),
+    )
 
-class Servicio(db.Model):
+class Servicio(BorradoLogicoMixin, HotelMixin, db.Model):
     __tablename__ = 'servicios'
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(120))
     precio = db.Column(db.Float)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
-class ReservaServicio(db.Model):
+    __mapper_args__ = {'version_id_col': version}
+
+class ReservaServicio(HotelMixin, db.Model):
     __tablename__ = 'reserva_servicio'
     id = db.Column(db.Integer, primary_key=True)
     reserva_id = db.Column(db.Integer, db.ForeignKey('reservas.id'))
     servicio_id = db.Column(db.Integer, db.ForeignKey('servicios.id'))
     cantidad = db.Column(db.Integer, default=1)
+    # Precio unitario al cargarlo: cambiar la tarifa no reescribe consumos pasados
+    precio = db.Column(db.Float)
+    # Habitación que consumió (para el informe por tipo); por defecto la primera de la reserva
+    habitacion_id = db.Column(db.Integer, db.ForeignKey('habitaciones.id'))
+    fecha = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_reserva_servicio_reserva', 'reserva_id'),
+        db.Index('ix_reserva_servicio_hotel_fecha', 'hotel_id', 'fecha'),
+    )
 
-class Pago(db.Model):
+class Pago(HotelMixin, db.Model):
     __tablename__ = 'pagos'
     id = db.Column(db.Integer, primary_key=True)
     reserva_id = db.Column(db.Integer, db.ForeignKey('reservas.id'), nullable=True)
+    reserva = db.relationship('Reserva', backref='pagos')
     monto = db.Column(db.Float, nullable=False)
     metodo = db.Column(db.String(50))
+    tipo = db.Column(db.String(20), default='pago')  # pago | reembolso
     fecha = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_pagos_hotel_fecha', 'hotel_id', 'fecha'),
+    )
+
 class Factura(db.Model):
     __tablename__ = 'facturas'
     id = db.Column(db.Integer, primary_key=True)
@@ -143,3 +240,104 @@ class HistorialAcceso(db.Model):
     usuario = db.Column(db.String(120))
     accion = db.Column(db.String(255))
     fecha = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ArchivoReservas(HotelMixin, db.Model):
+    """Periodos cerrados movidos fuera de reservas: un bloque gzip de JSON por hotel y mes."""
+    __tablename__ = 'archivo_reservas'
+    id = db.Column(db.Integer, primary_key=True)
+    periodo = db.Column(db.Date, nullable=False)  # primer día del mes de fecha_inicio
+    reservas = db.Column(db.Integer, nullable=False)
+    datos = db.Column(db.LargeBinary, nullable=False)
+    fecha = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_archivo_reservas_hotel_periodo', 'hotel_id', 'periodo'),
+    )
+
+
+class Cambio(HotelMixin, db.Model):
+    """Outbox de cambios de reservas/habitaciones para la sincronización incremental.
+
+    Se escribe en la misma transacción que el cambio (ver services.cambios).
+    El cursor es (transaccion, id): en Postgres ``transaccion`` es el txid.
+    """
+    __tablename__ = 'cambios'
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    transaccion = db.Column(db.BigInteger, nullable=False, default=0)
+    entidad = db.Column(db.String(20), nullable=False)  # reserva | habitacion
+    entidad_id = db.Column(db.Integer, nullable=False)
+    operacion = db.Column(db.String(15), nullable=False)  # alta | modificacion | baja
+    fecha = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_cambios_cursor', 'transaccion', 'id'),
+        db.Index('ix_cambios_entidad', 'entidad', 'entidad_id'),
+    )
+
+
+class ResumenCliente(db.Model):
+    """Agregados por cliente, de todo el grupo como el propio Cliente (ver services.huespedes)."""
+    __tablename__ = 'resumen_clientes'
+    cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), primary_key=True)
+    estancias = db.Column(db.Integer, nullable=False, default=0)
+    noches = db.Column(db.Integer, nullable=False, default=0)
+    ingresos = db.Column(db.Float, nullable=False, default=0.0)
+    pagado = db.Column(db.Float, nullable=False, default=0.0)
+    primera_estancia = db.Column(db.Date)
+    ultima_estancia = db.Column(db.Date)
+    revision = db.Column(db.Integer, nullable=False, default=1)
+    actualizado = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_resumen_clientes_ingresos', 'ingresos'),
+        db.Index('ix_resumen_clientes_estancias', 'estancias', 'ingresos'),
+    )
+
+
+class ResumenClienteArchivo(db.Model):
+    """Parte de resumen_clientes que viene de reservas ya archivadas; solo crece al archivar."""
+    __tablename__ = 'resumen_clientes_archivo'
+    cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), primary_key=True)
+    estancias = db.Column(db.Integer, nullable=False, default=0)
+    noches = db.Column(db.Integer, nullable=False, default=0)
+    ingresos = db.Column(db.Float, nullable=False, default=0.0)
+    pagado = db.Column(db.Float, nullable=False, default=0.0)
+    primera_estancia = db.Column(db.Date)
+    ultima_estancia = db.Column(db.Date)
+
+
+class VersionCatalogo(db.Model):
+    """Fila única: sube con cada cambio de habitaciones o tipos (ver services.catalogo)."""
+    __tablename__ = 'version_catalogo'
+    id = db.Column(db.Integer, primary_key=True)
+    # Distingue bases recreadas: sin ella un fichero viejo con el mismo número se reutilizaría
+    generacion = db.Column(db.String(32), nullable=False)
+    version = db.Column(db.BigInteger, nullable=False, default=1)
+
+
+class EsperaReserva(HotelMixin, db.Model):
+    """Cliente en lista de espera para un tipo de habitación y unas fechas (ver services.espera)."""
+    __tablename__ = 'lista_espera'
+    id = db.Column(db.Integer, primary_key=True)
+    cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), nullable=False)
+    tipo_id = db.Column(db.Integer, db.ForeignKey('tipos_habitacion.id'), nullable=False)
+    fecha_inicio = db.Column(db.Date, nullable=False)
+    fecha_fin = db.Column(db.Date, nullable=False)
+    cantidad = db.Column(db.Integer, nullable=False, default=1)
+    # Mayor primero; a igual prioridad, por orden de llegada
+    prioridad = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    estado = db.Column(db.String(20), nullable=False, default='pendiente')  # pendiente | ofrecida | atendida | expirada | cancelada
+    expira = db.Column(db.DateTime, nullable=False)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_oferta = db.Column(db.DateTime)
+    # Mientras no caduca, la oferta ocupa su sitio en el calendario del tipo
+    oferta_expira = db.Column(db.DateTime)
+    reserva_id = db.Column(db.Integer, db.ForeignKey('reservas.id', ondelete='SET NULL'))
+
+    __table_args__ = (
+        # Índice de intervalos del emparejador: rango por tipo y llegada, solo las pendientes
+        db.Index('ix_lista_espera_pendiente', 'tipo_id', 'fecha_inicio', 'fecha_fin',
+                 postgresql_where=db.text("estado = 'pendiente'"),
+                 sqlite_where=db.text("estado = 'pendiente'")),
+    )
+
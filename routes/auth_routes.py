@@ -1,10 +1,12 @@
 from flask import Blueprint, request, jsonify, current_app, url_for, redirect
 from models import db, Usuario
 from flask_jwt_extended import create_access_token
-from werkzeug.security import generate_password_hash
+from services.claves import ColaClavesLlena, respuesta_saturado
 from oauthlib.oauth2 import WebApplicationClient
 import requests
 from flasgger import swag_from
+from services.auditoria import auditoria
+from services.limites import limitar, por_ip, por_usuario
 
 auth_bp = Blueprint("auth_bp", __name__, url_prefix="/api/auth")
 
@@ -22,6 +24,8 @@ def init_google_client(app):
     'summary': 'Iniciar sesión y obtener token JWT',
     'description': 'Autentica un usuario mediante email o username y contraseña.',
 })
+@limitar('login', 'LIMITE_LOGIN_IP', 'LIMITE_LOGIN_IP', claves=(por_ip,), bloquear_en=(401,))
+@limitar('login', 'LIMITE_LOGIN_USUARIO', 'LIMITE_LOGIN_USUARIO', claves=(por_usuario,), bloquear_en=(401,))
 def login():
     data = request.get_json()
     email = data.get('email')
@@ -33,10 +37,20 @@ def login():
 
     user = Usuario.query.filter_by(email=email).first() if email else Usuario.query.filter_by(username=username).first()
 
-    if not user or not user.check_password(password):
+    try:
+        valido = user is not None and user.check_password(password)
+    except ColaClavesLlena:
+        return respuesta_saturado()
+
+    if not valido:
+        auditoria.registrar(email or username, 'login fallido')
         return jsonify({'ok': False, 'msg': 'Credenciales inválidas'}), 401
 
-    token = create_access_token(identity=str(user.id))
+    if db.session.is_modified(user):
+        db.session.commit()  # hash regenerado con los parámetros actuales
+
+    auditoria.registrar(user.id, 'login')
+    token = create_access_token(identity=str(user.id), additional_claims={'hotel_id': user.hotel_id})
     return jsonify({'ok': True, 'token': token}), 200
 
 
@@ -104,12 +118,13 @@ def callback_google():
 
     user = Usuario.query.filter_by(email=email).first()
     if not user:
+        # Sin contraseña local: check_password siempre falla para estos usuarios
         user = Usuario(username=username, email=email, nombre=nombre)
-        user.password_hash = generate_password_hash("sso_user")
         db.session.add(user)
         db.session.commit()
 
-    jwt_token = create_access_token(identity=str(user.id))
+    auditoria.registrar(user.id, 'login google')
+    jwt_token = create_access_token(identity=str(user.id), additional_claims={'hotel_id': user.hotel_id})
 
     from urllib.parse import urlencode
     import json
@@ -1,6 +1,12 @@
 from flask import Blueprint, request, jsonify
-from models import db, Cliente
+from models import db, Cliente, ResumenCliente
 from flask_jwt_extended import jwt_required
+from services import lecturas
+from services.huespedes import olvidar as olvidar_resumen
+from services.importacion import leer_filas, importar_clientes, normalizar_email
+from services.versionado import no_modificado, con_etag, precondicion_fallida, conflicto_version
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
 
 clientes_bp = Blueprint("clientes_bp", __name__, url_prefix="/api/clientes")
 
@@ -10,17 +16,7 @@ clientes_bp = Blueprint("clientes_bp", __name__, url_prefix="/api/clientes")
 @clientes_bp.route('/', methods=['GET'])
 @jwt_required()
 def listar_clientes():
-    clientes = Cliente.query.all()
-
-    data = [{
-        "id": c.id,
-        "nombre": c.nombre,
-        "email": c.email,
-        "telefono": c.telefono,
-        "dni": c.dni
-    } for c in clientes]
-
-    return jsonify(data), 200
+    return jsonify(lecturas.listar_clientes()), 200
 
 
 # =========================================================
@@ -30,14 +26,28 @@ def listar_clientes():
 @jwt_required()
 def obtener_cliente(id):
     c = Cliente.query.get_or_404(id)
+    resumen = db.session.get(ResumenCliente, id)
+    # El resumen cambia sin tocar la fila del cliente: va en el ETag como detalle
+    revision = resumen.revision if resumen else 0
+
+    no_mod = no_modificado(c.version, revision)
+    if no_mod:
+        return no_mod
 
-    return jsonify({
+    return con_etag(jsonify({
         "id": c.id,
         "nombre": c.nombre,
         "email": c.email,
         "telefono": c.telefono,
-        "dni": c.dni
-    }), 200
+        "dni": c.dni,
+        "version": c.version,
+        "estancias": resumen.estancias if resumen else 0,
+        "noches": resumen.noches if resumen else 0,
+        "ingresos": resumen.ingresos if resumen else 0.0,
+        "pagado": resumen.pagado if resumen else 0.0,
+        "primera_estancia": resumen.primera_estancia if resumen else None,
+        "ultima_estancia": resumen.ultima_estancia if resumen else None
+    }), c.version, revision), 200
 
 
 # =========================================================
@@ -48,7 +58,8 @@ def obtener_cliente(id):
 def crear_cliente():
     data = request.json
     nombre = data.get("nombre")
-    email = data.get("email")
+    # Misma forma que la importación: si no, la comprobación de unicidad se salta cambiando mayúsculas
+    email = normalizar_email(data.get("email"))
     telefono = data.get("telefono")
     dni = data.get("dni")
 
@@ -73,6 +84,23 @@ def crear_cliente():
     return jsonify({"ok": True, "msg": "Cliente creado", "id": c.id}), 201
 
 
+# =========================================================
+# IMPORTACIÓN MASIVA (CSV / NDJSON)
+# =========================================================
+@clientes_bp.route('/importar', methods=['POST'])
+@jwt_required()
+def importar_clientes_masivo():
+    formato = request.args.get('formato')
+    if not formato:
+        formato = 'csv' if request.mimetype == 'text/csv' else 'ndjson'
+    if formato not in ('csv', 'ndjson'):
+        return jsonify({"ok": False, "msg": "formato debe ser csv o ndjson"}), 400
+
+    resumen = importar_clientes(leer_filas(request.stream, formato))
+
+    return jsonify({"ok": True, **resumen.a_dict()}), 200
+
+
 # =========================================================
 # ACTUALIZAR CLIENTE
 # =========================================================
@@ -80,18 +108,23 @@ def crear_cliente():
 @jwt_required()
 def actualizar_cliente(id):
     c = Cliente.query.get_or_404(id)
+    fallo = precondicion_fallida(c.version)
+    if fallo:
+        return fallo
+
     data = request.json
 
     if "nombre" in data:
         c.nombre = data["nombre"]
     
     if "email" in data:
+        email = normalizar_email(data["email"])
         # Validar que el email no esté en uso por otro cliente
-        if data["email"] != c.email:
-            email_existente = Cliente.query.filter_by(email=data["email"]).first()
+        if email != c.email:
+            email_existente = Cliente.query.filter_by(email=email).first()
             if email_existente:
                 return jsonify({"ok": False, "msg": "El email ya está registrado"}), 400
-        c.email = data["email"]
+        c.email = email
     
     if "telefono" in data:
         c.telefono = data["telefono"]
@@ -104,8 +137,15 @@ def actualizar_cliente(id):
                 return jsonify({"ok": False, "msg": "El DNI ya está registrado"}), 400
         c.dni = data["dni"]
 
-    db.session.commit()
-    return jsonify({"ok": True, "msg": "Cliente actualizado"}), 200
+    try:
+        db.session.flush()
+        version = c.version
+        db.session.commit()
+    except StaleDataError:
+        db.session.rollback()
+        return conflicto_version()
+
+    return con_etag(jsonify({"ok": True, "msg": "Cliente actualizado"}), version), 200
 
 
 # =========================================================
@@ -116,9 +156,8 @@ def actualizar_cliente(id):
 def desactivar_cliente(id):
     c = Cliente.query.get_or_404(id)
 
-    c.email = f"inactivo_{c.email}"
-    if c.dni:
-        c.dni = f"inactivo_{c.dni}"
+    # email y DNI quedan libres: los índices únicos solo cubren clientes activos
+    c.desactivar()
     db.session.commit()
 
     return jsonify({"ok": True, "msg": "Cliente desactivado"}), 200
@@ -130,9 +169,16 @@ def desactivar_cliente(id):
 @clientes_bp.route('/<int:id>', methods=['DELETE'])
 @jwt_required()
 def eliminar_cliente(id):
-    c = Cliente.query.get_or_404(id)
+    # También los dados de baja
+    c = Cliente.query.execution_options(incluir_borrados=True).get_or_404(id)
 
+    # El resumen por huésped apunta al cliente: se va con él en la misma transacción
+    olvidar_resumen(c.id)
     db.session.delete(c)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"ok": False, "msg": "El cliente tiene reservas u otros datos asociados"}), 409
 
     return jsonify({"ok": True, "msg": "Cliente eliminado"}), 200
\ No newline at end of file
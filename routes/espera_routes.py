@@ -0,0 +1,97 @@
+from flask import Blueprint, jsonify, request
+from models import db, EsperaReserva, Reserva
+from flask_jwt_extended import jwt_required
+from services import espera
+from services.espera import EsperaInvalida
+
+espera_bp = Blueprint("espera_bp", __name__, url_prefix="/api/lista-espera")
+
+
+def _serializar(e):
+    return {
+        "id": e.id,
+        "cliente_id": e.cliente_id,
+        "tipo_id": e.tipo_id,
+        "fecha_inicio": e.fecha_inicio.isoformat(),
+        "fecha_fin": e.fecha_fin.isoformat(),
+        "cantidad": e.cantidad,
+        "prioridad": e.prioridad,
+        "estado": e.estado,
+        "expira": e.expira.isoformat() if e.expira else None,
+        "fecha_oferta": e.fecha_oferta.isoformat() if e.fecha_oferta else None,
+        "oferta_expira": e.oferta_expira.isoformat() if e.oferta_expira else None,
+        "reserva_id": e.reserva_id
+    }
+
+
+@espera_bp.errorhandler(EsperaInvalida)
+def espera_invalida(e):
+    return jsonify({'ok': False, 'msg': e.msg}), e.status
+
+
+# =========================================================
+# LISTAR LISTA DE ESPERA
+# =========================================================
+@espera_bp.route('/', methods=['GET'])
+@jwt_required()
+def listar_espera():
+    stmt = db.select(EsperaReserva)
+    estado = request.args.get('estado')
+    if estado:
+        if estado not in espera.ESTADOS:
+            return jsonify({'ok': False, 'msg': f'estado debe ser uno de {list(espera.ESTADOS)}'}), 400
+        stmt = stmt.where(EsperaReserva.estado == estado)
+    for campo in ('tipo_id', 'cliente_id'):
+        valor = request.args.get(campo, type=int)
+        if valor is not None:
+            stmt = stmt.where(getattr(EsperaReserva, campo) == valor)
+    # Mismo orden en que se ofrecen
+    stmt = stmt.order_by(EsperaReserva.prioridad.desc(), EsperaReserva.fecha_creacion, EsperaReserva.id)
+    return jsonify([_serializar(e) for e in db.session.execute(stmt).scalars()]), 200
+
+
+# =========================================================
+# APUNTAR A LISTA DE ESPERA
+# =========================================================
+@espera_bp.route('/', methods=['POST'])
+@jwt_required()
+def crear_espera():
+    entrada = espera.crear_entrada(request.json or {})
+    db.session.commit()
+
+    # Si ya hay sitio se ofrece en el acto, como cualquier otra capacidad libre
+    espera.avisar(espera.emparejar, entrada.hotel_id, entrada.tipo_id, entrada.fecha_inicio, solo=entrada.id)
+    entrada = db.session.get(EsperaReserva, entrada.id)
+    return jsonify({'ok': True, 'id': entrada.id, 'estado': entrada.estado}), 201
+
+
+# =========================================================
+# CANCELAR ENTRADA
+# =========================================================
+@espera_bp.route('/<int:id>/cancelar', methods=['PUT'])
+@jwt_required()
+def cancelar_espera(id):
+    entrada = EsperaReserva.query.get_or_404(id)
+    if entrada.estado not in ('pendiente', 'ofrecida'):
+        return jsonify({'ok': False, 'msg': f'La entrada ya está {entrada.estado}'}), 400
+
+    ofrecidas = espera.retirar(entrada, 'cancelada')
+    return jsonify({'ok': True, 'msg': 'Entrada cancelada', 'ofrecidas': ofrecidas}), 200
+
+
+# =========================================================
+# MARCAR ENTRADA COMO ATENDIDA
+# =========================================================
+@espera_bp.route('/<int:id>/atender', methods=['PUT'])
+@jwt_required()
+def atender_espera(id):
+    entrada = EsperaReserva.query.get_or_404(id)
+    if entrada.estado not in ('pendiente', 'ofrecida'):
+        return jsonify({'ok': False, 'msg': f'La entrada ya está {entrada.estado}'}), 400
+
+    reserva_id = (request.get_json(silent=True) or {}).get('reserva_id')
+    if reserva_id is not None and db.session.get(Reserva, reserva_id) is None:
+        return jsonify({'ok': False, 'msg': 'Reserva no encontrada'}), 404
+
+    espera.retirar(entrada, 'atendida', reserva_id)
+    return jsonify({'ok': True, 'msg': 'Entrada atendida'}), 200
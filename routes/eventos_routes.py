@@ -0,0 +1,99 @@
+import queue
+import time
+
+from flask import Blueprint, Response, request, current_app, g, jsonify
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+from models import db, Usuario
+from services.eventos import hub, formato_sse
+
+eventos_bp = Blueprint("eventos_bp", __name__, url_prefix="/api/eventos")
+
+
+# =========================================================
+# FEED SSE DE DISPONIBILIDAD Y ESTADO DE RESERVAS
+# =========================================================
+# EventSource no permite cabeceras: el token puede ir en ?jwt=
+#
+# Cada cliente conectado ocupa un hilo (o greenlet) del worker esperando en su
+# cola mientras dure la conexión. Para que los clientes ociosos no cuesten
+# casi nada hay que servir con workers asíncronos (gunicorn -k gevent); con
+# workers síncronos o gthread cada feed abierto es un hilo menos para el resto.
+# EVENTOS_MAX_CLIENTES pone tope por proceso.
+def _hotel_del_feed():
+    """Hotel del propio token: el before_request de tenencia solo mira cabeceras y aquí no llegan.
+
+    (hotel_id, None) o (None, respuesta de error). Los usuarios de grupo
+    pueden acotar el feed con ?hotel_id=; sin él reciben todos los hoteles.
+    """
+    claims = get_jwt()
+    if 'hotel_id' in claims:
+        hotel_id = claims['hotel_id']
+    else:
+        # Token sin el claim: manda lo que diga el usuario, no la ausencia del dato
+        identidad = get_jwt_identity()
+        usuario = db.session.get(Usuario, int(identidad)) if str(identidad).isdigit() else None
+        if usuario is None:
+            return None, (jsonify({'ok': False, 'msg': 'Usuario no encontrado'}), 401)
+        hotel_id = usuario.hotel_id
+    if hotel_id is not None:
+        return hotel_id, None
+
+    pedido = request.args.get('hotel_id') or request.headers.get('X-Hotel-Id')
+    if pedido:
+        if not pedido.isdigit():
+            return None, (jsonify({'ok': False, 'msg': 'hotel_id inválido'}), 400)
+        return int(pedido), None
+    return None, None
+
+
+@eventos_bp.route('/disponibilidad', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def feed_disponibilidad():
+    hotel_id, error = _hotel_del_feed()
+    if error:
+        return error
+    g.hotel_id = hotel_id
+
+    if hub.lleno():
+        resp = jsonify({'ok': False, 'msg': 'Demasiados clientes conectados al feed'})
+        resp.status_code = 503
+        resp.headers['Retry-After'] = str(current_app.config.get('CARGA_REINTENTO', 1))
+        return resp
+
+    app = current_app._get_current_object()
+    hub.asegurar_oyente(app)
+
+    ultimo_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    suscripcion, pendientes = hub.suscribir(hotel_id, ultimo_id)
+    latido = app.config.get('EVENTOS_LATIDO', 15)
+
+    # Sin stream_with_context: el contexto se libera al devolver la respuesta
+    # y la conexión abierta no cuenta como petición en curso
+    def generar():
+        try:
+            yield 'retry: 3000\n\n'
+            if pendientes is None:
+                yield formato_sse({'id': '', 'tipo': 'reinicio', 'datos': {}})
+            else:
+                for evento in pendientes:
+                    yield formato_sse(evento)
+
+            ultimo_envio = time.monotonic()
+            while not suscripcion.cerrada:
+                try:
+                    evento = suscripcion.cola.get(timeout=latido)
+                except queue.Empty:
+                    evento = None
+                if evento is not None:
+                    yield formato_sse(evento)
+                    ultimo_envio = time.monotonic()
+                elif time.monotonic() - ultimo_envio >= latido:
+                    yield ': latido\n\n'
+                    ultimo_envio = time.monotonic()
+        finally:
+            hub.desuscribir(suscripcion)
+
+    return Response(generar(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
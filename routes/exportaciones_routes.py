@@ -0,0 +1,104 @@
+import os
+import threading
+import uuid
+
+from flask import Blueprint, request, jsonify, current_app, send_file, g
+from flask_jwt_extended import jwt_required
+from models import db, hotel_actual
+from services.exportacion import exportar, empaquetar, formatos_disponibles, formato_por_defecto
+
+exportaciones_bp = Blueprint("exportaciones_bp", __name__, url_prefix="/api/exportaciones")
+
+
+# El estado de cada trabajo vive en su carpeta, así cualquier worker puede consultarlo
+def _carpeta(job_id):
+    return os.path.join(current_app.config['EXPORTACION_DIR'], job_id)
+
+
+def _estado(carpeta):
+    if os.path.exists(os.path.join(carpeta, 'exportacion.zip')):
+        return 'listo'
+    if os.path.exists(os.path.join(carpeta, 'error.txt')):
+        return 'error'
+    return 'en_proceso'
+
+
+def _ejecutar(app, carpeta, formato, hotel_id):
+    with app.app_context():
+        g.hotel_id = hotel_id
+        try:
+            resultado = exportar(carpeta, formato, app.config['EXPORTACION_LOTE'])
+            empaquetar(carpeta, [ruta for ruta, _ in resultado.values()])
+        except Exception as e:
+            app.logger.exception('Falló la exportación %s', carpeta)
+            with open(os.path.join(carpeta, 'error.txt'), 'w') as f:
+                f.write(str(e))
+        finally:
+            db.session.remove()
+
+
+# =========================================================
+# LANZAR EXPORTACIÓN
+# =========================================================
+@exportaciones_bp.route('/', methods=['POST'])
+@jwt_required()
+def crear_exportacion():
+    data = request.get_json(silent=True) or {}
+    formato = data.get('formato')
+
+    disponibles = formatos_disponibles()
+    if not disponibles:
+        return jsonify({'ok': False, 'msg': 'Instale pyarrow o numpy para exportar'}), 501
+    if formato and formato not in disponibles:
+        return jsonify({'ok': False, 'msg': f'Formatos disponibles: {", ".join(disponibles)}'}), 400
+
+    job_id = uuid.uuid4().hex
+    carpeta = _carpeta(job_id)
+    os.makedirs(carpeta)
+
+    hilo = threading.Thread(
+        target=_ejecutar,
+        args=(current_app._get_current_object(), carpeta, formato or formato_por_defecto(), hotel_actual()),
+        daemon=True
+    )
+    hilo.start()
+
+    return jsonify({'ok': True, 'id': job_id, 'estado': 'en_proceso'}), 202
+
+
+# =========================================================
+# CONSULTAR ESTADO
+# =========================================================
+@exportaciones_bp.route('/<job_id>', methods=['GET'])
+@jwt_required()
+def estado_exportacion(job_id):
+    carpeta = _carpeta(os.path.basename(job_id))
+    if not os.path.isdir(carpeta):
+        return jsonify({'ok': False, 'msg': 'Exportación no encontrada'}), 404
+
+    estado = _estado(carpeta)
+    out = {'ok': True, 'id': job_id, 'estado': estado}
+    if estado == 'error':
+        with open(os.path.join(carpeta, 'error.txt')) as f:
+            out['error'] = f.read()
+    return jsonify(out), 200
+
+
+# =========================================================
+# DESCARGAR RESULTADO
+# =========================================================
+@exportaciones_bp.route('/<job_id>/descarga', methods=['GET'])
+@jwt_required()
+def descargar_exportacion(job_id):
+    carpeta = _carpeta(os.path.basename(job_id))
+    if not os.path.isdir(carpeta):
+        return jsonify({'ok': False, 'msg': 'Exportación no encontrada'}), 404
+    if _estado(carpeta) != 'listo':
+        return jsonify({'ok': False, 'msg': 'La exportación no está lista'}), 409
+
+    return send_file(
+        os.path.join(carpeta, 'exportacion.zip'),
+        mimetype='application/zip',
+        as_attachment=True,
+        download_name=f'exportacion_{job_id}.zip'
+    )
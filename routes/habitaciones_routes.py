@@ -1,6 +1,11 @@
 from flask import Blueprint, jsonify, request
-from models import db, Habitacion, Reserva, DetalleReserva
+from models import db, Habitacion
 from flask_jwt_extended import jwt_required
+from services import lecturas
+from services.versionado import no_modificado, con_etag, precondicion_fallida, conflicto_version
+from services.eventos import publicar
+from services import espera
+from sqlalchemy.orm.exc import StaleDataError
 from datetime import datetime
 
 habitaciones_bp = Blueprint("habitaciones_bp", __name__, url_prefix="/api/habitaciones")
@@ -23,24 +28,7 @@ def habitaciones_disponibles():
     except ValueError:
         return jsonify({'ok': False, 'msg': 'Formato de fecha inválido'}), 400
 
-    sub = db.session.query(DetalleReserva.habitacion_id).join(Reserva).filter(
-        Reserva.fecha_inicio <= end_date,
-        Reserva.fecha_fin >= start_date
-    ).subquery()
-
-    disponibles = Habitacion.query.filter(
-        ~Habitacion.id.in_(sub),
-        Habitacion.estado != "inactivo"
-    ).all()
-
-    out = [{
-        'id': h.id,
-        'numero': h.numero,
-        'tipo': h.tipo.nombre if h.tipo else None,
-        'precio': h.precio,
-        'estado': h.estado
-    } for h in disponibles]
-
+    out = lecturas.habitaciones_disponibles(start_date, end_date)
     return jsonify(out), 200
 
 
@@ -50,15 +38,7 @@ def habitaciones_disponibles():
 @habitaciones_bp.route('/', methods=['GET'])
 @jwt_required()
 def listar_habitaciones():
-    habitaciones = Habitacion.query.filter(Habitacion.estado != "inactivo").all()
-    out = [{
-        "id": h.id,
-        "numero": h.numero,
-        "tipo_id": h.tipo_id,
-        "tipo": h.tipo.nombre if h.tipo else None,
-        "precio": h.precio,
-        "estado": h.estado
-    } for h in habitaciones]
+    out = lecturas.listar_habitaciones()
     return jsonify(out), 200
 
 
@@ -73,14 +53,19 @@ def obtener_habitacion(id):
     if not habitacion or habitacion.estado == "inactivo":
         return jsonify({"msg": "Habitación no encontrada"}), 404
 
-    return jsonify({
+    no_mod = no_modificado(habitacion.version)
+    if no_mod:
+        return no_mod
+
+    return con_etag(jsonify({
         "id": habitacion.id,
         "numero": habitacion.numero,
         "tipo_id": habitacion.tipo_id,
         "tipo": habitacion.tipo.nombre if habitacion.tipo else None,
         "precio": habitacion.precio,
-        "estado": habitacion.estado
-    })
+        "estado": habitacion.estado,
+        "version": habitacion.version
+    }), habitacion.version)
 
 
 # ===========================
@@ -101,6 +86,8 @@ def crear_habitacion():
     db.session.add(nueva)
     db.session.commit()
 
+    espera.avisar(espera.habitacion_abierta, nueva)
+
     return jsonify({"msg": "Habitación creada", "id": nueva.id}), 201
 
 
@@ -115,15 +102,35 @@ def actualizar_habitacion(id):
     if not habitacion or habitacion.estado == "inactivo":
         return jsonify({"msg": "Habitación no encontrada"}), 404
 
+    fallo = precondicion_fallida(habitacion.version)
+    if fallo:
+        return fallo
+
     data = request.json
+    antes = (habitacion.tipo_id, habitacion.estado)
     habitacion.numero = data.get('numero', habitacion.numero)
     habitacion.tipo_id = data.get('tipo_id', habitacion.tipo_id)
     habitacion.precio = data.get('precio', habitacion.precio)
     habitacion.estado = data.get('estado', habitacion.estado)
+    publicar('habitacion', {
+        'id': habitacion.id,
+        'estado': habitacion.estado,
+        'precio': habitacion.precio
+    }, habitacion.hotel_id)
 
-    db.session.commit()
-
-    return jsonify({"msg": "Habitación actualizada"}), 200
+    try:
+        db.session.flush()
+        version = habitacion.version
+        db.session.commit()
+    except StaleDataError:
+        db.session.rollback()
+        return conflicto_version()
+
+    # Vuelve a admitir reservas, o pasa a otro tipo: su calendario es capacidad nueva para la lista de espera
+    if habitacion.tipo_id != antes[0] or antes[1] in espera.NO_ASIGNABLES:
+        espera.avisar(espera.habitacion_abierta, habitacion)
+
+    return con_etag(jsonify({"msg": "Habitación actualizada"}), version), 200
 
 
 # ==============================
@@ -0,0 +1,48 @@
+from flask import Blueprint, request, jsonify
+from models import db, Hotel, hotel_actual
+from flask_jwt_extended import jwt_required
+
+hoteles_bp = Blueprint("hoteles_bp", __name__, url_prefix="/api/hoteles")
+
+
+# =========================================================
+# LISTAR HOTELES
+# =========================================================
+@hoteles_bp.route('/', methods=['GET'])
+@jwt_required()
+def listar_hoteles():
+    consulta = Hotel.query.filter_by(activo=True)
+    if hotel_actual() is not None:
+        consulta = consulta.filter_by(id=hotel_actual())
+
+    return jsonify([{
+        "id": h.id,
+        "codigo": h.codigo,
+        "nombre": h.nombre
+    } for h in consulta.all()]), 200
+
+
+# =========================================================
+# CREAR HOTEL (SOLO USUARIOS DE GRUPO)
+# =========================================================
+@hoteles_bp.route('/', methods=['POST'])
+@jwt_required()
+def crear_hotel():
+    if hotel_actual() is not None:
+        return jsonify({"ok": False, "msg": "Solo usuarios del grupo pueden crear hoteles"}), 403
+
+    data = request.json
+    codigo = data.get("codigo")
+    nombre = data.get("nombre")
+
+    if not all([codigo, nombre]):
+        return jsonify({"ok": False, "msg": "Código y nombre son obligatorios"}), 400
+
+    if Hotel.query.filter_by(codigo=codigo).first():
+        return jsonify({"ok": False, "msg": "El código ya está registrado"}), 400
+
+    h = Hotel(codigo=codigo, nombre=nombre)
+    db.session.add(h)
+    db.session.commit()
+
+    return jsonify({"ok": True, "msg": "Hotel creado", "id": h.id}), 201
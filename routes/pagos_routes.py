@@ -0,0 +1,125 @@
+from flask import Blueprint, request, jsonify
+from models import db, Pago, Reserva
+from flask_jwt_extended import jwt_required
+from services.pagos import registrar_movimiento, conciliar_saldos
+from services.carga import prioridad
+
+pagos_bp = Blueprint("pagos_bp", __name__, url_prefix="/api/pagos")
+
+
+def _leer_monto(data):
+    try:
+        monto = float(data.get("monto"))
+    except (TypeError, ValueError):
+        return None
+    return monto if monto > 0 else None
+
+
+# =========================================================
+# LISTAR PAGOS DE UNA RESERVA
+# =========================================================
+@pagos_bp.route('/reserva/<int:reserva_id>', methods=['GET'])
+@jwt_required()
+def listar_pagos_reserva(reserva_id):
+    r = Reserva.query.get_or_404(reserva_id)
+    pagos = Pago.query.filter_by(reserva_id=reserva_id).order_by(Pago.fecha).all()
+
+    return jsonify({
+        "reserva_id": r.id,
+        "total": r.total,
+        "pagado": r.pagado,
+        "saldo": r.saldo,
+        "pagos": [{
+            "id": p.id,
+            "monto": p.monto,
+            "metodo": p.metodo,
+            "tipo": p.tipo,
+            "fecha": p.fecha.isoformat() if p.fecha else None
+        } for p in pagos]
+    }), 200
+
+
+# =========================================================
+# REGISTRAR PAGO (TOTAL O PARCIAL)
+# =========================================================
+@pagos_bp.route('/', methods=['POST'])
+@prioridad('critica')
+@jwt_required()
+def registrar_pago():
+    data = request.json
+    reserva_id = data.get("reserva_id")
+    monto = _leer_monto(data)
+
+    if not reserva_id or monto is None:
+        return jsonify({"ok": False, "msg": "reserva_id y un monto positivo son obligatorios"}), 400
+
+    resultado = registrar_movimiento(reserva_id, monto, data.get("metodo"), 'pago')
+    if resultado is None:
+        db.session.rollback()
+        return jsonify({"ok": False, "msg": "Reserva no encontrada"}), 404
+
+    pago, pagado, saldo = resultado
+    db.session.commit()
+
+    return jsonify({"ok": True, "id": pago.id, "pagado": pagado, "saldo": saldo}), 201
+
+
+# =========================================================
+# REGISTRAR REEMBOLSO
+# =========================================================
+@pagos_bp.route('/reembolso', methods=['POST'])
+@prioridad('critica')
+@jwt_required()
+def registrar_reembolso():
+    data = request.json
+    reserva_id = data.get("reserva_id")
+    monto = _leer_monto(data)
+
+    if not reserva_id or monto is None:
+        return jsonify({"ok": False, "msg": "reserva_id y un monto positivo son obligatorios"}), 400
+
+    resultado = registrar_movimiento(reserva_id, -monto, data.get("metodo"), 'reembolso')
+    if resultado is None:
+        db.session.rollback()
+        if not db.session.get(Reserva, reserva_id):
+            return jsonify({"ok": False, "msg": "Reserva no encontrada"}), 404
+        return jsonify({"ok": False, "msg": "El reembolso supera lo pagado"}), 400
+
+    pago, pagado, saldo = resultado
+    db.session.commit()
+
+    return jsonify({"ok": True, "id": pago.id, "pagado": pagado, "saldo": saldo}), 201
+
+
+# =========================================================
+# RESERVAS CON SALDO PENDIENTE
+# =========================================================
+@pagos_bp.route('/pendientes', methods=['GET'])
+@jwt_required()
+def reservas_con_saldo():
+    # Usa el índice parcial ix_reservas_saldo_pendiente (saldo > 0)
+    reservas = Reserva.query.filter(
+        Reserva.saldo > 0,
+        Reserva.estado != 'cancelada'
+    ).order_by(Reserva.saldo.desc()).all()
+
+    return jsonify([{
+        "id": r.id,
+        "cliente_id": r.cliente_id,
+        "fecha_inicio": r.fecha_inicio.isoformat(),
+        "fecha_fin": r.fecha_fin.isoformat(),
+        "estado": r.estado,
+        "total": r.total,
+        "pagado": r.pagado,
+        "saldo": r.saldo
+    } for r in reservas]), 200
+
+
+# =========================================================
+# CONCILIAR SALDOS
+# =========================================================
+@pagos_bp.route('/conciliar', methods=['POST'])
+@jwt_required()
+def conciliar():
+    corregidas = conciliar_saldos()
+    return jsonify({"ok": True, "corregidas": corregidas}), 200
@@ -1,24 +1,63 @@
-from flask import Blueprint, jsonify
-from models import db, Pago, Reserva, Habitacion, DetalleReserva
+from flask import Blueprint, jsonify, request
+from models import db, Pago, Reserva, Habitacion, DetalleReserva, Cliente, ResumenCliente
 from flask_jwt_extended import jwt_required
+from datetime import datetime, timedelta
+from services.ritmo import informe_ritmo, disponible as ritmo_disponible
+from services.consumos import informe_consumos, DIMENSIONES as DIMENSIONES_CONSUMO
 
 reportes_bp = Blueprint("reportes_bp", __name__, url_prefix="/api/reportes")
 
 
+class FechaInvalida(Exception):
+    pass
+
+
+def _rango_fechas():
+    """Lee ?desde=&hasta= (YYYY-MM-DD, opcionales). Acotar el rango permite podar particiones."""
+    desde = request.args.get('desde')
+    hasta = request.args.get('hasta')
+    try:
+        desde = datetime.strptime(desde, '%Y-%m-%d').date() if desde else None
+        hasta = datetime.strptime(hasta, '%Y-%m-%d').date() if hasta else None
+    except ValueError:
+        raise FechaInvalida()
+    return desde, hasta
+
+
+@reportes_bp.errorhandler(FechaInvalida)
+def fecha_invalida(e):
+    return jsonify({'ok': False, 'msg': 'Formato de fecha inválido'}), 400
+
+
 @reportes_bp.route('/reservas-por-estado', methods=['GET'])
 @jwt_required()
 def reporte_reservas_por_estado():
-    resultados = db.session.query(Reserva.estado, db.func.count(Reserva.id)).group_by(Reserva.estado).all()
+    desde, hasta = _rango_fechas()
+    consulta = db.session.query(Reserva.estado, db.func.count(Reserva.id))
+    if desde:
+        consulta = consulta.filter(Reserva.fecha_inicio >= desde)
+    if hasta:
+        consulta = consulta.filter(Reserva.fecha_inicio <= hasta)
+
+    resultados = consulta.group_by(Reserva.estado).all()
     return jsonify([{'estado': e, 'cantidad': c} for e, c in resultados]), 200
 
 
 @reportes_bp.route('/ingresos', methods=['GET'])
 @jwt_required()
 def reporte_ingresos():
-    resultados = db.session.query(
+    desde, hasta = _rango_fechas()
+    consulta = db.session.query(
         db.func.date(Pago.fecha).label('fecha'),
         db.func.sum(Pago.monto)
-    ).group_by(db.func.date(Pago.fecha)).all()
+    )
+    # Rango sobre la columna de partición (no sobre date(fecha)) para que Postgres pode
+    if desde:
+        consulta = consulta.filter(Pago.fecha >= desde)
+    if hasta:
+        consulta = consulta.filter(Pago.fecha < hasta + timedelta(days=1))
+
+    resultados = consulta.group_by(db.func.date(Pago.fecha)).all()
 
     return jsonify([{'fecha': str(f), 'ingresos': float(i)} for f, i in resultados]), 200
 
@@ -26,9 +65,98 @@ def reporte_ingresos():
 @reportes_bp.route('/habitaciones-populares', methods=['GET'])
 @jwt_required()
 def reporte_habitaciones_populares():
-    resultados = db.session.query(
+    desde, hasta = _rango_fechas()
+    consulta = db.session.query(
         Habitacion.numero,
         db.func.count(DetalleReserva.id)
-    ).join(DetalleReserva).group_by(Habitacion.numero).order_by(db.func.count(DetalleReserva.id).desc()).limit(10).all()
+    ).join(DetalleReserva)
+    if desde or hasta:
+        consulta = consulta.join(Reserva, Reserva.id == DetalleReserva.reserva_id)
+        if desde:
+            consulta = consulta.filter(Reserva.fecha_inicio >= desde)
+        if hasta:
+            consulta = consulta.filter(Reserva.fecha_inicio <= hasta)
+
+    resultados = consulta.group_by(Habitacion.numero).order_by(db.func.count(DetalleReserva.id).desc()).limit(10).all()
+
+    return jsonify([{'habitacion': n, 'reservas': c} for n, c in resultados]), 200
+
+
+@reportes_bp.route('/ritmo', methods=['GET'])
+@jwt_required()
+def reporte_ritmo():
+    """Pace/pickup: room-nights en cartera por fecha de estancia frente al año anterior."""
+    if not ritmo_disponible():
+        return jsonify({'ok': False, 'msg': 'Instale numpy para este reporte'}), 501
+
+    dias = request.args.get('dias', 90, type=int)
+    if not 1 <= dias <= 365:
+        return jsonify({'ok': False, 'msg': 'dias debe estar entre 1 y 365'}), 400
+
+    return jsonify(informe_ritmo(dias)), 200
+
+
+ORDEN_HUESPEDES = {
+    'ingresos': ResumenCliente.ingresos,
+    'estancias': ResumenCliente.estancias,
+    'noches': ResumenCliente.noches,
+}
+
+
+@reportes_bp.route('/huespedes', methods=['GET'])
+@jwt_required()
+def reporte_huespedes():
+    """Mejores huéspedes y repetidores, desde resumen_clientes (sin recorrer reservas)."""
+    orden = request.args.get('orden', 'ingresos')
+    if orden not in ORDEN_HUESPEDES:
+        return jsonify({'ok': False, 'msg': f'orden debe ser uno de: {", ".join(ORDEN_HUESPEDES)}'}), 400
+    min_estancias = request.args.get('min_estancias', 1, type=int)
+    limite = min(request.args.get('limite', 20, type=int), 500)
+    if limite <= 0:
+        return jsonify({'ok': False, 'msg': 'limite debe ser positivo'}), 400
+
+    filas = db.session.query(ResumenCliente, Cliente.nombre).join(
+        Cliente, Cliente.id == ResumenCliente.cliente_id
+    ).filter(
+        ResumenCliente.estancias >= min_estancias
+    ).order_by(ORDEN_HUESPEDES[orden].desc(), ResumenCliente.cliente_id).limit(limite).all()
+
+    con_estancia, repetidores = db.session.query(
+        db.func.count(ResumenCliente.cliente_id).filter(ResumenCliente.estancias >= 1),
+        db.func.count(ResumenCliente.cliente_id).filter(ResumenCliente.estancias >= 2)
+    ).one()
+
+    return jsonify({
+        'con_estancia': con_estancia,
+        'repetidores': repetidores,
+        'tasa_repeticion': round(repetidores / con_estancia, 4) if con_estancia else None,
+        'clientes': [{
+            'cliente_id': r.cliente_id,
+            'nombre': nombre,
+            'estancias': r.estancias,
+            'noches': r.noches,
+            'ingresos': r.ingresos,
+            'pagado': r.pagado,
+            'primera_estancia': r.primera_estancia,
+            'ultima_estancia': r.ultima_estancia
+        } for r, nombre in filas]
+    }), 200
+
+
+@reportes_bp.route('/consumos', methods=['GET'])
+@jwt_required()
+def reporte_consumos():
+    """Servicios consumidos agrupados por ?agrupar=servicio,fecha,tipo (tipo de habitación)."""
+    desde, hasta = _rango_fechas()
+    agrupar = [d for d in request.args.get('agrupar', 'servicio').split(',') if d]
+    invalidas = [d for d in agrupar if d not in DIMENSIONES_CONSUMO]
+    if invalidas:
+        return jsonify({'ok': False, 'msg': f'agrupar admite: {", ".join(DIMENSIONES_CONSUMO)}'}), 400
 
-    return jsonify([{'habitacion': n, 'reservas': c} for n, c in resultados]), 200
\ No newline at end of file
+    filas = informe_consumos(agrupar, desde, hasta + timedelta(days=1) if hasta else None)
+    return jsonify({
+        'agrupar': agrupar,
+        'cantidad': sum(f['cantidad'] or 0 for f in filas),
+        'importe': sum(f['importe'] or 0 for f in filas),
+        'filas': filas
+    }), 200
@@ -1,7 +1,22 @@
-from flask import Blueprint, jsonify, request
-from models import db, Reserva, Habitacion, DetalleReserva, Cliente
+from flask import Blueprint, jsonify, request, abort
+from models import db, Reserva, Habitacion, DetalleReserva, Cliente, EsperaReserva, TipoHabitacion, hotel_actual
 from flask_jwt_extended import jwt_required
+from services.conflictos import detectar_conflictos
+from services.archivo import leer_archivo
+from services import lecturas
+from services.versionado import no_modificado, con_etag, precondicion_fallida, conflicto_version
+from services.carga import prioridad, comprobar_plazo
+from services.eventos import publicar, publicar_ocupacion
+from services.cambios import leer_cambios, CursorInvalido
+from services.catalogo import catalogo
+from services.asignacion import asignar_habitaciones, comprobar_ofertas, SinDisponibilidad
+from services import consumos, espera
+from services.consumos import LineaInvalida
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.orm.attributes import flag_modified
 from datetime import datetime
+from itertools import islice
+import base64
 
 reservas_bp = Blueprint("reservas_bp", __name__, url_prefix="/api/reservas")
 
@@ -11,28 +26,28 @@ reservas_bp = Blueprint("reservas_bp", __name__, url_prefix="/api/reservas")
 @reservas_bp.route('/', methods=['GET'])
 @jwt_required()
 def listar_reservas():
-    reservas = Reserva.query.all()
-
-    data = []
-    for r in reservas:
-        data.append({
-            "id": r.id,
-            "cliente": r.cliente.nombre if r.cliente else None,
-            "cliente_id": r.cliente_id,
-            "fecha_inicio": r.fecha_inicio.isoformat(),
-            "fecha_fin": r.fecha_fin.isoformat(),
-            "estado": r.estado,
-            "total": r.total,
-            "habitaciones": [
-                {
-                    "id": d.habitacion.id,
-                    "numero": d.habitacion.numero,
-                    "precio": d.precio
-                } for d in r.detalles
-            ]
-        })
-
-    return jsonify(data), 200
+    return jsonify(lecturas.listar_reservas()), 200
+
+
+# =========================================================
+# CAMBIOS DESDE UN CURSOR (SINCRONIZACIÓN INCREMENTAL)
+# =========================================================
+MAX_CAMBIOS = 1000
+
+
+@reservas_bp.route('/cambios', methods=['GET'])
+@jwt_required()
+def listar_cambios():
+    limite = min(request.args.get('limite', 500, type=int), MAX_CAMBIOS)
+    if limite <= 0:
+        return jsonify({'ok': False, 'msg': 'limite debe ser positivo'}), 400
+
+    try:
+        cambios, siguiente, hay_mas = leer_cambios(request.args.get('since'), limite)
+    except CursorInvalido:
+        return jsonify({'ok': False, 'msg': 'Cursor inválido'}), 400
+
+    return jsonify({'cambios': cambios, 'siguiente': siguiente, 'hay_mas': hay_mas}), 200
 
 
 # =========================================================
@@ -41,29 +56,159 @@ def listar_reservas():
 @reservas_bp.route('/<int:id>', methods=['GET'])
 @jwt_required()
 def obtener_reserva(id):
-    r = Reserva.query.get_or_404(id)
+    r = lecturas.obtener_reserva(id)
+    if r is None:
+        abort(404)
+
+    # Si el cliente ya tiene esta versión no hace falta cargar las habitaciones
+    no_mod = no_modificado(r["version"])
+    if no_mod:
+        return no_mod
+
+    r["habitaciones"] = lecturas.habitaciones_de_reserva(id)
+    return con_etag(jsonify(r), r["version"]), 200
+
+
+# =========================================================
+# CALENDARIO DE OCUPACIÓN (HABITACIONES x DÍAS)
+# =========================================================
+MAX_DIAS_CALENDARIO = 366
+
+@reservas_bp.route('/calendario', methods=['GET'])
+@jwt_required()
+def calendario_ocupacion():
+    start = request.args.get('start')
+    end = request.args.get('end')
+    formato = request.args.get('formato', 'rle')
+
+    if not start or not end:
+        return jsonify({'ok': False, 'msg': 'Debe proporcionar start y end'}), 400
+
+    try:
+        start_date = datetime.strptime(start, '%Y-%m-%d').date()
+        end_date = datetime.strptime(end, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'ok': False, 'msg': 'Formato de fecha inválido'}), 400
+
+    dias = (end_date - start_date).days + 1
+    if dias < 1 or dias > MAX_DIAS_CALENDARIO:
+        return jsonify({'ok': False, 'msg': f'El rango debe tener entre 1 y {MAX_DIAS_CALENDARIO} días'}), 400
+
+    if formato not in ('rle', 'bitset'):
+        return jsonify({'ok': False, 'msg': 'formato debe ser rle o bitset'}), 400
+
+    # Una sola consulta: todas las habitaciones activas con sus estancias en el rango
+    ocupacion = db.select(
+        DetalleReserva.habitacion_id,
+        Reserva.id.label('reserva_id'),
+        Reserva.fecha_inicio,
+        Reserva.fecha_fin
+    ).join(Reserva, Reserva.id == DetalleReserva.reserva_id).where(
+        Reserva.fecha_inicio <= end_date,
+        Reserva.fecha_fin >= start_date,
+        Reserva.estado != 'cancelada'
+    ).subquery()
+
+    filas = db.session.execute(
+        db.select(
+            Habitacion.id,
+            Habitacion.numero,
+            ocupacion.c.reserva_id,
+            ocupacion.c.fecha_inicio,
+            ocupacion.c.fecha_fin
+        ).outerjoin(ocupacion, ocupacion.c.habitacion_id == Habitacion.id)
+        .where(Habitacion.estado != 'inactivo')
+        # Por id y no por número: con varios hoteles el número se repite y se mezclarían las filas
+        .order_by(Habitacion.hotel_id, Habitacion.id, ocupacion.c.fecha_inicio)
+    ).all()
+
+    habitaciones = []
+    actual = None
+    for hab_id, numero, reserva_id, fi, ff in filas:
+        if actual is None or actual['id'] != hab_id:
+            comprobar_plazo()
+            actual = {'id': hab_id, 'numero': numero, 'seg': [], 'bits': 0}
+            habitaciones.append(actual)
+        if reserva_id is None:
+            continue
+        # Se ocupan las noches [fecha_inicio, fecha_fin); el día de salida queda libre
+        desde = (fi - start_date).days
+        ini = max(desde, 0)
+        fin = min(desde + max((ff - fi).days, 1), dias)
+        if fin <= ini:
+            continue
+        if formato == 'rle':
+            actual['seg'].append([ini, fin - ini, reserva_id])
+        else:
+            actual['bits'] |= ((1 << (fin - ini)) - 1) << ini
+
+    n_bytes = (dias + 7) // 8
+    for h in habitaciones:
+        if formato == 'rle':
+            del h['bits']
+        else:
+            del h['seg']
+            h['bits'] = base64.b64encode(h['bits'].to_bytes(n_bytes, 'little')).decode('ascii')
 
     return jsonify({
-        "id": r.id,
-        "cliente_id": r.cliente_id,
-        "fecha_inicio": r.fecha_inicio.isoformat(),
-        "fecha_fin": r.fecha_fin.isoformat(),
-        "estado": r.estado,
-        "total": r.total,
-        "habitaciones": [
-            {
-                "id": d.habitacion.id,
-                "numero": d.habitacion.numero,
-                "precio": d.precio
-            } for d in r.detalles
-        ]
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+        'dias': dias,
+        'formato': formato,
+        'habitaciones': habitaciones
     }), 200
 
 
+# =========================================================
+# DETECTAR SOBREVENTA (RESERVAS SOLAPADAS EN UNA HABITACIÓN)
+# =========================================================
+@reservas_bp.route('/conflictos', methods=['GET'])
+@jwt_required()
+def listar_conflictos():
+    limite = request.args.get('limite', 1000, type=int)
+    if limite <= 0:
+        return jsonify({'ok': False, 'msg': 'limite debe ser positivo'}), 400
+
+    conflictos = list(islice(detectar_conflictos(), limite + 1))
+    truncado = len(conflictos) > limite
+
+    return jsonify({
+        'conflictos': conflictos[:limite],
+        'truncado': truncado
+    }), 200
+
+
+# =========================================================
+# CONSULTAR RESERVAS ARCHIVADAS (PERIODOS CERRADOS)
+# =========================================================
+@reservas_bp.route('/archivo', methods=['GET'])
+@jwt_required()
+def listar_reservas_archivadas():
+    desde = request.args.get('desde')
+    hasta = request.args.get('hasta')
+
+    if not desde or not hasta:
+        return jsonify({'ok': False, 'msg': 'Debe proporcionar desde y hasta (YYYY-MM)'}), 400
+
+    try:
+        desde_date = datetime.strptime(desde, '%Y-%m').date()
+        hasta_date = datetime.strptime(hasta, '%Y-%m').date()
+    except ValueError:
+        return jsonify({'ok': False, 'msg': 'Formato de fecha inválido'}), 400
+
+    return jsonify(leer_archivo(desde_date, hasta_date)), 200
+
+
+def _es_entero(valor):
+    # bool es subclase de int: true no es un id
+    return isinstance(valor, int) and not isinstance(valor, bool)
+
+
 # =========================================================
 # CREAR NUEVA RESERVA
 # =========================================================
 @reservas_bp.route('/registrar', methods=['POST'])
+@prioridad('critica')
 @jwt_required()
 def registrar_reserva():
     data = request.json
@@ -71,9 +216,39 @@ def registrar_reserva():
     fecha_inicio = data.get('fecha_inicio')
     fecha_fin = data.get('fecha_fin')
     habitaciones = data.get('habitaciones', [])
+    # Por tipo: [{"tipo_id": 1, "cantidad": 2}]; la habitación la elige services.asignacion
+    tipos = data.get('tipos', [])
 
-    if not all([cliente_id, fecha_inicio, fecha_fin, habitaciones]):
+    if not all([cliente_id, fecha_inicio, fecha_fin]) or not (habitaciones or tipos):
         return jsonify({'ok': False, 'msg': 'Datos incompletos'}), 400
+    if not isinstance(habitaciones, list) or not all(_es_entero(h) for h in habitaciones):
+        return jsonify({'ok': False, 'msg': 'habitaciones debe ser una lista de ids'}), 400
+    if not isinstance(tipos, list) or not all(isinstance(t, dict) for t in tipos):
+        return jsonify({'ok': False, 'msg': 'tipos debe ser una lista de objetos'}), 400
+    for t in tipos:
+        if not _es_entero(t.get('tipo_id')):
+            return jsonify({'ok': False, 'msg': 'Cada tipo necesita un tipo_id entero'}), 400
+        cantidad = t.get('cantidad', 1)
+        if not _es_entero(cantidad) or cantidad < 1:
+            return jsonify({'ok': False, 'msg': 'La cantidad de cada tipo debe ser un entero positivo'}), 400
+    # Consulta ORM: la tenencia y las bajas lógicas dejan fuera tipos ajenos o dados de baja
+    pedidos = {t['tipo_id'] for t in tipos}
+    validos = set(db.session.execute(
+        db.select(TipoHabitacion.id).where(TipoHabitacion.id.in_(pedidos))
+    ).scalars()) if pedidos else set()
+    if pedidos - validos:
+        return jsonify({'ok': False, 'msg': f'Tipo de habitación no válido: {sorted(pedidos - validos)[0]}'}), 400
+    # Una habitación repetida en la lista no se reserva dos veces
+    habitaciones = list(dict.fromkeys(habitaciones))
+    # Reserva que atiende una entrada de la lista de espera: su oferta no le quita el sitio
+    entrada = None
+    if data.get('espera_id') is not None:
+        entrada = db.session.get(EsperaReserva, data['espera_id'])
+        if entrada is None:
+            return jsonify({'ok': False, 'msg': 'Entrada de lista de espera no encontrada'}), 404
+        if entrada.estado not in ('pendiente', 'ofrecida'):
+            return jsonify({'ok': False, 'msg': f'La entrada ya está {entrada.estado}'}), 400
+    oferta = entrada.id if entrada else None
 
     r = Reserva(
         cliente_id=cliente_id,
@@ -85,16 +260,41 @@ def registrar_reserva():
     db.session.add(r)
     db.session.flush()
 
+    # Las elegidas a mano solo quedan fijas si se pide: si no, la reoptimización puede moverlas
+    fijadas = set(habitaciones) if data.get('fijar') else set()
+    try:
+        comprobar_ofertas(habitaciones, r.fecha_inicio, r.fecha_fin, oferta=oferta)
+        for t in tipos:
+            # Fuera las ya elegidas, a mano o para una entrada anterior del mismo tipo
+            habitaciones = habitaciones + asignar_habitaciones(
+                t['tipo_id'], t.get('cantidad', 1), r.fecha_inicio, r.fecha_fin,
+                excluir=set(habitaciones), oferta=oferta
+            )
+    except SinDisponibilidad as e:
+        db.session.rollback()
+        return jsonify({'ok': False, 'msg': f'Sin disponibilidad para el tipo {e.tipo_id}'}), 409
+
     total = 0
+    cat = catalogo()
     for hab_id in habitaciones:
-        h = Habitacion.query.get(hab_id)
+        h = cat.habitacion(hab_id, hotel_actual())
         if not h:
             continue
-        d = DetalleReserva(reserva_id=r.id, habitacion_id=h.id, precio=h.precio)
-        total += h.precio
+        # Usuarios de grupo: la reserva pertenece al hotel de sus habitaciones
+        if r.hotel_id is None:
+            r.hotel_id = h["hotel_id"]
+        d = DetalleReserva(reserva_id=r.id, habitacion_id=h["id"], precio=h["precio"], hotel_id=h["hotel_id"],
+                           fijada=h["id"] in fijadas)
+        total += h["precio"]
         db.session.add(d)
 
     r.total = total
+    r.saldo = total
+    if entrada is not None:
+        entrada.estado = 'atendida'
+        entrada.reserva_id = r.id
+    publicar('reserva', {'id': r.id, 'estado': r.estado}, r.hotel_id)
+    publicar_ocupacion(r, {d.habitacion_id for d in r.detalles}, disponible=False)
     db.session.commit()
 
     return jsonify({'ok': True, 'reserva_id': r.id, 'total': total}), 201
@@ -107,6 +307,10 @@ def registrar_reserva():
 @jwt_required()
 def actualizar_reserva(id):
     r = Reserva.query.get_or_404(id)
+    fallo = precondicion_fallida(r.version)
+    if fallo:
+        return fallo
+
     data = request.json
 
     if 'cliente_id' in data:
@@ -119,10 +323,19 @@ def actualizar_reserva(id):
         r.fecha_fin = datetime.strptime(data['fecha_fin'], '%Y-%m-%d').date()
 
     if 'estado' in data:
+        if data['estado'] == 'cancelada' and r.estado != 'cancelada':
+            r.fecha_cancelacion = datetime.utcnow()
         r.estado = data['estado']
 
-    db.session.commit()
-    return jsonify({'ok': True, 'msg': 'Reserva actualizada correctamente'}), 200
+    try:
+        db.session.flush()
+        version = r.version
+        db.session.commit()
+    except StaleDataError:
+        db.session.rollback()
+        return conflicto_version()
+
+    return con_etag(jsonify({'ok': True, 'msg': 'Reserva actualizada correctamente'}), version), 200
 
 
 # =========================================================
@@ -132,23 +345,135 @@ def actualizar_reserva(id):
 @jwt_required()
 def actualizar_habitaciones(id):
     r = Reserva.query.get_or_404(id)
+    fallo = precondicion_fallida(r.version)
+    if fallo:
+        return fallo
+
     habitaciones = request.json.get("habitaciones", [])
+    fijar = bool(request.json.get("fijar", False))
+    anteriores = {hid for (hid,) in db.session.query(DetalleReserva.habitacion_id).filter_by(reserva_id=id)}
 
     # eliminar detalles anteriores
     DetalleReserva.query.filter_by(reserva_id=id).delete()
 
     total = 0
+    nuevas = set()
+    cat = catalogo()
     for hab_id in habitaciones:
-        h = Habitacion.query.get(hab_id)
+        h = cat.habitacion(hab_id, hotel_actual())
         if h:
-            d = DetalleReserva(reserva_id=id, habitacion_id=h.id, precio=h.precio)
+            d = DetalleReserva(reserva_id=id, habitacion_id=h["id"], precio=h["precio"], hotel_id=h["hotel_id"],
+                               fijada=fijar)
             db.session.add(d)
-            total += h.precio
+            nuevas.add(h["id"])
+            total += h["precio"]
 
+    # Los servicios cargados siguen formando parte del total
+    total += consumos.importe_servicios(id)
     r.total = total
+    r.saldo = total - (r.pagado or 0)
+    # Cambian los detalles aunque el total sea el mismo: forzamos nueva versión
+    flag_modified(r, 'total')
+    liberadas = anteriores - nuevas if r.estado != 'cancelada' else set()
+    if r.estado != 'cancelada':
+        publicar_ocupacion(r, liberadas, disponible=True)
+        publicar_ocupacion(r, nuevas - anteriores, disponible=False)
+    inicio, fin = r.fecha_inicio, r.fecha_fin
+
+    try:
+        db.session.flush()
+        version = r.version
+        db.session.commit()
+    except StaleDataError:
+        db.session.rollback()
+        return conflicto_version()
+
+    espera.avisar(espera.liberadas, liberadas, inicio, fin)
+    return con_etag(jsonify({"ok": True, "msg": "Habitaciones actualizadas", "total": total}), version), 200
+
+
+# =========================================================
+# SERVICIOS ADICIONALES DE UNA RESERVA
+# =========================================================
+@reservas_bp.errorhandler(LineaInvalida)
+def linea_invalida(e):
+    return jsonify({'ok': False, 'msg': e.msg}), e.status
+
+
+@reservas_bp.route('/<int:id>/servicios', methods=['GET'])
+@jwt_required()
+def listar_servicios_reserva(id):
+    r = lecturas.obtener_reserva(id)
+    if r is None:
+        abort(404)
+
+    return jsonify({
+        'reserva_id': id,
+        'total': r["total"],
+        'saldo': r["saldo"],
+        'servicios': consumos.consumos_de_reserva(id)
+    }), 200
+
+
+@reservas_bp.route('/<int:id>/servicios', methods=['POST'])
+@prioridad('critica')
+@jwt_required()
+def agregar_servicios_reserva(id):
+    """Acepta una línea ({servicio_id, cantidad}) o varias en ``servicios``."""
+    r = lecturas.obtener_reserva(id)
+    if r is None:
+        abort(404)
+    fallo = precondicion_fallida(r["version"])
+    if fallo:
+        return fallo
+
+    data = request.json or {}
+    lineas = data.get('servicios', [data])
+    if not isinstance(lineas, list):
+        return jsonify({'ok': False, 'msg': 'servicios debe ser una lista'}), 400
+    lineas = [dict(l, reserva_id=id) if isinstance(l, dict) else l for l in lineas]
+
+    total, saldo, version = consumos.agregar_consumos(lineas)[id]
     db.session.commit()
 
-    return jsonify({"ok": True, "msg": "Habitaciones actualizadas", "total": total}), 200
+    return con_etag(jsonify({'ok': True, 'msg': 'Servicios cargados', 'total': total, 'saldo': saldo}), version), 201
+
+
+@reservas_bp.route('/servicios/lote', methods=['POST'])
+@prioridad('critica')
+@jwt_required()
+def agregar_servicios_lote():
+    """Carga líneas en varias reservas en una sola transacción: o entran todas o ninguna."""
+    lineas = (request.json or {}).get('lineas')
+    if not isinstance(lineas, list):
+        return jsonify({'ok': False, 'msg': 'lineas debe ser una lista'}), 400
+
+    totales = consumos.agregar_consumos(lineas)
+    db.session.commit()
+
+    return jsonify({'ok': True, 'lineas': len(lineas), 'reservas': [
+        {'reserva_id': rid, 'total': total, 'saldo': saldo}
+        for rid, (total, saldo, version) in sorted(totales.items())
+    ]}), 201
+
+
+@reservas_bp.route('/<int:id>/servicios/<int:linea_id>', methods=['DELETE'])
+@jwt_required()
+def quitar_servicio_reserva(id, linea_id):
+    r = lecturas.obtener_reserva(id)
+    if r is None:
+        abort(404)
+    fallo = precondicion_fallida(r["version"])
+    if fallo:
+        return fallo
+
+    resultado = consumos.quitar_consumo(id, linea_id)
+    if resultado is None:
+        return jsonify({'ok': False, 'msg': 'Servicio no encontrado en la reserva'}), 404
+    total, saldo, version = resultado
+    db.session.commit()
+
+    return con_etag(jsonify({'ok': True, 'msg': 'Servicio quitado', 'total': total, 'saldo': saldo}), version), 200
 
 
 # =========================================================
@@ -163,8 +488,16 @@ def cancelar_reserva(id):
         return jsonify({'ok': False, 'msg': 'La reserva ya está cancelada'}), 400
 
     r.estado = 'cancelada'
+    r.fecha_cancelacion = datetime.utcnow()
+    habitaciones = {d.habitacion_id for d in r.detalles}
+    inicio, fin = r.fecha_inicio, r.fecha_fin
+    publicar('reserva', {'id': r.id, 'estado': r.estado}, r.hotel_id)
+    publicar_ocupacion(r, habitaciones, disponible=True)
     db.session.commit()
 
+    # Ya confirmada la cancelación: se ofrece lo liberado a la lista de espera
+    espera.avisar(espera.liberadas, habitaciones, inicio, fin)
+
     return jsonify({'ok': True, 'msg': 'Reserva cancelada correctamente'}), 200
 
 
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from models import db, Servicio
 from flask_jwt_extended import jwt_required
+from services.versionado import no_modificado, con_etag, precondicion_fallida, conflicto_version
+from sqlalchemy.orm.exc import StaleDataError
 
 servicios_bp = Blueprint("servicios_bp", __name__, url_prefix="/api/servicios")
 
@@ -29,11 +31,16 @@ def listar_servicios():
 def obtener_servicio(id):
     s = Servicio.query.get_or_404(id)
 
-    return jsonify({
+    no_mod = no_modificado(s.version)
+    if no_mod:
+        return no_mod
+
+    return con_etag(jsonify({
         "id": s.id,
         "nombre": s.nombre,
-        "precio": s.precio
-    }), 200
+        "precio": s.precio,
+        "version": s.version
+    }), s.version), 200
 
 
 # =========================================================
@@ -63,6 +70,10 @@ def crear_servicio():
 @jwt_required()
 def actualizar_servicio(id):
     s = Servicio.query.get_or_404(id)
+    fallo = precondicion_fallida(s.version)
+    if fallo:
+        return fallo
+
     data = request.json
 
     if "nombre" in data:
@@ -71,8 +82,15 @@ def actualizar_servicio(id):
     if "precio" in data:
         s.precio = data["precio"]
 
-    db.session.commit()
-    return jsonify({"ok": True, "msg": "Servicio actualizado"}), 200
+    try:
+        db.session.flush()
+        version = s.version
+        db.session.commit()
+    except StaleDataError:
+        db.session.rollback()
+        return conflicto_version()
+
+    return con_etag(jsonify({"ok": True, "msg": "Servicio actualizado"}), version), 200
 
 
 # =========================================================
@@ -83,7 +101,7 @@ def actualizar_servicio(id):
 def desactivar_servicio(id):
     s = Servicio.query.get_or_404(id)
 
-    s.nombre = s.nombre + " (inactivo)"
+    s.desactivar()
     db.session.commit()
 
     return jsonify({"ok": True, "msg": "Servicio desactivado"}), 200
@@ -95,7 +113,8 @@ def desactivar_servicio(id):
 @servicios_bp.route('/<int:id>', methods=['DELETE'])
 @jwt_required()
 def eliminar_servicio(id):
-    s = Servicio.query.get_or_404(id)
+    # También los dados de baja
+    s = Servicio.query.execution_options(incluir_borrados=True).get_or_404(id)
 
     db.session.delete(s)
     db.session.commit()
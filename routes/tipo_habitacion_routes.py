@@ -74,7 +74,7 @@ def eliminar_tipo(id):
         return jsonify({"msg": "Tipo no encontrado"}), 404
 
     # Eliminación lógica
-    tipo.activo = False
+    tipo.desactivar()
     db.session.commit()
 
     return jsonify({"msg": "Tipo eliminado"}), 200
\ No newline at end of file
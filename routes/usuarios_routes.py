@@ -1,10 +1,17 @@
 from flask import Blueprint, jsonify, request
-from models import db, Usuario
+from models import db, Usuario, hotel_actual
 from flask_jwt_extended import jwt_required
+from services.claves import ColaClavesLlena, respuesta_saturado
 
 usuarios_bp = Blueprint("usuarios_bp", __name__, url_prefix="/api/usuarios")
 
 
+@usuarios_bp.errorhandler(ColaClavesLlena)
+def cola_claves_llena(e):
+    db.session.rollback()
+    return respuesta_saturado()
+
+
 @usuarios_bp.route('', methods=['POST'])
 @jwt_required()
 def create_usuario():
@@ -16,11 +23,20 @@ def create_usuario():
     if Usuario.query.filter_by(username=data['username']).first():
         return jsonify({'ok': False, 'msg': 'El usuario ya existe'}), 400
 
+    # Un usuario de hotel solo crea usuarios de su hotel; los del grupo eligen cuál (o ninguno)
+    hotel_id = hotel_actual()
+    if hotel_id is not None:
+        if data.get('hotel_id', hotel_id) != hotel_id:
+            return jsonify({'ok': False, 'msg': 'Solo usuarios del grupo pueden crear usuarios de otro hotel'}), 403
+    else:
+        hotel_id = data.get('hotel_id')
+
     u = Usuario(
         username=data['username'],
         nombre=data.get('nombre'),
         email=data.get('email'),
-        role_id=data.get('role_id')
+        role_id=data.get('role_id'),
+        hotel_id=hotel_id
     )
     u.set_password(data['password'])
     db.session.add(u)
@@ -32,9 +48,14 @@ def create_usuario():
 @usuarios_bp.route('', methods=['GET'])
 @jwt_required()
 def list_usuarios():
-    all_u = Usuario.query.all()
+    # Usuario no lleva HotelMixin: el filtro por hotel va a mano
+    stmt = Usuario.query
+    if hotel_actual() is not None:
+        stmt = stmt.filter_by(hotel_id=hotel_actual())
+    all_u = stmt.all()
     out = [
-        {'id': u.id, 'username': u.username, 'nombre': u.nombre, 'email': u.email, 'role_id': u.role_id}
+        {'id': u.id, 'username': u.username, 'nombre': u.nombre, 'email': u.email, 'role_id': u.role_id,
+         'hotel_id': u.hotel_id}
         for u in all_u
     ]
     return jsonify(out), 200
\ No newline at end of file
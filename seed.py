@@ -1,5 +1,5 @@
 from app import create_app
-from models import db, Usuario, Rol, Permiso, Cliente, TipoHabitacion, Habitacion
+from models import db, Usuario, Rol, Permiso, Cliente, TipoHabitacion, Habitacion, Hotel
 from werkzeug.security import generate_password_hash
 
 app = create_app()
@@ -8,6 +8,11 @@ with app.app_context():
     db.drop_all()
     db.create_all()
 
+    # === Hoteles ===
+    hotel = Hotel(codigo='principal', nombre='Hotel Principal')
+    db.session.add(hotel)
+    db.session.commit()
+
     # === Roles ===
     admin_role = Rol(nombre='Administrador')
     recepcionista_role = Rol(nombre='Recepcionista')
@@ -38,7 +43,8 @@ with app.app_context():
         nombre='Recepcionista',
         email='recep@hotel.com',
         password_hash=generate_password_hash('123456'),
-        role=recepcionista_role
+        role=recepcionista_role,
+        hotel_id=hotel.id
     )
     db.session.add_all([admin, recep])
 
@@ -48,17 +54,17 @@ with app.app_context():
     db.session.add_all([cliente1, cliente2])
 
     # === Tipos de habitación ===
-    simple = TipoHabitacion(nombre='Simple', descripcion='Habitación individual con baño privado')
-    doble = TipoHabitacion(nombre='Doble', descripcion='Habitación doble con vista al mar')
-    suite = TipoHabitacion(nombre='Suite', descripcion='Suite con jacuzzi y minibar')
+    simple = TipoHabitacion(nombre='Simple', descripcion='Habitación individual con baño privado', hotel_id=hotel.id)
+    doble = TipoHabitacion(nombre='Doble', descripcion='Habitación doble con vista al mar', hotel_id=hotel.id)
+    suite = TipoHabitacion(nombre='Suite', descripcion='Suite con jacuzzi y minibar', hotel_id=hotel.id)
     db.session.add_all([simple, doble, suite])
     db.session.commit()
 
     # === Habitaciones ===
     habitaciones = [
-        Habitacion(numero='101', tipo=simple, precio=120.0, estado='disponible'),
-        Habitacion(numero='102', tipo=doble, precio=180.0, estado='disponible'),
-        Habitacion(numero='103', tipo=suite, precio=250.0, estado='mantenimiento'),
+        Habitacion(numero='101', tipo=simple, precio=120.0, estado='disponible', hotel_id=hotel.id),
+        Habitacion(numero='102', tipo=doble, precio=180.0, estado='disponible', hotel_id=hotel.id),
+        Habitacion(numero='103', tipo=suite, precio=250.0, estado='mantenimiento', hotel_id=hotel.id),
     ]
     db.session.add_all(habitaciones)
     db.session.commit()
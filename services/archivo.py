@@ -0,0 +1,111 @@
+import gzip
+import json
+from datetime import date, datetime
+
+from models import (
+    db, Reserva, DetalleReserva, Pago, ReservaServicio, Factura, CheckIn, CheckOut,
+    ArchivoReservas, EsperaReserva
+)
+from services.cambios import registrar_cambios
+from services.huespedes import archivar as archivar_resumen
+
+# Tablas que cuelgan de reservas: se archivan con ella y se borran antes que ella
+TABLAS_HIJAS = {
+    'detalles': DetalleReserva.__table__,
+    'pagos': Pago.__table__,
+    'servicios': ReservaServicio.__table__,
+    'facturas': Factura.__table__,
+    'checkins': CheckIn.__table__,
+    'checkouts': CheckOut.__table__,
+}
+
+
+def _json_default(o):
+    if isinstance(o, (date, datetime)):
+        return o.isoformat()
+    raise TypeError(f'No serializable: {type(o).__name__}')
+
+
+def _mes_siguiente(d):
+    return date(d.year + (d.month == 12), d.month % 12 + 1, 1)
+
+
+def _periodos_cerrados(corte):
+    anio = db.extract('year', Reserva.fecha_inicio)
+    mes = db.extract('month', Reserva.fecha_inicio)
+    filas = db.session.execute(
+        db.select(Reserva.hotel_id, anio, mes)
+        .where(Reserva.fecha_fin < corte)
+        .group_by(Reserva.hotel_id, anio, mes)
+        .order_by(anio, mes)
+    ).all()
+    return [(hotel_id, date(int(a), int(m), 1)) for hotel_id, a, m in filas]
+
+
+def _archivar_periodo(hotel_id, periodo, corte):
+    tabla = Reserva.__table__
+    filtro_hotel = tabla.c.hotel_id.is_(None) if hotel_id is None else tabla.c.hotel_id == hotel_id
+    reservas = db.session.execute(
+        db.select(tabla).where(
+            filtro_hotel,
+            tabla.c.fecha_inicio >= periodo,
+            tabla.c.fecha_inicio < _mes_siguiente(periodo),
+            tabla.c.fecha_fin < corte
+        )
+    ).mappings().all()
+    if not reservas:
+        return 0
+
+    ids = [r['id'] for r in reservas]
+    registros = {r['id']: {'reserva': dict(r)} for r in reservas}
+    for clave, hija in TABLAS_HIJAS.items():
+        for fila in db.session.execute(db.select(hija).where(hija.c.reserva_id.in_(ids))).mappings():
+            registros[fila['reserva_id']].setdefault(clave, []).append(dict(fila))
+
+    lineas = '\n'.join(json.dumps(r, default=_json_default) for r in registros.values())
+    db.session.add(ArchivoReservas(
+        hotel_id=hotel_id,
+        periodo=periodo,
+        reservas=len(ids),
+        datos=gzip.compress(lineas.encode('utf-8'))
+    ))
+
+    # Antes de borrar: su parte del resumen por huésped pasa a la acumulada de archivo
+    archivar_resumen(ids)
+    for hija in TABLAS_HIJAS.values():
+        db.session.execute(db.delete(hija).where(hija.c.reserva_id.in_(ids)))
+    # La lista de espera guarda la entrada atendida, pero sin apuntar a una reserva que ya no está
+    espera = EsperaReserva.__table__
+    db.session.execute(db.update(espera).where(espera.c.reserva_id.in_(ids)).values(reserva_id=None))
+    db.session.execute(db.delete(tabla).where(tabla.c.id.in_(ids)))
+    registrar_cambios('reserva', [(id, hotel_id) for id in ids], 'baja')
+    db.session.commit()
+    return len(ids)
+
+
+def archivar_reservas(corte):
+    """Mueve a ``archivo_reservas`` las reservas terminadas antes de ``corte``.
+
+    Trabaja mes a mes y hotel a hotel, una transacción por periodo, así que
+    la memoria queda acotada al mayor de los meses.
+    """
+    resumen = []
+    for hotel_id, periodo in _periodos_cerrados(corte):
+        cantidad = _archivar_periodo(hotel_id, periodo, corte)
+        if cantidad:
+            resumen.append((hotel_id, periodo, cantidad))
+    return resumen
+
+
+def leer_archivo(desde, hasta):
+    """Devuelve las reservas archivadas con fecha_inicio en los meses [desde, hasta]."""
+    bloques = ArchivoReservas.query.filter(
+        ArchivoReservas.periodo >= date(desde.year, desde.month, 1),
+        ArchivoReservas.periodo <= hasta
+    ).order_by(ArchivoReservas.periodo).all()
+
+    out = []
+    for bloque in bloques:
+        for linea in gzip.decompress(bloque.datos).decode('utf-8').splitlines():
+            out.append(json.loads(linea))
+    return out
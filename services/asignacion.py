@@ -0,0 +1,328 @@
+"""Asignación automática de habitaciones por tipo, minimizando huecos en el calendario.
+
+Cada habitación es una lista ordenada de estancias ``[inicio, fin)`` (noches,
+como en services.conflictos). Para colocar una estancia se prueban las
+habitaciones libres del tipo y gana la que deja menos huecos invendibles
+(más cortos que ASIGNACION_MIN_HUECO noches) y más lados pegados a otra
+estancia (best-fit); con bisect cada prueba es O(log n).
+
+``reoptimizar`` vacía las estancias movibles de una ventana (futuras, sin
+fijar y planificadas) y las recoloca por orden de llegada con el mismo
+criterio. Si para algún tipo no consigue menos huecos, o no cabe alguna
+estancia, ese tipo se queda como estaba.
+
+Las ofertas vigentes de la lista de espera (services.espera) no tienen
+habitación, pero ocupan sitio en su tipo hasta que caducan: se colocan en los
+calendarios antes de elegir, así que ni una reserva nueva ni la
+reoptimización se llevan lo que se está ofreciendo.
+"""
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+
+from models import db, Reserva, DetalleReserva, Habitacion, EsperaReserva, hotel_actual
+from services.cambios import registrar_cambios
+from services.catalogo import catalogo
+
+# Habitaciones en las que no se coloca nada
+NO_ASIGNABLES = ('inactivo', 'mantenimiento')
+# Sin estancia al otro lado: cuenta como holgura grande, pero no como hueco invendible
+SIN_VECINA = 365
+
+
+class SinDisponibilidad(Exception):
+    def __init__(self, tipo_id):
+        super().__init__(tipo_id)
+        self.tipo_id = tipo_id
+
+
+def _min_hueco():
+    return current_app.config.get('ASIGNACION_MIN_HUECO', 2)
+
+
+class Calendario:
+    """Estancias de una habitación, sin solapes, ordenadas por inicio."""
+
+    __slots__ = ('inicios', 'fines')
+
+    def __init__(self):
+        self.inicios = []
+        self.fines = []
+
+    def _posicion(self, inicio, fin):
+        """Índice donde iría la estancia, o None si se solapa con otra."""
+        i = bisect_left(self.inicios, fin)
+        if i > 0 and self.fines[i - 1] > inicio:
+            return None
+        return i
+
+    def coste(self, inicio, fin, min_hueco):
+        """(huecos invendibles, -lados pegados, holgura) o None si no cabe."""
+        i = self._posicion(inicio, fin)
+        if i is None:
+            return None
+        huecos = [
+            (inicio - self.fines[i - 1]).days if i > 0 else None,
+            (self.inicios[i] - fin).days if i < len(self.inicios) else None,
+        ]
+        invendibles = sum(1 for h in huecos if h is not None and 0 < h < min_hueco)
+        pegados = sum(1 for h in huecos if h == 0)
+        holgura = sum(SIN_VECINA if h is None else h for h in huecos)
+        return invendibles, -pegados, holgura
+
+    def agregar(self, inicio, fin):
+        # Sin comprobar solapes: una sobreventa ya existente se carga tal cual
+        i = bisect_left(self.inicios, inicio)
+        self.inicios.insert(i, inicio)
+        self.fines.insert(i, fin)
+
+    def copia(self):
+        otro = Calendario()
+        otro.inicios, otro.fines = list(self.inicios), list(self.fines)
+        return otro
+
+    def huecos_invendibles(self, min_hueco):
+        return sum(1 for a, b in zip(self.fines, self.inicios[1:]) if 0 < (b - a).days < min_hueco)
+
+
+def mejor_habitacion(calendarios, inicio, fin, min_hueco, preferida=None):
+    """Id de la habitación con menor coste para [inicio, fin), o None si ninguna está libre.
+
+    A igual coste gana ``preferida`` (la que ya tenía): no se mueve a nadie sin ganar nada.
+    """
+    mejor = None
+    for hab_id, cal in calendarios.items():
+        coste = cal.coste(inicio, fin, min_hueco)
+        if coste is None:
+            continue
+        clave = (coste, hab_id != preferida, hab_id)
+        if mejor is None or clave < mejor:
+            mejor = clave
+    return mejor[2] if mejor else None
+
+
+def _estancias(habitaciones, desde=None, hasta=None):
+    """Estancias vigentes (no canceladas) de ``habitaciones`` que tocan la ventana."""
+    stmt = db.select(
+        DetalleReserva.id,
+        DetalleReserva.reserva_id,
+        DetalleReserva.habitacion_id,
+        DetalleReserva.fijada,
+        Reserva.estado,
+        Reserva.fecha_inicio,
+        Reserva.fecha_fin
+    ).join(Reserva, Reserva.id == DetalleReserva.reserva_id).where(
+        DetalleReserva.habitacion_id.in_(habitaciones),
+        Reserva.estado.notin_(('cancelada', 'no_show', 'finalizada'))
+    )
+    if desde is not None:
+        stmt = stmt.where(Reserva.fecha_fin > desde)
+    if hasta is not None:
+        stmt = stmt.where(Reserva.fecha_inicio < hasta)
+    return db.session.execute(stmt).all()
+
+
+def calendarios_de(habitaciones, desde, hasta):
+    """{habitacion_id: Calendario} con las estancias vigentes que tocan [desde, hasta)."""
+    calendarios = {h: Calendario() for h in habitaciones}
+    for e in _estancias(habitaciones, desde, hasta):
+        calendarios[e.habitacion_id].agregar(e.fecha_inicio, _fin(e))
+    return calendarios
+
+
+def _ofertas_vigentes(hotel_id, tipo_id, desde, hasta, ahora=None, excluir=None):
+    """Ofertas de la lista de espera sin caducar que tocan [desde, hasta), por orden de oferta."""
+    stmt = db.select(EsperaReserva).where(
+        EsperaReserva.tipo_id == tipo_id,
+        EsperaReserva.estado == 'ofrecida',
+        EsperaReserva.oferta_expira > (ahora or datetime.utcnow()),
+        EsperaReserva.fecha_fin > desde
+    ).order_by(EsperaReserva.fecha_oferta, EsperaReserva.id)
+    if hasta is not None:
+        stmt = stmt.where(EsperaReserva.fecha_inicio < hasta)
+    if hotel_id is not None:
+        stmt = stmt.where(EsperaReserva.hotel_id == hotel_id)
+    if excluir is not None:
+        stmt = stmt.where(EsperaReserva.id != excluir)
+    return db.session.execute(stmt).scalars().all()
+
+
+def colocar(calendarios, inicio, fin, cantidad, min_hueco):
+    """``cantidad`` habitaciones para [inicio, fin) (todas o ninguna); las marca ocupadas en ``calendarios``."""
+    libres = dict(calendarios)
+    elegidas = []
+    for _ in range(cantidad):
+        hab_id = mejor_habitacion(libres, inicio, fin, min_hueco)
+        if hab_id is None:
+            return None
+        libres.pop(hab_id)
+        elegidas.append(hab_id)
+    for hab_id in elegidas:
+        calendarios[hab_id].agregar(inicio, fin)
+    return elegidas
+
+
+def ocupar_ofertas(calendarios, hotel_id, tipo_id, desde, hasta, min_hueco, ahora=None, excluir=None):
+    """Coloca en ``calendarios`` las ofertas vigentes del tipo; devuelve cuántas no caben.
+
+    ``excluir`` es la entrada de la lista de espera que se está atendiendo: su
+    propia oferta no le quita el sitio.
+    """
+    sin_sitio = 0
+    for oferta in _ofertas_vigentes(hotel_id, tipo_id, desde, hasta, ahora, excluir):
+        if colocar(calendarios, oferta.fecha_inicio, oferta.fecha_fin, oferta.cantidad or 1, min_hueco) is None:
+            sin_sitio += 1
+    return sin_sitio
+
+
+def asignar_habitaciones(tipo_id, cantidad, inicio, fin, excluir=(), oferta=None):
+    """Elige ``cantidad`` habitaciones del tipo para [inicio, fin). No hace commit.
+
+    ``excluir`` son habitaciones que ya lleva la misma reserva y no se pueden repetir;
+    ``oferta``, la entrada de la lista de espera que atiende la reserva, si la hay.
+    Bloquea las filas de las habitaciones del tipo (SELECT ... FOR UPDATE en
+    Postgres) para que dos reservas simultáneas no elijan la misma.
+    """
+    grupos = catalogo().por_tipo(hotel_actual(), tipo_id, excluir=NO_ASIGNABLES)
+    candidatas = [h for ids in grupos.values() for h in ids if h not in excluir]
+    if len(candidatas) < cantidad:
+        raise SinDisponibilidad(tipo_id)
+
+    # Lo bloqueado sale de la base: descarta también lo que el catálogo aún no sepa dado de baja
+    habitaciones = _bloquear(candidatas)
+    min_hueco = _min_hueco()
+    # Solo importan las vecinas a menos de min_hueco noches (y las que se solapan)
+    margen = timedelta(days=min_hueco)
+    calendarios = calendarios_de(habitaciones, inicio - margen, fin + margen)
+    ocupar_ofertas(calendarios, hotel_actual(), tipo_id, inicio - margen, fin + margen, min_hueco, excluir=oferta)
+
+    elegidas = colocar(calendarios, inicio, fin, cantidad, min_hueco)
+    if elegidas is None:
+        raise SinDisponibilidad(tipo_id)
+    return elegidas
+
+
+def comprobar_ofertas(habitaciones, inicio, fin, oferta=None):
+    """Lanza SinDisponibilidad si reservar ``habitaciones`` para [inicio, fin) deja sin sitio una oferta vigente.
+
+    Para las habitaciones elegidas a mano: no importa cuál ocupe la oferta,
+    solo que le siga quedando alguna del tipo. No hace commit.
+    """
+    cat = catalogo()
+    grupos = {}
+    for hab_id in habitaciones:
+        h = cat.habitacion(hab_id, hotel_actual())
+        if h and h['tipo_id'] is not None:
+            grupos.setdefault((h['hotel_id'], h['tipo_id']), []).append(hab_id)
+
+    min_hueco = _min_hueco()
+    desde, hasta = inicio - timedelta(days=min_hueco), fin + timedelta(days=min_hueco)
+    for (hotel_id, tipo_id), elegidas in sorted(grupos.items(), key=lambda g: (g[0][0] or 0, g[0][1])):
+        if not _ofertas_vigentes(hotel_id, tipo_id, desde, hasta, excluir=oferta):
+            continue
+        tipo = cat.por_tipo(hotel_id, tipo_id, excluir=NO_ASIGNABLES).get((hotel_id, tipo_id), [])
+        antes = calendarios_de(_bloquear(tipo), desde, hasta)
+        despues = {h: c.copia() for h, c in antes.items()}
+        for hab_id in elegidas:
+            if hab_id in despues:
+                despues[hab_id].agregar(inicio, fin)
+        # Comparado con el estado actual: una sobreventa previa no es culpa de esta reserva
+        if (ocupar_ofertas(despues, hotel_id, tipo_id, desde, hasta, min_hueco, excluir=oferta)
+                > ocupar_ofertas(antes, hotel_id, tipo_id, desde, hasta, min_hueco, excluir=oferta)):
+            raise SinDisponibilidad(tipo_id)
+
+
+def _bloquear(habitaciones):
+    """SELECT ... FOR UPDATE de las habitaciones, en orden de id para no cruzarse con otro bloqueo."""
+    return db.session.execute(
+        db.select(Habitacion.id).where(Habitacion.id.in_(habitaciones))
+        .order_by(Habitacion.id).with_for_update()
+    ).scalars().all()
+
+
+def _fin(estancia):
+    # Una estancia de cero noches ocupa igualmente su día de llegada
+    return max(estancia.fecha_fin, estancia.fecha_inicio + timedelta(days=1))
+
+
+def _recolocar(calendarios, movibles, min_hueco):
+    """Coloca ``movibles`` por orden de llegada; [(detalle, reserva, habitación)] que cambian o None."""
+    nuevos = []
+    # A igual llegada, las más largas primero
+    for inicio, fin, detalle_id, reserva_id, hab_anterior in sorted(
+            movibles, key=lambda m: (m[0], -(m[1] - m[0]).days, m[2])):
+        hab_id = mejor_habitacion(calendarios, inicio, fin, min_hueco, preferida=hab_anterior)
+        if hab_id is None:
+            return None
+        calendarios[hab_id].agregar(inicio, fin)
+        if hab_id != hab_anterior:
+            nuevos.append((detalle_id, reserva_id, hab_id))
+    return nuevos
+
+
+def reoptimizar(desde, hasta, hotel_id=None, aplicar=True, hoy=None):
+    """Recoloca las estancias movibles de [desde, hasta) y devuelve un informe por tipo.
+
+    Movibles: no fijadas, reserva planificada, llegada posterior a hoy y
+    estancia entera dentro de la ventana. El resto queda donde está.
+    """
+    hoy = hoy or date.today()
+    min_hueco = _min_hueco()
+    informe = []
+
+    grupos = catalogo().por_tipo(hotel_id, excluir=NO_ASIGNABLES)
+    for (hotel, tipo_id), habitaciones in sorted(grupos.items(), key=lambda x: (x[0][0] or 0, x[0][1])):
+        # Mismo bloqueo que asignar_habitaciones: ninguna reserva nueva se cuela a medias
+        _bloquear(habitaciones)
+        fijas = {h: Calendario() for h in habitaciones}
+        actual = {h: Calendario() for h in habitaciones}
+        movibles = []
+        for e in _estancias(habitaciones, desde, hasta):
+            fin = _fin(e)
+            actual[e.habitacion_id].agregar(e.fecha_inicio, fin)
+            if (not e.fijada and e.estado == 'planificada' and e.fecha_inicio > hoy
+                    and e.fecha_inicio >= desde and e.fecha_fin <= hasta):
+                movibles.append((e.fecha_inicio, fin, e.id, e.reserva_id, e.habitacion_id))
+            else:
+                fijas[e.habitacion_id].agregar(e.fecha_inicio, fin)
+
+        antes = sum(c.huecos_invendibles(min_hueco) for c in actual.values())
+        nuevos = _recolocar(fijas, movibles, min_hueco)
+        despues = sum(c.huecos_invendibles(min_hueco) for c in fijas.values()) if nuevos is not None else antes
+        # Después de contar huecos: las ofertas no son estancias, pero el plan nuevo debe dejarles sitio
+        if nuevos is not None and (ocupar_ofertas(fijas, hotel, tipo_id, desde, hasta, min_hueco)
+                                   > ocupar_ofertas(actual, hotel, tipo_id, desde, hasta, min_hueco)):
+            nuevos, despues = None, antes
+        mejora = despues < antes
+        if mejora and aplicar:
+            _aplicar(nuevos)
+        informe.append({
+            'hotel_id': hotel,
+            'tipo_id': tipo_id,
+            'habitaciones': len(habitaciones),
+            'movibles': len(movibles),
+            'movidas': len(nuevos) if mejora else 0,
+            'huecos_antes': antes,
+            'huecos_despues': despues if mejora else antes
+        })
+        # Un commit por tipo: los bloqueos duran lo que tarda un tipo, no la ventana entera
+        db.session.commit()
+
+    return informe
+
+
+def _aplicar(cambios):
+    d = DetalleReserva.__table__
+    db.session.execute(
+        d.update().where(d.c.id == db.bindparam('detalle_id')).values(habitacion_id=db.bindparam('nueva')),
+        [{'detalle_id': detalle_id, 'nueva': hab_id} for detalle_id, _, hab_id in cambios]
+    )
+    reservas = sorted({reserva_id for _, reserva_id, _ in cambios})
+    filas = db.session.execute(
+        db.update(Reserva).where(Reserva.id.in_(reservas))
+        .values(version=Reserva.version + 1)
+        .returning(Reserva.id, Reserva.hotel_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    registrar_cambios('reserva', filas, 'modificacion')
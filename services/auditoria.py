@@ -0,0 +1,150 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from flask import request
+from flask_jwt_extended import get_jwt_identity
+from models import db, HistorialAcceso
+
+METODOS_AUDITADOS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+
+class AuditoriaWriter:
+    """Cola acotada de eventos de auditoría con un hilo escritor en segundo plano.
+
+    Las peticiones solo encolan; el hilo vuelca los eventos a ``historial_acceso``
+    en inserts multi-fila cuando se llena un lote o vence el intervalo.
+    """
+
+    def __init__(self, max_cola=10000, lote=500, intervalo=1.0, espera=0.05):
+        self.app = None
+        self.lote = lote
+        self.intervalo = intervalo
+        self.espera = espera
+        self.cola = queue.Queue(maxsize=max_cola)
+        self.descartados = 0
+        self._hilo = None
+        self._pid = None
+        self._detener = threading.Event()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.lote = app.config.get('AUDITORIA_LOTE', self.lote)
+        self.intervalo = app.config.get('AUDITORIA_INTERVALO', self.intervalo)
+        self.espera = app.config.get('AUDITORIA_ESPERA', self.espera)
+        self.cola = queue.Queue(maxsize=app.config.get('AUDITORIA_COLA_MAX', self.cola.maxsize))
+        atexit.register(self.detener)
+
+    # ---------------------------------------------------------
+    # Productor (hilo de la petición)
+    # ---------------------------------------------------------
+    def registrar(self, usuario, accion):
+        self._asegurar_hilo()
+        evento = {
+            'usuario': str(usuario)[:120] if usuario is not None else None,
+            'accion': accion[:255],
+            'fecha': datetime.utcnow(),
+        }
+        try:
+            self.cola.put_nowait(evento)
+        except queue.Full:
+            # Backpressure: esperamos un instante a que el escritor libere sitio
+            # y, si sigue llena, descartamos antes que bloquear la petición.
+            try:
+                self.cola.put(evento, timeout=self.espera)
+            except queue.Full:
+                self.descartados += 1
+
+    # ---------------------------------------------------------
+    # Consumidor (hilo escritor)
+    # ---------------------------------------------------------
+    def _asegurar_hilo(self):
+        # Tras un fork (gunicorn --preload) el hilo del padre no existe en el hijo
+        if self._hilo is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._hilo is not None and self._pid == os.getpid():
+                return
+            self._detener.clear()
+            self._pid = os.getpid()
+            self._hilo = threading.Thread(target=self._bucle, name='auditoria-writer', daemon=True)
+            self._hilo.start()
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            eventos = self._tomar_lote()
+            if eventos:
+                self._volcar(eventos)
+        self.flush()
+
+    def _tomar_lote(self):
+        eventos = []
+        limite = time.monotonic() + self.intervalo
+        while len(eventos) < self.lote:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                eventos.append(self.cola.get(timeout=restante))
+            except queue.Empty:
+                break
+            if self._detener.is_set():
+                break
+        return eventos
+
+    def _volcar(self, eventos):
+        try:
+            with self.app.app_context():
+                with db.engine.begin() as conn:
+                    conn.execute(HistorialAcceso.__table__.insert(), eventos)
+        except Exception:
+            self.app.logger.exception('No se pudieron guardar %d eventos de auditoría', len(eventos))
+
+    def flush(self):
+        eventos = []
+        while True:
+            try:
+                eventos.append(self.cola.get_nowait())
+            except queue.Empty:
+                break
+            if len(eventos) >= self.lote:
+                self._volcar(eventos)
+                eventos = []
+        if eventos:
+            self._volcar(eventos)
+
+    def detener(self, timeout=5.0):
+        self._detener.set()
+        hilo = self._hilo
+        if hilo is not None and hilo.is_alive() and self._pid == os.getpid():
+            hilo.join(timeout)
+        else:
+            self.flush()
+
+
+auditoria = AuditoriaWriter()
+
+
+def _usuario_actual():
+    try:
+        return get_jwt_identity()
+    except RuntimeError:
+        return None
+
+
+def init_auditoria(app):
+    auditoria.init_app(app)
+
+    @app.after_request
+    def auditar_mutaciones(response):
+        # El login se audita explícitamente en auth_routes (incluye intentos fallidos)
+        if request.method in METODOS_AUDITADOS and request.blueprint != 'auth_bp':
+            auditoria.registrar(
+                _usuario_actual(),
+                f"{request.method} {request.path} -> {response.status_code}"
+            )
+        return response
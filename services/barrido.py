@@ -0,0 +1,91 @@
+import threading
+from datetime import date
+
+from models import db, Reserva, Habitacion, DetalleReserva, CheckIn
+from services.cambios import registrar_cambios
+from services.huespedes import marcar_reservas
+from services.catalogo import subir_version
+
+
+def barrer_estados(hoy=None, requiere_checkin=False):
+    """Avanza los estados de reservas y habitaciones según la fecha.
+
+    planificada -> en_curso -> finalizada, y planificada -> no_show cuando
+    se exige check-in y no lo hubo. Todo se hace con unos pocos
+    ``UPDATE ... WHERE`` set-based en una sola transacción, sin cargar filas.
+    Es idempotente, así que puede ejecutarse desde varios workers.
+    """
+    hoy = hoy or date.today()
+    tiene_checkin = db.exists().where(CheckIn.reserva_id == Reserva.id)
+    conteos = {}
+
+    def actualizar(clave, tabla, condiciones, valores):
+        filas = db.session.execute(
+            db.update(tabla).where(*condiciones).values(version=tabla.version + 1, **valores)
+            .returning(tabla.id, tabla.hotel_id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        registrar_cambios('reserva' if tabla is Reserva else 'habitacion', filas, 'modificacion')
+        conteos[clave] = len(filas)
+        return filas
+
+    en_curso = [
+        Reserva.estado == 'planificada',
+        Reserva.fecha_inicio <= hoy,
+        Reserva.fecha_fin > hoy,
+    ]
+    if requiere_checkin:
+        en_curso.append(tiene_checkin)
+        # Un no_show deja de contar como estancia en el resumen del cliente
+        no_show = actualizar('no_show', Reserva, [
+            Reserva.estado == 'planificada',
+            Reserva.fecha_inicio < hoy,
+            ~tiene_checkin,
+        ], {'estado': 'no_show'})
+        marcar_reservas([f.id for f in no_show])
+    actualizar('en_curso', Reserva, en_curso, {'estado': 'en_curso'})
+
+    # Las planificadas cuya estancia ya pasó (barrido atrasado) también se cierran
+    actualizar('finalizada', Reserva, [
+        Reserva.estado.in_(['planificada', 'en_curso']),
+        Reserva.fecha_fin <= hoy,
+    ], {'estado': 'finalizada'})
+
+    ocupadas = db.select(DetalleReserva.habitacion_id).join(
+        Reserva, Reserva.id == DetalleReserva.reserva_id
+    ).where(Reserva.estado == 'en_curso')
+
+    # Solo se tocan habitaciones disponibles/ocupadas; mantenimiento e inactivo se respetan
+    actualizar('habitaciones_ocupadas', Habitacion, [
+        Habitacion.estado == 'disponible',
+        Habitacion.id.in_(ocupadas),
+    ], {'estado': 'ocupada'})
+    actualizar('habitaciones_liberadas', Habitacion, [
+        Habitacion.estado == 'ocupada',
+        ~Habitacion.id.in_(ocupadas),
+    ], {'estado': 'disponible'})
+    if conteos['habitaciones_ocupadas'] or conteos['habitaciones_liberadas']:
+        subir_version()
+
+    db.session.commit()
+    return conteos
+
+
+def iniciar_planificador(app, intervalo):
+    """Lanza un hilo que ejecuta el barrido cada ``intervalo`` segundos."""
+    detener = threading.Event()
+
+    def bucle():
+        while not detener.wait(intervalo):
+            with app.app_context():
+                try:
+                    barrer_estados(requiere_checkin=app.config.get('RESERVAS_REQUIERE_CHECKIN', False))
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception('Falló el barrido de estados')
+                finally:
+                    db.session.remove()
+
+    hilo = threading.Thread(target=bucle, name='barrido-estados', daemon=True)
+    hilo.start()
+    return detener
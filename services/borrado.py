@@ -0,0 +1,40 @@
+"""Filtro por defecto de las bajas lógicas.
+
+Toda SELECT ORM cuya entidad principal tenga baja lógica (BorradoLogicoMixin,
+o Habitacion con estado 'inactivo') excluye las filas dadas de baja. Solo la
+entidad principal: en ``select(Reserva.id, Cliente.nombre).join(Cliente)``
+la reserva de un cliente dado de baja sigue saliendo con su nombre, y las
+cargas de relaciones (``detalle.habitacion``) tampoco se filtran.
+
+Para verlas hace falta pedirlo: ``.execution_options(incluir_borrados=True)``.
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, BorradoLogicoMixin, Habitacion
+
+
+def criterio_activo(cls):
+    """Condición de fila viva para ``cls``, o None si no tiene baja lógica."""
+    if issubclass(cls, BorradoLogicoMixin):
+        return cls.activo.is_(True)
+    if issubclass(cls, Habitacion):
+        return db.or_(cls.estado.is_(None), cls.estado != 'inactivo')
+    return None
+
+
+def _excluir_borrados(estado):
+    if not estado.is_select or estado.is_column_load or estado.is_relationship_load:
+        return
+    if estado.execution_options.get('incluir_borrados', False):
+        return
+    mapper = estado.bind_mapper
+    criterio = criterio_activo(mapper.class_) if mapper is not None else None
+    if criterio is not None:
+        estado.statement = estado.statement.where(criterio)
+
+
+def init_borrado(app):
+    # Como en services.tenencia: el listener es global a Session y create_app puede llamarse varias veces
+    if not event.contains(Session, 'do_orm_execute', _excluir_borrados):
+        event.listen(Session, 'do_orm_execute', _excluir_borrados)
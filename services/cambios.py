@@ -0,0 +1,169 @@
+"""Registro de cambios (outbox) para que los clientes sincronicen solo lo que cambió.
+
+Cada alta/modificación/baja de reservas, sus detalles, servicios y pagos,
+y de habitaciones deja una fila en ``cambios`` dentro de la misma transacción.
+Los cambios en detalles, servicios y pagos se anotan como modificación de su reserva.
+Lo que se creó en la transacción sigue anotándose como alta en los flushes
+siguientes: si no, compactar se quedaría con la modificación y el alta no
+llegaría nunca al feed.
+Las entradas solo dicen *qué* cambió: el estado se lee al servir el feed,
+así que da igual en qué orden se aplicaron y compactar (quedarse con la
+última entrada de cada entidad) nunca pierde información.
+"""
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, Cambio, Reserva, DetalleReserva, ReservaServicio, Pago, Habitacion
+from services import lecturas
+
+# Con varias operaciones sobre la misma entidad en un flush gana la más fuerte
+_PESO = {'modificacion': 0, 'alta': 1, 'baja': 2}
+
+# session.info: (entidad, id) dados de alta en la transacción en curso
+_CLAVE_ALTAS = 'cambios_altas'
+
+
+class CursorInvalido(Exception):
+    pass
+
+
+def _es_postgres():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def registrar_cambios(entidad, filas, operacion, conexion=None):
+    """Anota ``operacion`` para cada (id, hotel_id) de ``filas``. No hace commit."""
+    ahora = datetime.utcnow()
+    valores = [{
+        'entidad': entidad,
+        'entidad_id': entidad_id,
+        'hotel_id': hotel_id,
+        'operacion': operacion,
+        'fecha': ahora
+    } for entidad_id, hotel_id in filas]
+    if not valores:
+        return
+
+    stmt = db.insert(Cambio.__table__)
+    if _es_postgres():
+        stmt = stmt.values(transaccion=db.func.txid_current())
+    (conexion or db.session).execute(stmt, valores)
+
+
+def _entidad_de(obj, operacion):
+    if isinstance(obj, Reserva):
+        return 'reserva', obj.id, obj.hotel_id, operacion
+    if isinstance(obj, Habitacion):
+        return 'habitacion', obj.id, obj.hotel_id, operacion
+    if isinstance(obj, (DetalleReserva, ReservaServicio, Pago)):
+        return 'reserva', obj.reserva_id, obj.hotel_id, 'modificacion'
+    return None
+
+
+def _capturar(session, flush_context):
+    altas = session.info.setdefault(_CLAVE_ALTAS, set())
+    pendientes = {}
+    for operacion, objetos in (('alta', session.new), ('modificacion', session.dirty), ('baja', session.deleted)):
+        for obj in objetos:
+            if operacion == 'modificacion' and not session.is_modified(obj, include_collections=False):
+                continue
+            e = _entidad_de(obj, operacion)
+            if e is None or e[1] is None:
+                continue
+            entidad, entidad_id, hotel_id, op = e
+            if op == 'alta':
+                altas.add((entidad, entidad_id))
+            elif op == 'modificacion' and (entidad, entidad_id) in altas:
+                op = 'alta'
+            previa = pendientes.get((entidad, entidad_id))
+            if previa is None or _PESO[op] > _PESO[previa[1]]:
+                pendientes[(entidad, entidad_id)] = (hotel_id, op)
+
+    por_grupo = {}
+    for (entidad, entidad_id), (hotel_id, op) in pendientes.items():
+        por_grupo.setdefault((entidad, op), []).append((entidad_id, hotel_id))
+    for (entidad, op), filas in por_grupo.items():
+        registrar_cambios(entidad, filas, op, conexion=session.connection())
+
+
+def _cursor(texto):
+    if not texto:
+        return (-1, 0)
+    try:
+        transaccion, id = texto.split('.', 1)
+        return (int(transaccion), int(id))
+    except ValueError:
+        raise CursorInvalido()
+
+
+def leer_cambios(desde, limite):
+    """Cambios posteriores al cursor ``desde``, compactados por entidad.
+
+    Devuelve ``(cambios, siguiente_cursor, hay_mas)``.
+    """
+    inicio = _cursor(desde)
+    stmt = db.select(
+        Cambio.transaccion, Cambio.id, Cambio.entidad, Cambio.entidad_id, Cambio.operacion
+    ).where(
+        db.tuple_(Cambio.transaccion, Cambio.id) > db.tuple_(*inicio)
+    ).order_by(Cambio.transaccion, Cambio.id).limit(limite + 1)
+    if _es_postgres():
+        # Solo transacciones ya cerradas: ninguna en curso puede colarse por detrás del cursor
+        stmt = stmt.where(Cambio.transaccion < db.func.txid_snapshot_xmin(db.func.txid_current_snapshot()))
+
+    filas = db.session.execute(stmt).all()
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+    if not filas:
+        return [], desde or '', False
+
+    ultimos = {}
+    for fila in filas:
+        ultimos.pop((fila.entidad, fila.entidad_id), None)
+        ultimos[(fila.entidad, fila.entidad_id)] = fila.operacion
+
+    estados = {
+        'reserva': lecturas.reservas_por_ids([i for (e, i) in ultimos if e == 'reserva']),
+        'habitacion': lecturas.habitaciones_por_ids([i for (e, i) in ultimos if e == 'habitacion']),
+    }
+    cambios = []
+    for (entidad, entidad_id), operacion in ultimos.items():
+        datos = estados[entidad].get(entidad_id)
+        cambios.append({
+            'entidad': entidad,
+            'id': entidad_id,
+            'operacion': 'baja' if datos is None else operacion,
+            'datos': datos
+        })
+
+    ultima = filas[-1]
+    return cambios, f'{ultima.transaccion}.{ultima.id}', hay_mas
+
+
+def compactar_cambios():
+    """Borra las entradas que tienen otra posterior para la misma entidad."""
+    c = Cambio.__table__
+    posterior = c.alias()
+    resultado = db.session.execute(
+        db.delete(c).where(db.exists().where(
+            posterior.c.entidad == c.c.entidad,
+            posterior.c.entidad_id == c.c.entidad_id,
+            db.tuple_(posterior.c.transaccion, posterior.c.id) > db.tuple_(c.c.transaccion, c.c.id)
+        ))
+    )
+    db.session.commit()
+    return resultado.rowcount
+
+
+def _olvidar_altas(session, transaccion):
+    # Solo al cerrar la transacción de fuera: un savepoint no cierra la unidad de trabajo
+    if transaccion.parent is None:
+        session.info.pop(_CLAVE_ALTAS, None)
+
+
+def init_cambios(app):
+    if not event.contains(Session, 'after_flush', _capturar):
+        event.listen(Session, 'after_flush', _capturar)
+        event.listen(Session, 'after_transaction_end', _olvidar_altas)
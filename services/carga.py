@@ -0,0 +1,170 @@
+import threading
+import time
+
+from flask import current_app, g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+from models import db
+
+# Fracción de la capacidad a partir de la cual se rechaza cada clase:
+# lo de baja prioridad se descarta primero y las reservas/pagos al final
+UMBRAL_PRIORIDAD = {'baja': 0.5, 'normal': 0.8, 'critica': 1.0}
+
+
+class PlazoVencido(Exception):
+    pass
+
+
+def plazo(segundos):
+    """Declara el plazo máximo de una ruta (va justo debajo de @bp.route)."""
+    def decorador(f):
+        f.plazo = segundos
+        return f
+    return decorador
+
+
+def prioridad(clase):
+    """Declara la clase de prioridad de una ruta: 'baja', 'normal' o 'critica'."""
+    if clase not in UMBRAL_PRIORIDAD:
+        raise ValueError(f'Prioridad desconocida: {clase}')
+
+    def decorador(f):
+        f.prioridad = clase
+        return f
+    return decorador
+
+
+def _por_ruta(texto):
+    """'reportes_bp=10,reservas_bp.listar_reservas=5' -> {endpoint o blueprint: valor}."""
+    out = {}
+    for par in (texto or '').split(','):
+        if '=' in par:
+            clave, valor = par.split('=', 1)
+            out[clave.strip()] = valor.strip()
+    return out
+
+
+def _de_ruta(atributo, tabla, defecto):
+    vista = current_app.view_functions.get(request.endpoint)
+    if vista is not None and hasattr(vista, atributo):
+        return getattr(vista, atributo)
+    if request.endpoint in tabla:
+        return tabla[request.endpoint]
+    if request.blueprint in tabla:
+        return tabla[request.blueprint]
+    return defecto
+
+
+def restante():
+    """Segundos que le quedan a la petición actual (None = sin plazo)."""
+    limite = g.get('plazo_limite') if has_request_context() else None
+    return None if limite is None else limite - time.monotonic()
+
+
+def comprobar_plazo():
+    """Para bucles largos en Python: corta si el plazo ya pasó."""
+    queda = restante()
+    if queda is not None and queda <= 0:
+        raise PlazoVencido()
+
+
+def _fijar_statement_timeout(session, transaction, connection):
+    queda = restante()
+    if queda is None:
+        return
+    if queda <= 0:
+        raise PlazoVencido()
+    if connection.dialect.name == 'postgresql':
+        # SET LOCAL muere con la transacción: no contamina la conexión del pool
+        connection.exec_driver_sql(f'SET LOCAL statement_timeout = {max(1, int(queda * 1000))}')
+
+
+def _saturacion_pool():
+    pool = db.engine.pool
+    # -1 = overflow ilimitado: el pool nunca se llena
+    desborde = current_app.config.get('CARGA_POOL_DESBORDE', 10)
+    if not isinstance(pool, QueuePool) or desborde < 0:
+        return 0
+    capacidad = pool.size() + desborde
+    return pool.checkedout() / capacidad if capacidad else 0
+
+
+class Admision:
+    """Peticiones en curso en este proceso, para decidir si se admite una más."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.en_curso = 0
+
+    def entrar(self, maximo, clase):
+        with self._lock:
+            ocupacion = self.en_curso / maximo
+            if clase != 'critica':
+                # Las críticas esperan su conexión (pool_timeout); el resto no
+                ocupacion = max(ocupacion, _saturacion_pool())
+            if ocupacion >= UMBRAL_PRIORIDAD[clase]:
+                return False
+            self.en_curso += 1
+            return True
+
+    def salir(self):
+        with self._lock:
+            self.en_curso -= 1
+
+
+admision = Admision()
+
+
+def _saturado(msg):
+    resp = jsonify({'ok': False, 'msg': msg})
+    resp.status_code = 503
+    resp.headers['Retry-After'] = str(current_app.config.get('CARGA_REINTENTO', 1))
+    return resp
+
+
+def init_carga(app):
+    event.listen(Session, 'after_begin', _fijar_statement_timeout)
+    plazos = {k: float(v) for k, v in _por_ruta(app.config.get('PLAZOS_RUTAS')).items()}
+    prioridades = _por_ruta(app.config.get('PRIORIDADES_RUTAS'))
+
+    @app.before_request
+    def admitir():
+        if request.endpoint is None:
+            return None
+
+        maximo = current_app.config.get('CARGA_MAX_EN_CURSO', 0)
+        if maximo > 0:
+            clase = _de_ruta('prioridad', prioridades, 'normal')
+            if not admision.entrar(maximo, clase):
+                return _saturado('Servidor saturado, reintente en unos segundos')
+            g.admitido = True
+
+        segundos = _de_ruta('plazo', plazos, current_app.config.get('PLAZO_DEFECTO', 0))
+        if segundos:
+            g.plazo_limite = time.monotonic() + float(segundos)
+        return None
+
+    @app.teardown_request
+    def liberar(exc):
+        if g.pop('admitido', False):
+            admision.salir()
+
+    @app.errorhandler(PlazoVencido)
+    def plazo_vencido(e):
+        db.session.rollback()
+        return jsonify({'ok': False, 'msg': 'La operación superó su plazo'}), 504
+
+    @app.errorhandler(PoolTimeoutError)
+    def pool_agotado(e):
+        return _saturado('Sin conexiones libres a la base de datos')
+
+    @app.errorhandler(OperationalError)
+    def error_operacional(e):
+        db.session.rollback()
+        # 57014 = query_canceled: lo corta el statement_timeout del plazo
+        if getattr(e.orig, 'pgcode', None) == '57014':
+            return jsonify({'ok': False, 'msg': 'La operación superó su plazo'}), 504
+        return jsonify({'ok': False, 'msg': 'Error de base de datos'}), 500
@@ -0,0 +1,278 @@
+"""Catálogo de habitaciones en un fichero mapeado en memoria, compartido por los workers.
+
+El fichero es columnar (ids, hotel, tipo, precio, estado y número) y
+nunca se modifica: cada versión del catálogo es un fichero nuevo,
+``catalogo-<generacion>-<version>.bin``, escrito a un temporal y renombrado. Cada worker
+lo abre con mmap, así que todos comparten las mismas páginas del page cache
+en lugar de tener cada uno su copia en objetos ORM.
+
+La versión vive en ``version_catalogo`` y sube en la misma transacción que
+cualquier cambio de habitaciones o tipos. Los workers la consultan como
+mucho cada CATALOGO_REVISION segundos y, si cambió, abren (o construyen) el
+fichero nuevo y cambian la referencia de golpe.
+"""
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import db, Habitacion, TipoHabitacion, VersionCatalogo
+
+MAGICO = b'HABCAT01'
+_CABECERA = struct.Struct('<8sqII')  # mágico, versión, habitaciones, bytes del diccionario
+_FILA = 1
+
+
+def _alinear(n):
+    return (n + 7) & ~7
+
+
+class Catalogo:
+    """Vista de solo lectura sobre un fichero de catálogo; las columnas son memoryviews."""
+
+    __slots__ = ('ruta', 'version', 'ids', 'hoteles', 'tipos', 'precios', 'estados',
+                 '_offsets_numero', '_numeros', '_nombres_estado', '_nombres_tipo', '_mm')
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        with open(ruta, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        vista = memoryview(self._mm)
+        magico, self.version, n, largo_dic = _CABECERA.unpack_from(vista)
+        if magico != MAGICO:
+            raise ValueError(f'{ruta} no es un catálogo')
+
+        pos = _CABECERA.size
+        dic = json.loads(bytes(vista[pos:pos + largo_dic]))
+        self._nombres_estado = dic['estados']
+        self._nombres_tipo = {int(k): v for k, v in dic['tipos'].items()}
+        pos = _alinear(pos + largo_dic)
+
+        def columna(formato, cantidad, ancho):
+            nonlocal pos
+            col = vista[pos:pos + cantidad * ancho].cast(formato)
+            pos = _alinear(pos + cantidad * ancho)
+            return col
+
+        self.ids = columna('i', n, 4)
+        self.hoteles = columna('i', n, 4)
+        self.tipos = columna('i', n, 4)
+        self.precios = columna('d', n, 8)
+        self.estados = columna('B', n, 1)
+        self._offsets_numero = columna('I', n + 1, 4)
+        self._numeros = vista[pos:pos + self._offsets_numero[n]]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def indice(self, id):
+        """Posición de la habitación ``id`` (los ids están ordenados) o None."""
+        i = bisect_left(self.ids, id)
+        return i if i < len(self.ids) and self.ids[i] == id else None
+
+    def numero(self, i):
+        return bytes(self._numeros[self._offsets_numero[i]:self._offsets_numero[i + 1]]).decode('utf-8')
+
+    def estado(self, i):
+        return self._nombres_estado[self.estados[i]]
+
+    def hotel(self, i):
+        h = self.hoteles[i]
+        return None if h < 0 else h
+
+    def fila(self, i):
+        tipo_id = self.tipos[i]
+        return {
+            "id": self.ids[i],
+            "numero": self.numero(i),
+            "tipo_id": None if tipo_id < 0 else tipo_id,
+            "tipo": self._nombres_tipo.get(tipo_id),
+            "precio": self.precios[i],
+            "estado": self.estado(i),
+        }
+
+    def habitacion(self, id, hotel_id=None):
+        """Fila de la habitación si existe y pertenece a ``hotel_id`` (None = cualquiera)."""
+        i = self.indice(id)
+        if i is None or (hotel_id is not None and self.hotel(i) != hotel_id):
+            return None
+        fila = self.fila(i)
+        fila["hotel_id"] = self.hotel(i)
+        return fila
+
+    def filas(self, hotel_id=None, excluir=('inactivo',)):
+        excluidos = {self._nombres_estado.index(e) for e in excluir if e in self._nombres_estado}
+        return [
+            self.fila(i) for i in range(len(self.ids))
+            if self.estados[i] not in excluidos and (hotel_id is None or self.hoteles[i] == hotel_id)
+        ]
+
+    def por_tipo(self, hotel_id=None, tipo_id=None, excluir=('inactivo',)):
+        """{(hotel_id, tipo_id): [ids]} de las habitaciones, sin mirar las excluidas."""
+        excluidos = {self._nombres_estado.index(e) for e in excluir if e in self._nombres_estado}
+        grupos = {}
+        for i in range(len(self.ids)):
+            if self.estados[i] in excluidos or (hotel_id is not None and self.hoteles[i] != hotel_id):
+                continue
+            tipo = self.tipos[i]
+            if tipo < 0 or (tipo_id is not None and tipo != tipo_id):
+                continue
+            grupos.setdefault((self.hotel(i), tipo), []).append(self.ids[i])
+        return grupos
+
+
+def _nombre(generacion, version):
+    return f'catalogo-{generacion}-{version}.bin'
+
+
+def _escribir(directorio, generacion, version):
+    """Construye el fichero de ``version`` con el estado actual de la base."""
+    h = Habitacion.__table__
+    t = TipoHabitacion.__table__
+    filas = db.session.execute(
+        db.select(h.c.id, h.c.hotel_id, h.c.tipo_id, h.c.precio, h.c.estado, h.c.numero).order_by(h.c.id)
+    ).all()
+    tipos = {id: nombre for id, nombre in db.session.execute(db.select(t.c.id, t.c.nombre))}
+
+    estados = sorted({f.estado or '' for f in filas})
+    codigo = {e: i for i, e in enumerate(estados)}
+    dic = json.dumps({'estados': estados, 'tipos': tipos}).encode('utf-8')
+
+    numeros = [(f.numero or '').encode('utf-8') for f in filas]
+    offsets = [0]
+    for b in numeros:
+        offsets.append(offsets[-1] + len(b))
+
+    def bloque(formato, valores):
+        datos = struct.pack(f'<{len(valores)}{formato}', *valores)
+        return datos + b'\0' * (_alinear(len(datos)) - len(datos))
+
+    partes = [
+        _CABECERA.pack(MAGICO, version, len(filas), len(dic)),
+        dic + b'\0' * (_alinear(_CABECERA.size + len(dic)) - _CABECERA.size - len(dic)),
+        bloque('i', [f.id for f in filas]),
+        bloque('i', [-1 if f.hotel_id is None else f.hotel_id for f in filas]),
+        bloque('i', [-1 if f.tipo_id is None else f.tipo_id for f in filas]),
+        bloque('d', [f.precio or 0.0 for f in filas]),
+        bloque('B', [codigo[f.estado or ''] for f in filas]),
+        bloque('I', offsets),
+        b''.join(numeros),
+    ]
+
+    os.makedirs(directorio, exist_ok=True)
+    destino = os.path.join(directorio, _nombre(generacion, version))
+    fd, temporal = tempfile.mkstemp(dir=directorio, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(b''.join(partes))
+    os.replace(temporal, destino)
+    return destino
+
+
+def version_actual():
+    """(generacion, version) del catálogo; crea la fila si todavía no existe."""
+    t = VersionCatalogo.__table__
+    consulta = db.select(t.c.generacion, t.c.version).where(t.c.id == _FILA)
+    fila = db.session.execute(consulta).first()
+    if fila is None:
+        # En su propia transacción: no se mezcla con la de la petición
+        try:
+            with db.engine.begin() as conexion:
+                conexion.execute(db.insert(t).values(id=_FILA, generacion=uuid.uuid4().hex, version=1))
+        except IntegrityError:
+            pass  # otro worker la creó antes
+        fila = db.session.execute(consulta).first()
+    return tuple(fila)
+
+
+class Gestor:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._actual = None
+        self._revisado = 0.0
+
+    def invalidar(self):
+        self._revisado = 0.0
+
+    def obtener(self):
+        actual = self._actual
+        intervalo = current_app.config.get('CATALOGO_REVISION', 2.0)
+        if actual is not None and time.monotonic() - self._revisado < intervalo:
+            return actual
+
+        with self._lock:
+            if self._actual is not None and time.monotonic() - self._revisado < intervalo:
+                return self._actual
+            generacion, version = version_actual()
+            directorio = current_app.config['CATALOGO_DIR']
+            ruta = os.path.join(directorio, _nombre(generacion, version))
+            if self._actual is None or self._actual.ruta != ruta:
+                if not os.path.exists(ruta):
+                    # La versión se lee antes que las filas: el fichero nunca es más viejo que su número
+                    ruta = _escribir(directorio, generacion, version)
+                    _limpiar(directorio, generacion, version)
+                self._actual = Catalogo(ruta)
+            self._revisado = time.monotonic()
+            return self._actual
+
+
+gestor = Gestor()
+
+
+def catalogo():
+    return gestor.obtener()
+
+
+def _limpiar(directorio, generacion, version):
+    """Borra los ficheros de otras generaciones y de versiones anteriores a la previa.
+
+    Borrar un fichero que otro worker tiene mapeado es seguro: el mapeo sigue válido.
+    """
+    for nombre in os.listdir(directorio):
+        if not (nombre.startswith('catalogo-') and nombre.endswith('.bin')):
+            continue
+        gen, _, ver = nombre[len('catalogo-'):-len('.bin')].rpartition('-')
+        try:
+            if gen != generacion or int(ver) < version - 1:
+                os.remove(os.path.join(directorio, nombre))
+        except (ValueError, OSError):
+            pass
+
+
+def subir_version(conexion=None):
+    """Incrementa la versión del catálogo en la transacción actual."""
+    ejecutar = (conexion or db.session).execute
+    t = VersionCatalogo.__table__
+    resultado = ejecutar(db.update(t).where(t.c.id == _FILA).values(version=t.c.version + 1))
+    if resultado.rowcount == 0:
+        ejecutar(db.insert(t).values(id=_FILA, generacion=uuid.uuid4().hex, version=1))
+
+
+def _anotar(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+            continue
+        if isinstance(obj, (Habitacion, TipoHabitacion)):
+            subir_version(session.connection())
+            session.info['catalogo_modificado'] = True
+            return
+
+
+def _tras_commit(session):
+    # Este worker ve su propio cambio en la siguiente lectura, sin esperar al intervalo
+    if session.info.pop('catalogo_modificado', False):
+        gestor.invalidar()
+
+
+def init_catalogo(app):
+    event.listen(Session, 'after_flush', _anotar)
+    event.listen(Session, 'after_commit', _tras_commit)
@@ -0,0 +1,91 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app, has_app_context, jsonify
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class ColaClavesLlena(Exception):
+    """El pool de hashing tiene la cola llena: mejor rechazar que acumular latencia."""
+
+
+def respuesta_saturado():
+    """503 con Retry-After para quien choque con ColaClavesLlena."""
+    resp = jsonify({'ok': False, 'msg': 'Servicio saturado, reintente en unos segundos'})
+    resp.status_code = 503
+    resp.headers['Retry-After'] = '1'
+    return resp
+
+
+_CONTEXTO = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+class PoolClaves:
+    """Calcula y verifica hashes de contraseña en procesos aparte.
+
+    El KDF ocupa CPU decenas de milisegundos; en un worker gthread/gevent eso
+    bloquea al resto de peticiones del proceso. Aquí se delega en un
+    ProcessPoolExecutor con una cola acotada por semáforo. Con procesos=0 se
+    calcula en línea (útil en pruebas y en la CLI).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+        self._cupos = None
+
+    def _config(self, clave, defecto):
+        return current_app.config.get(clave, defecto) if has_app_context() else defecto
+
+    def _asegurar(self):
+        procesos = self._config('CLAVES_PROCESOS', 2)
+        if procesos <= 0:
+            return None
+        with self._lock:
+            # Tras un fork (gunicorn --preload) el pool heredado no sirve
+            if self._pool is None or self._pid != os.getpid():
+                # forkserver: el proceso ya tiene hilos (auditoría, LISTEN, barrido) y
+                # un fork con un lock tomado por otro hilo puede dejar colgado al hijo
+                self._pool = ProcessPoolExecutor(
+                    max_workers=procesos, mp_context=multiprocessing.get_context(_CONTEXTO)
+                )
+                self._pid = os.getpid()
+                self._cupos = threading.BoundedSemaphore(procesos + self._config('CLAVES_COLA', 32))
+            return self._pool
+
+    def ejecutar(self, fn, *args):
+        pool = self._asegurar()
+        if pool is None:
+            return fn(*args)
+        if not self._cupos.acquire(timeout=self._config('CLAVES_ESPERA', 2.0)):
+            raise ColaClavesLlena()
+        try:
+            return pool.submit(fn, *args).result()
+        finally:
+            self._cupos.release()
+
+
+pool_claves = PoolClaves()
+
+
+def metodo_hash():
+    """Parámetros del KDF en formato werkzeug, p. ej. ``scrypt:32768:8:1``."""
+    return current_app.config.get('CLAVES_METODO', 'scrypt:32768:8:1') if has_app_context() else 'scrypt:32768:8:1'
+
+
+def generar_hash(password):
+    return pool_claves.ejecutar(generate_password_hash, password, metodo_hash())
+
+
+def verificar_hash(password_hash, password):
+    if not password_hash:
+        return False
+    return pool_claves.ejecutar(check_password_hash, password_hash, password)
+
+
+def necesita_rehash(password_hash):
+    """True si el hash se generó con otros parámetros que los configurados."""
+    return bool(password_hash) and password_hash.split('$', 1)[0] != metodo_hash()
@@ -0,0 +1,53 @@
+import heapq
+from datetime import timedelta
+
+from models import db, Reserva, DetalleReserva
+from services.carga import comprobar_plazo
+
+
+def detectar_conflictos(lote=1000):
+    """Genera cada par de reservas no canceladas que se solapan en una habitación.
+
+    Recorre ``detalles_reserva`` con un cursor de servidor ordenado por
+    habitación y fecha de inicio y aplica un barrido por habitación con un
+    heap de estancias activas: O(n log n) y memoria acotada por el máximo de
+    estancias simultáneas de una habitación. Las estancias ocupan las noches
+    ``[fecha_inicio, fecha_fin)``.
+    """
+    filas = db.session.execute(
+        db.select(
+            DetalleReserva.habitacion_id,
+            Reserva.id,
+            Reserva.fecha_inicio,
+            Reserva.fecha_fin
+        ).join(Reserva, Reserva.id == DetalleReserva.reserva_id)
+        .where(Reserva.estado != 'cancelada')
+        .distinct()
+        .order_by(DetalleReserva.habitacion_id, Reserva.fecha_inicio, Reserva.id)
+        .execution_options(yield_per=lote)
+    )
+
+    habitacion_actual = None
+    activas = []  # heap de (fin, reserva_id, inicio)
+
+    for habitacion_id, reserva_id, inicio, fin in filas:
+        if habitacion_id != habitacion_actual:
+            # Dentro de una petición respeta su plazo; en la CLI no hace nada
+            comprobar_plazo()
+            habitacion_actual = habitacion_id
+            activas = []
+
+        fin = max(fin, inicio + timedelta(days=1))
+        while activas and activas[0][0] <= inicio:
+            heapq.heappop(activas)
+
+        for otro_fin, otro_id, otro_inicio in activas:
+            yield {
+                'habitacion_id': habitacion_id,
+                'reserva_a': otro_id,
+                'reserva_b': reserva_id,
+                'desde': inicio.isoformat(),
+                'hasta': min(fin, otro_fin).isoformat(),
+            }
+
+        heapq.heappush(activas, (fin, reserva_id, inicio))
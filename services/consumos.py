@@ -0,0 +1,214 @@
+"""Servicios adicionales cargados a reservas (minibar, spa, lavandería...).
+
+Cada línea guarda el precio unitario del momento. ``Reserva.total`` es
+habitaciones + servicios: al cargar o quitar líneas se recalcula con un solo
+UPDATE para todas las reservas tocadas, sumando ambas partes en la base en
+lugar de ir línea a línea.
+"""
+from datetime import datetime
+
+from models import db, Reserva, DetalleReserva, ReservaServicio, Servicio, Habitacion, TipoHabitacion
+from services.cambios import registrar_cambios
+from services.huespedes import marcar_reservas
+
+MAX_LINEAS = 1000
+
+# Dimensiones admitidas por el informe de consumos
+DIMENSIONES = ('servicio', 'fecha', 'tipo')
+
+
+class LineaInvalida(Exception):
+    def __init__(self, msg, status=400):
+        super().__init__(msg)
+        self.msg = msg
+        self.status = status
+
+
+def _importe_linea(rs):
+    # Líneas anteriores a guardar el precio: el del servicio, como se cobraban entonces
+    s = Servicio.__table__
+    precio_servicio = db.select(s.c.precio).where(s.c.id == rs.servicio_id).correlate_except(s).scalar_subquery()
+    return db.func.coalesce(rs.cantidad, 1) * db.func.coalesce(rs.precio, precio_servicio, 0.0)
+
+
+def _suma_habitaciones():
+    return (
+        db.select(db.func.coalesce(db.func.sum(DetalleReserva.precio), 0.0))
+        .where(DetalleReserva.reserva_id == Reserva.id)
+        .scalar_subquery()
+    )
+
+
+def _suma_servicios():
+    return (
+        db.select(db.func.coalesce(db.func.sum(_importe_linea(ReservaServicio)), 0.0))
+        .where(ReservaServicio.reserva_id == Reserva.id)
+        .scalar_subquery()
+    )
+
+
+def importe_servicios(reserva_id):
+    return db.session.execute(
+        db.select(db.func.coalesce(db.func.sum(_importe_linea(ReservaServicio)), 0.0))
+        .where(ReservaServicio.reserva_id == reserva_id)
+    ).scalar()
+
+
+def recalcular_totales(reserva_ids):
+    """total = habitaciones + servicios y saldo = total - pagado, en un único UPDATE.
+
+    Sube la versión de cada reserva y devuelve ``{id: (total, saldo, version)}``. No hace commit.
+    """
+    ids = sorted(set(reserva_ids))
+    if not ids:
+        return {}
+    total = _suma_habitaciones() + _suma_servicios()
+    filas = db.session.execute(
+        db.update(Reserva)
+        .where(Reserva.id.in_(ids))
+        .values(total=total, saldo=total - Reserva.pagado, version=Reserva.version + 1)
+        .returning(Reserva.id, Reserva.hotel_id, Reserva.total, Reserva.saldo, Reserva.version)
+        .execution_options(synchronize_session=False)
+    ).all()
+    registrar_cambios('reserva', [(f.id, f.hotel_id) for f in filas], 'modificacion')
+    marcar_reservas([f.id for f in filas])
+    return {f.id: (f.total, f.saldo, f.version) for f in filas}
+
+
+def _cantidad(valor):
+    try:
+        cantidad = int(valor if valor is not None else 1)
+    except (TypeError, ValueError):
+        raise LineaInvalida('cantidad debe ser un entero')
+    if cantidad <= 0:
+        raise LineaInvalida('cantidad debe ser positiva')
+    return cantidad
+
+
+def agregar_consumos(lineas):
+    """Carga ``lineas`` ({reserva_id, servicio_id, cantidad?, habitacion_id?}) de una vez.
+
+    Todo o nada: si alguna reserva o servicio no existe (o la reserva está
+    cancelada) lanza LineaInvalida sin insertar nada. Tres consultas y un
+    UPDATE sin importar cuántas líneas o reservas haya. No hace commit.
+    """
+    if not lineas:
+        raise LineaInvalida('No hay servicios que cargar')
+    if len(lineas) > MAX_LINEAS:
+        raise LineaInvalida(f'Como máximo {MAX_LINEAS} líneas por petición')
+
+    for linea in lineas:
+        if not isinstance(linea, dict) or not linea.get('reserva_id') or not linea.get('servicio_id'):
+            raise LineaInvalida('Cada línea necesita reserva_id y servicio_id')
+
+    reserva_ids = {l['reserva_id'] for l in lineas}
+    servicio_ids = {l['servicio_id'] for l in lineas}
+
+    # Consultas ORM: la tenencia deja fuera las reservas y servicios de otros hoteles
+    reservas = {f.id: f for f in db.session.execute(
+        db.select(Reserva.id, Reserva.hotel_id, Reserva.estado).where(Reserva.id.in_(reserva_ids))
+    )}
+    faltan = sorted(reserva_ids - reservas.keys())
+    if faltan:
+        raise LineaInvalida(f'Reservas inexistentes: {faltan}', 404)
+    canceladas = sorted(i for i, f in reservas.items() if f.estado == 'cancelada')
+    if canceladas:
+        raise LineaInvalida(f'Reservas canceladas: {canceladas}', 409)
+
+    precios = dict(db.session.execute(
+        db.select(Servicio.id, Servicio.precio).where(Servicio.id.in_(servicio_ids))
+    ).all())
+    faltan = sorted(servicio_ids - precios.keys())
+    if faltan:
+        raise LineaInvalida(f'Servicios inexistentes: {faltan}', 404)
+
+    habitaciones = {}
+    for reserva_id, habitacion_id in db.session.execute(
+        db.select(DetalleReserva.reserva_id, DetalleReserva.habitacion_id)
+        .where(DetalleReserva.reserva_id.in_(reserva_ids))
+    ):
+        habitaciones.setdefault(reserva_id, set()).add(habitacion_id)
+    for l in lineas:
+        if l.get('habitacion_id') and l['habitacion_id'] not in habitaciones.get(l['reserva_id'], ()):
+            raise LineaInvalida(f"La habitación {l['habitacion_id']} no es de la reserva {l['reserva_id']}")
+
+    ahora = datetime.utcnow()
+    valores = [{
+        'reserva_id': l['reserva_id'],
+        'servicio_id': l['servicio_id'],
+        'cantidad': _cantidad(l.get('cantidad')),
+        'precio': precios[l['servicio_id']],
+        'habitacion_id': l.get('habitacion_id') or min(habitaciones.get(l['reserva_id'], [None])),
+        'hotel_id': reservas[l['reserva_id']].hotel_id,
+        'fecha': ahora,
+    } for l in lineas]
+    db.session.execute(db.insert(ReservaServicio.__table__), valores)
+    return recalcular_totales(reserva_ids)
+
+
+def quitar_consumo(reserva_id, linea_id):
+    """Borra una línea y recalcula el total. None si la línea no es de esa reserva."""
+    resultado = db.session.execute(
+        db.delete(ReservaServicio)
+        .where(ReservaServicio.id == linea_id, ReservaServicio.reserva_id == reserva_id)
+        .execution_options(synchronize_session=False)
+    )
+    if resultado.rowcount == 0:
+        return None
+    return recalcular_totales([reserva_id]).get(reserva_id)
+
+
+def consumos_de_reserva(reserva_id):
+    stmt = db.select(
+        ReservaServicio.id,
+        ReservaServicio.servicio_id,
+        Servicio.nombre.label('servicio'),
+        ReservaServicio.cantidad,
+        ReservaServicio.precio,
+        _importe_linea(ReservaServicio).label('importe'),
+        ReservaServicio.habitacion_id,
+        ReservaServicio.fecha
+    ).outerjoin(Servicio, Servicio.id == ReservaServicio.servicio_id).where(
+        ReservaServicio.reserva_id == reserva_id
+    ).order_by(ReservaServicio.id)
+    return [dict(f) for f in db.session.execute(stmt).mappings()]
+
+
+def informe_consumos(dimensiones, desde=None, hasta=None):
+    """Cantidad e importe agrupados por ``dimensiones`` en una sola consulta GROUP BY."""
+    columnas = []
+    if 'servicio' in dimensiones:
+        columnas += [ReservaServicio.servicio_id, Servicio.nombre.label('servicio')]
+    if 'fecha' in dimensiones:
+        columnas.append(db.func.date(ReservaServicio.fecha).label('fecha'))
+    if 'tipo' in dimensiones:
+        columnas += [Habitacion.tipo_id, TipoHabitacion.nombre.label('tipo')]
+
+    stmt = db.select(
+        *columnas,
+        db.func.count(ReservaServicio.id).label('lineas'),
+        db.func.sum(db.func.coalesce(ReservaServicio.cantidad, 1)).label('cantidad'),
+        db.func.sum(_importe_linea(ReservaServicio)).label('importe')
+    ).select_from(ReservaServicio).join(
+        Reserva, Reserva.id == ReservaServicio.reserva_id
+    ).where(Reserva.estado != 'cancelada')
+
+    if 'servicio' in dimensiones:
+        stmt = stmt.outerjoin(Servicio, Servicio.id == ReservaServicio.servicio_id)
+    if 'tipo' in dimensiones:
+        stmt = stmt.outerjoin(Habitacion, Habitacion.id == ReservaServicio.habitacion_id) \
+                   .outerjoin(TipoHabitacion, TipoHabitacion.id == Habitacion.tipo_id)
+    if desde:
+        stmt = stmt.where(ReservaServicio.fecha >= desde)
+    if hasta:
+        stmt = stmt.where(ReservaServicio.fecha < hasta)
+
+    if columnas:
+        stmt = stmt.group_by(*columnas).order_by(*columnas)
+    filas = []
+    for f in db.session.execute(stmt).mappings():
+        fila = dict(f)
+        if 'fecha' in fila and fila['fecha'] is not None:
+            fila['fecha'] = str(fila['fecha'])
+        filas.append(fila)
+    return filas
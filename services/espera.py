@@ -0,0 +1,271 @@
+"""Lista de espera: clientes a los que avisar cuando se libera un tipo de habitación.
+
+Cada entrada pide ``cantidad`` habitaciones de un tipo para [fecha_inicio,
+fecha_fin) hasta ``expira``. Cuando se abre capacidad (cancelación, cambio de
+habitaciones, habitación nueva o reabierta) ``emparejar`` no recorre la lista:
+una sola consulta por rango sobre el índice parcial de las pendientes
+(tipo_id, fecha_inicio, fecha_fin) trae solo las entradas que se solapan con
+lo liberado y caben en el hueco libre que lo rodea.
+
+Las candidatas se prueban por prioridad y antigüedad sobre los calendarios de
+services.asignacion, con las ofertas vigentes ya colocadas: la misma
+habitación no se ofrece dos veces. Las que caben pasan a 'ofrecida' y se
+publica un evento ``lista_espera``; la oferta ocupa su sitio durante
+ESPERA_OFERTA_HORAS.
+"""
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+
+from models import db, EsperaReserva, Reserva, DetalleReserva, Habitacion, Cliente, TipoHabitacion
+from services.asignacion import NO_ASIGNABLES, calendarios_de, colocar, ocupar_ofertas
+from services.catalogo import catalogo
+from services.eventos import publicar
+
+ESTADOS = ('pendiente', 'ofrecida', 'atendida', 'expirada', 'cancelada')
+# Reservas que ya no ocupan su habitación
+NO_OCUPAN = ('cancelada', 'no_show', 'finalizada')
+
+
+class EsperaInvalida(Exception):
+    def __init__(self, msg, status=400):
+        super().__init__(msg)
+        self.msg = msg
+        self.status = status
+
+
+def emparejar(hotel_id, tipo_id, desde, hasta=None, liberado=None, solo=None):
+    """Ofrece la capacidad libre del tipo a las pendientes que quepan y hace commit.
+
+    Solo se miran entradas con llegada en [desde, ...) y salida hasta ``hasta``
+    (None = sin límite) que se solapen con ``liberado`` = (inicio, fin), si se
+    da. Devuelve los ids de las entradas ofrecidas.
+    """
+    ahora = datetime.utcnow()
+    stmt = db.select(EsperaReserva).where(
+        EsperaReserva.tipo_id == tipo_id,
+        EsperaReserva.estado == 'pendiente',
+        EsperaReserva.fecha_inicio >= desde,
+        EsperaReserva.expira > ahora
+    )
+    if hasta is not None:
+        stmt = stmt.where(EsperaReserva.fecha_fin <= hasta)
+    if liberado is not None:
+        stmt = stmt.where(EsperaReserva.fecha_inicio < liberado[1], EsperaReserva.fecha_fin > liberado[0])
+    if hotel_id is not None:
+        stmt = stmt.where(EsperaReserva.hotel_id == hotel_id)
+    if solo is not None:
+        stmt = stmt.where(EsperaReserva.id == solo)
+    candidatas = db.session.execute(
+        stmt.order_by(EsperaReserva.prioridad.desc(), EsperaReserva.fecha_creacion, EsperaReserva.id)
+    ).scalars().all()
+    if not candidatas:
+        db.session.commit()
+        return []
+
+    habitaciones = catalogo().por_tipo(hotel_id, tipo_id, excluir=NO_ASIGNABLES).get((hotel_id, tipo_id), [])
+    if not habitaciones:
+        db.session.commit()
+        return []
+    # Mismo bloqueo que services.asignacion: una reserva nueva no se lleva lo que se está ofreciendo
+    habitaciones = db.session.execute(
+        db.select(Habitacion.id).where(Habitacion.id.in_(habitaciones))
+        .order_by(Habitacion.id).with_for_update()
+    ).scalars().all()
+
+    inicio = min(c.fecha_inicio for c in candidatas)
+    fin = max(c.fecha_fin for c in candidatas)
+    min_hueco = current_app.config.get('ASIGNACION_MIN_HUECO', 2)
+    calendarios = calendarios_de(habitaciones, inicio, fin)
+    ocupar_ofertas(calendarios, hotel_id, tipo_id, inicio, fin, min_hueco, ahora)
+
+    caduca = ahora + timedelta(hours=current_app.config.get('ESPERA_OFERTA_HORAS', 24))
+    ofrecidas = []
+    for entrada in candidatas:
+        if colocar(calendarios, entrada.fecha_inicio, entrada.fecha_fin, entrada.cantidad or 1, min_hueco) is None:
+            continue
+        entrada.estado = 'ofrecida'
+        entrada.fecha_oferta = ahora
+        entrada.oferta_expira = caduca
+        ofrecidas.append(entrada.id)
+        publicar('lista_espera', {
+            'id': entrada.id,
+            'cliente_id': entrada.cliente_id,
+            'tipo_id': entrada.tipo_id,
+            'desde': entrada.fecha_inicio.isoformat(),
+            'hasta': entrada.fecha_fin.isoformat(),
+            'cantidad': entrada.cantidad,
+            'oferta_expira': caduca.isoformat()
+        }, entrada.hotel_id)
+    db.session.commit()
+    return ofrecidas
+
+
+def _ventana_libre(habitaciones, inicio, fin, hoy):
+    """(desde, hasta) que abarca el hueco libre alrededor de [inicio, fin) en ``habitaciones``.
+
+    ``hasta`` es None si alguna no tiene nada reservado después.
+    """
+    vigentes = (DetalleReserva.habitacion_id.in_(habitaciones), Reserva.estado.notin_(NO_OCUPAN))
+    anteriores = dict(db.session.execute(
+        db.select(DetalleReserva.habitacion_id, db.func.max(Reserva.fecha_fin))
+        .join(Reserva, Reserva.id == DetalleReserva.reserva_id)
+        .where(*vigentes, Reserva.fecha_fin <= inicio)
+        .group_by(DetalleReserva.habitacion_id)
+    ).all())
+    siguientes = dict(db.session.execute(
+        db.select(DetalleReserva.habitacion_id, db.func.min(Reserva.fecha_inicio))
+        .join(Reserva, Reserva.id == DetalleReserva.reserva_id)
+        .where(*vigentes, Reserva.fecha_inicio >= fin)
+        .group_by(DetalleReserva.habitacion_id)
+    ).all())
+    desde = min(anteriores.get(h) or hoy for h in habitaciones)
+    hasta = None if any(h not in siguientes for h in habitaciones) else max(siguientes.values())
+    return max(desde, hoy), hasta
+
+
+def liberadas(habitaciones, inicio, fin, hoy=None):
+    """Capacidad abierta en ``habitaciones`` para [inicio, fin): ya en la base, tras el commit."""
+    hoy = hoy or date.today()
+    if not habitaciones or fin <= hoy:
+        return []
+    cat = catalogo()
+    grupos = {}
+    for hab_id in habitaciones:
+        h = cat.habitacion(hab_id)
+        if h and h['tipo_id'] is not None and h['estado'] not in NO_ASIGNABLES:
+            grupos.setdefault((h['hotel_id'], h['tipo_id']), []).append(hab_id)
+
+    ofrecidas = []
+    for (hotel_id, tipo_id), ids in sorted(grupos.items(), key=lambda g: (g[0][0] or 0, g[0][1])):
+        desde, hasta = _ventana_libre(ids, inicio, fin, hoy)
+        ofrecidas += emparejar(hotel_id, tipo_id, desde, hasta, liberado=(max(inicio, hoy), fin))
+    return ofrecidas
+
+
+def habitacion_abierta(habitacion, hoy=None):
+    """Habitación nueva, reabierta o cambiada de tipo: todo su calendario futuro cuenta."""
+    if habitacion.tipo_id is None or habitacion.estado in NO_ASIGNABLES:
+        return []
+    return emparejar(habitacion.hotel_id, habitacion.tipo_id, hoy or date.today())
+
+
+def retirar(entrada, estado, reserva_id=None):
+    """Cierra la entrada como ``estado`` y hace commit; si tenía oferta, su sitio pasa al siguiente."""
+    tenia_oferta = entrada.estado == 'ofrecida'
+    entrada.estado = estado
+    if reserva_id is not None:
+        entrada.reserva_id = reserva_id
+    hotel_id, tipo_id = entrada.hotel_id, entrada.tipo_id
+    inicio, fin = entrada.fecha_inicio, entrada.fecha_fin
+    db.session.commit()
+    hoy = date.today()
+    if tenia_oferta and estado != 'atendida' and fin > hoy:
+        return avisar(emparejar, hotel_id, tipo_id, hoy, liberado=(max(inicio, hoy), fin))
+    return []
+
+
+def avisar(funcion, *args, **kwargs):
+    """Lanza el emparejamiento sin que un fallo afecte a la operación que ya hizo commit."""
+    try:
+        return funcion(*args, **kwargs)
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception('Falló el emparejamiento de la lista de espera')
+        return []
+
+
+def _fecha(valor, campo):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise EsperaInvalida(f'{campo} debe tener formato YYYY-MM-DD')
+
+
+def _entero(valor, campo, defecto, minimo):
+    try:
+        numero = int(valor if valor is not None else defecto)
+    except (TypeError, ValueError):
+        raise EsperaInvalida(f'{campo} debe ser un entero')
+    if numero < minimo:
+        raise EsperaInvalida(f'{campo} debe ser al menos {minimo}')
+    return numero
+
+
+def crear_entrada(datos):
+    """Valida y guarda una entrada pendiente (sin commit). Caduca como tarde el día de llegada."""
+    if not all(datos.get(c) for c in ('cliente_id', 'tipo_id', 'fecha_inicio', 'fecha_fin')):
+        raise EsperaInvalida('Datos incompletos')
+    inicio = _fecha(datos['fecha_inicio'], 'fecha_inicio')
+    fin = _fecha(datos['fecha_fin'], 'fecha_fin')
+    if fin <= inicio:
+        raise EsperaInvalida('fecha_fin debe ser posterior a fecha_inicio')
+    if inicio < date.today():
+        raise EsperaInvalida('fecha_inicio ya ha pasado')
+
+    limite = datetime.combine(inicio, datetime.min.time())
+    expira = limite
+    if datos.get('expira'):
+        try:
+            expira = min(datetime.fromisoformat(datos['expira']), limite)
+        except (TypeError, ValueError):
+            raise EsperaInvalida('expira debe ser una fecha ISO 8601')
+
+    # Consultas ORM: la tenencia y las bajas lógicas dejan fuera clientes y tipos ajenos
+    if db.session.execute(db.select(Cliente.id).where(Cliente.id == datos['cliente_id'])).first() is None:
+        raise EsperaInvalida('Cliente no encontrado', 404)
+    tipo = db.session.execute(
+        db.select(TipoHabitacion.id, TipoHabitacion.hotel_id).where(TipoHabitacion.id == datos['tipo_id'])
+    ).first()
+    if tipo is None:
+        raise EsperaInvalida('Tipo de habitación no encontrado', 404)
+
+    entrada = EsperaReserva(
+        cliente_id=datos['cliente_id'],
+        tipo_id=tipo.id,
+        fecha_inicio=inicio,
+        fecha_fin=fin,
+        cantidad=_entero(datos.get('cantidad'), 'cantidad', 1, 1),
+        prioridad=_entero(datos.get('prioridad'), 'prioridad', 0, 0),
+        expira=expira,
+        estado='pendiente'
+    )
+    # Usuarios de grupo: la entrada es del hotel del tipo pedido
+    if tipo.hotel_id is not None:
+        entrada.hotel_id = tipo.hotel_id
+    db.session.add(entrada)
+    return entrada
+
+
+def depurar(ahora=None):
+    """Caduca entradas y ofertas vencidas y reofrece lo que liberan las ofertas. Hace commit."""
+    ahora = ahora or datetime.utcnow()
+    caducadas = db.session.execute(
+        db.update(EsperaReserva)
+        .where(EsperaReserva.estado == 'pendiente', EsperaReserva.expira <= ahora)
+        .values(estado='expirada')
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    # Una oferta sin confirmar no vuelve a la cola: el siguiente de la lista tiene su turno
+    vencidas = db.session.execute(
+        db.update(EsperaReserva)
+        .where(EsperaReserva.estado == 'ofrecida', EsperaReserva.oferta_expira <= ahora)
+        .values(estado='expirada')
+        .returning(EsperaReserva.hotel_id, EsperaReserva.tipo_id,
+                   EsperaReserva.fecha_inicio, EsperaReserva.fecha_fin)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.session.commit()
+
+    ventanas = {}
+    for v in vencidas:
+        clave = (v.hotel_id, v.tipo_id)
+        inicio, fin = ventanas.get(clave, (v.fecha_inicio, v.fecha_fin))
+        ventanas[clave] = (min(inicio, v.fecha_inicio), max(fin, v.fecha_fin))
+    hoy = ahora.date()
+    ofrecidas = []
+    for (hotel_id, tipo_id), (inicio, fin) in sorted(ventanas.items(), key=lambda x: (x[0][0] or 0, x[0][1])):
+        if fin > hoy:
+            ofrecidas += emparejar(hotel_id, tipo_id, hoy, liberado=(max(inicio, hoy), fin))
+    return {'caducadas': caducadas, 'ofertas_vencidas': len(vencidas), 'ofrecidas': len(ofrecidas)}
@@ -0,0 +1,182 @@
+import json
+import logging
+import os
+import queue
+import select
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db
+
+log = logging.getLogger(__name__)
+
+CANAL = 'disponibilidad'
+
+
+class Suscripcion:
+    def __init__(self, hotel_id, maximo):
+        self.hotel_id = hotel_id
+        self.cola = queue.Queue(maxsize=maximo)
+        self.cerrada = False
+
+    def admite(self, evento):
+        return self.hotel_id is None or evento.get('hotel_id') in (None, self.hotel_id)
+
+
+class Hub:
+    """Reparte los eventos de este proceso entre sus suscriptores SSE.
+
+    Guarda los últimos eventos en orden de llegada para reanudar desde
+    Last-Event-ID. Con LISTEN/NOTIFY todos los workers reciben los eventos en
+    el mismo orden (el de commit), así que la posición del id sirve en
+    cualquiera de ellos aunque el cliente reconecte a otro.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._suscripciones = set()
+        self._historial = deque(maxlen=1000)
+        self._oyente = None
+        self._pid = None
+        self.cola_max = 100
+        self.max_clientes = 0
+
+    def configurar(self, historial, cola_max, max_clientes=0):
+        with self._lock:
+            self._historial = deque(self._historial, maxlen=historial)
+            self.cola_max = cola_max
+            self.max_clientes = max_clientes
+
+    def lleno(self):
+        with self._lock:
+            return 0 < self.max_clientes <= len(self._suscripciones)
+
+    def entregar(self, evento):
+        with self._lock:
+            self._historial.append(evento)
+            for s in list(self._suscripciones):
+                if not s.admite(evento):
+                    continue
+                try:
+                    s.cola.put_nowait(evento)
+                except queue.Full:
+                    # Cliente lento: se le corta y reanudará con Last-Event-ID
+                    s.cerrada = True
+                    self._suscripciones.discard(s)
+
+    def suscribir(self, hotel_id, ultimo_id=None):
+        """Devuelve (suscripción, eventos pendientes); pendientes=None si ya no están en el historial."""
+        s = Suscripcion(hotel_id, self.cola_max)
+        with self._lock:
+            self._suscripciones.add(s)
+            if not ultimo_id:
+                return s, []
+            ids = [e['id'] for e in self._historial]
+            if ultimo_id not in ids:
+                return s, None
+            pendientes = list(self._historial)[ids.index(ultimo_id) + 1:]
+            return s, [e for e in pendientes if s.admite(e)]
+
+    def desuscribir(self, s):
+        with self._lock:
+            self._suscripciones.discard(s)
+
+    def reiniciar_todos(self):
+        """Se perdieron eventos (p. ej. se cayó el LISTEN): que todos recarguen."""
+        self.entregar({'id': _nuevo_id(), 'tipo': 'reinicio', 'hotel_id': None, 'datos': {}})
+
+    def asegurar_oyente(self, app):
+        if app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0] not in ('postgresql', 'postgres'):
+            return
+        with self._lock:
+            if self._oyente is not None and self._oyente.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._oyente = threading.Thread(target=_escuchar, args=(app, self), daemon=True)
+            self._oyente.start()
+
+
+hub = Hub()
+
+
+def _nuevo_id():
+    return f'{time.time_ns()}-{os.getpid()}'
+
+
+def _escuchar(app, hub):
+    """Hilo con una conexión propia (fuera del pool) en LISTEN."""
+    import psycopg2
+    import psycopg2.extensions
+
+    with app.app_context():
+        dsn = db.engine.url.render_as_string(hide_password=False).replace('postgresql+psycopg2', 'postgresql')
+
+    primera = True
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(dsn)
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            conn.cursor().execute(f'LISTEN {CANAL}')
+            if not primera:
+                hub.reiniciar_todos()
+            primera = False
+            while True:
+                if select.select([conn], [], [], 30) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    hub.entregar(json.loads(conn.notifies.pop(0).payload))
+        except Exception:
+            log.exception('LISTEN %s caído, reintentando', CANAL)
+            if conn is not None:
+                conn.close()
+            time.sleep(2)
+
+
+def publicar(tipo, datos, hotel_id=None):
+    """Encola un evento en la transacción actual; solo se emite si hace commit."""
+    evento = {'id': _nuevo_id(), 'tipo': tipo, 'hotel_id': hotel_id, 'datos': datos}
+    if db.engine.dialect.name == 'postgresql':
+        # NOTIFY es transaccional: llega a todos los workers al hacer commit
+        db.session.execute(
+            db.text('SELECT pg_notify(:canal, :payload)'),
+            {'canal': CANAL, 'payload': json.dumps(evento)}
+        )
+    else:
+        db.session.info.setdefault('eventos', []).append(evento)
+
+
+def publicar_ocupacion(reserva, habitaciones, disponible):
+    if habitaciones:
+        publicar('disponibilidad', {
+            'reserva_id': reserva.id,
+            'habitaciones': sorted(habitaciones),
+            'desde': reserva.fecha_inicio.isoformat(),
+            'hasta': reserva.fecha_fin.isoformat(),
+            'disponible': disponible
+        }, reserva.hotel_id)
+
+
+def _tras_commit(sesion):
+    for evento in sesion.info.pop('eventos', []):
+        hub.entregar(evento)
+
+
+def _tras_rollback(sesion, transaccion_previa):
+    sesion.info.pop('eventos', None)
+
+
+def formato_sse(evento):
+    return f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {json.dumps(evento['datos'])}\n\n"
+
+
+def init_eventos(app):
+    hub.configurar(app.config.get('EVENTOS_HISTORIAL', 1000), app.config.get('EVENTOS_COLA', 100),
+                   app.config.get('EVENTOS_MAX_CLIENTES', 0))
+    event.listen(Session, 'after_commit', _tras_commit)
+    event.listen(Session, 'after_soft_rollback', _tras_rollback)
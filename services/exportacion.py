@@ -0,0 +1,186 @@
+import os
+import zipfile
+
+from models import db, Reserva, DetalleReserva, Pago, hotel_actual
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except ImportError:  # pragma: no cover - dependencia opcional
+    pa = None
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - dependencia opcional
+    pq = None
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - dependencia opcional
+    np = None
+
+TABLAS_EXPORTABLES = {
+    'reservas': Reserva.__table__,
+    'detalles_reserva': DetalleReserva.__table__,
+    'pagos': Pago.__table__,
+}
+
+EXTENSIONES = {'parquet': 'parquet', 'arrow': 'arrow', 'npz': 'npz'}
+
+
+def formatos_disponibles():
+    formatos = []
+    if pq is not None:
+        formatos.append('parquet')
+    if pa is not None:
+        formatos.append('arrow')
+    if np is not None:
+        formatos.append('npz')
+    return formatos
+
+
+def formato_por_defecto():
+    disponibles = formatos_disponibles()
+    if not disponibles:
+        raise RuntimeError('La exportación columnar requiere pyarrow o numpy')
+    return disponibles[0]
+
+
+def _tipo_columna(columna):
+    tipo = columna.type
+    if isinstance(tipo, db.Boolean):
+        return 'bool'
+    if isinstance(tipo, db.Integer):
+        return 'int'
+    if isinstance(tipo, db.Float):
+        return 'float'
+    if isinstance(tipo, db.DateTime):
+        return 'timestamp'
+    if isinstance(tipo, db.Date):
+        return 'date'
+    return 'string'
+
+
+def _leer_lotes(tabla, lote):
+    """Itera la tabla en bloques de ``lote`` filas con un cursor de servidor."""
+    stmt = db.select(tabla).order_by(*tabla.primary_key.columns)
+    # Select Core sobre Table: el filtro automático por hotel no aplica, se añade aquí
+    if hotel_actual() is not None:
+        stmt = stmt.where(tabla.c.hotel_id == hotel_actual())
+    resultado = db.session.execute(stmt.execution_options(yield_per=lote))
+    for bloque in resultado.partitions():
+        # Transpone filas -> columnas
+        yield list(zip(*bloque))
+
+
+# ---------------------------------------------------------
+# Arrow / Parquet
+# ---------------------------------------------------------
+def _esquema_arrow(tabla):
+    tipos = {
+        'bool': pa.bool_(),
+        'int': pa.int64(),
+        'float': pa.float64(),
+        'timestamp': pa.timestamp('us'),
+        'date': pa.date32(),
+        'string': pa.string(),
+    }
+    return pa.schema([(c.name, tipos[_tipo_columna(c)]) for c in tabla.columns])
+
+
+def _escribir_arrow(tabla, ruta, lote, formato):
+    esquema = _esquema_arrow(tabla)
+    if formato == 'parquet':
+        escritor = pq.ParquetWriter(ruta, esquema, compression='zstd')
+        escribir = escritor.write_batch
+    else:
+        sink = pa.OSFile(ruta, 'wb')
+        escritor = pa_ipc.new_file(sink, esquema, options=pa_ipc.IpcWriteOptions(compression='zstd'))
+        escribir = escritor.write_batch
+
+    filas = 0
+    try:
+        for columnas in _leer_lotes(tabla, lote):
+            batch = pa.record_batch(
+                [pa.array(valores, type=campo.type) for valores, campo in zip(columnas, esquema)],
+                schema=esquema
+            )
+            escribir(batch)
+            filas += batch.num_rows
+    finally:
+        escritor.close()
+        if formato == 'arrow':
+            sink.close()
+    return filas
+
+
+# ---------------------------------------------------------
+# NumPy .npz (sin pyarrow)
+# ---------------------------------------------------------
+def _array_numpy(valores, tipo):
+    # .npz no tiene nulos: -1 en enteros, NaN/NaT en flotantes y fechas, '' en textos
+    if tipo == 'int':
+        return np.array([-1 if v is None else v for v in valores], dtype=np.int64)
+    if tipo == 'float':
+        return np.array([np.nan if v is None else v for v in valores], dtype=np.float64)
+    if tipo == 'date':
+        return np.array(valores, dtype='datetime64[D]')
+    if tipo == 'timestamp':
+        return np.array(valores, dtype='datetime64[us]')
+    if tipo == 'bool':
+        return np.array([bool(v) for v in valores], dtype=np.bool_)
+    return np.array(['' if v is None else v for v in valores], dtype=np.str_)
+
+
+def _escribir_npz(tabla, ruta, lote):
+    nombres = [c.name for c in tabla.columns]
+    tipos = [_tipo_columna(c) for c in tabla.columns]
+    trozos = {n: [] for n in nombres}
+
+    filas = 0
+    for columnas in _leer_lotes(tabla, lote):
+        for nombre, tipo, valores in zip(nombres, tipos, columnas):
+            trozos[nombre].append(_array_numpy(valores, tipo))
+        filas += len(columnas[0])
+
+    arrays = {
+        n: np.concatenate(trozos[n]) if trozos[n] else _array_numpy([], t)
+        for n, t in zip(nombres, tipos)
+    }
+    with open(ruta, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+    return filas
+
+
+def exportar(directorio, formato=None, lote=10000, tablas=None):
+    """Exporta reservas, detalles y pagos a ficheros columnar en ``directorio``.
+
+    Devuelve un dict ``{tabla: (ruta, filas)}``.
+    """
+    formato = formato or formato_por_defecto()
+    if formato not in formatos_disponibles():
+        raise RuntimeError(f'Formato no disponible: {formato}')
+
+    os.makedirs(directorio, exist_ok=True)
+    resultado = {}
+    for nombre in tablas or TABLAS_EXPORTABLES:
+        tabla = TABLAS_EXPORTABLES[nombre]
+        ruta = os.path.join(directorio, f'{nombre}.{EXTENSIONES[formato]}')
+        if formato == 'npz':
+            filas = _escribir_npz(tabla, ruta, lote)
+        else:
+            filas = _escribir_arrow(tabla, ruta, lote, formato)
+        resultado[nombre] = (ruta, filas)
+    return resultado
+
+
+def empaquetar(directorio, rutas):
+    """Agrupa los ficheros exportados en un zip (ya vienen comprimidos)."""
+    destino = os.path.join(directorio, 'exportacion.zip')
+    temporal = destino + '.tmp'
+    with zipfile.ZipFile(temporal, 'w', compression=zipfile.ZIP_STORED) as zf:
+        for ruta in rutas:
+            zf.write(ruta, os.path.basename(ruta))
+    # El zip solo aparece completo: su presencia marca el trabajo como listo
+    os.replace(temporal, destino)
+    return destino
@@ -0,0 +1,250 @@
+"""Agregados por huésped (``resumen_clientes``): estancias, noches, ingresos, pagado.
+
+No se suman deltas: en cada transacción que toca reservas, detalles,
+servicios o pagos se anotan los clientes afectados y, justo antes del
+commit, se recalculan solo esos con un INSERT ... SELECT ... ON CONFLICT.
+El mismo SELECT sin filtro reconstruye la tabla entera.
+
+Al archivar reservas su parte se acumula en ``resumen_clientes_archivo``
+(``archivar``) y el SELECT la suma a la de las reservas vivas: ni un
+recálculo ni una reconstrucción pierden la historia archivada.
+
+Las filas no se borran (un cliente sin nada queda a cero): ``revision`` va
+en el ETag del cliente y así nunca vuelve a un valor ya servido. Solo
+``olvidar`` las quita, al borrar el propio cliente.
+"""
+from datetime import datetime
+
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import db, Reserva, DetalleReserva, ReservaServicio, Pago, ResumenCliente, ResumenClienteArchivo
+
+# Reservas que no cuentan como estancia
+NO_ESTANCIA = ('cancelada', 'no_show')
+
+_CLAVE_CLIENTES = 'resumen_clientes'
+_CLAVE_RESERVAS = 'resumen_reservas'
+
+
+def _insert(dialecto, tabla=ResumenCliente.__table__):
+    if dialecto == 'postgresql':
+        return postgresql.insert(tabla)
+    if dialecto == 'sqlite':
+        return sqlite.insert(tabla)
+    raise RuntimeError(f'Upsert no soportado para {dialecto}')
+
+
+def _noches(r, dialecto):
+    if dialecto == 'sqlite':
+        return db.cast(db.func.julianday(r.c.fecha_fin) - db.func.julianday(r.c.fecha_inicio), db.Integer)
+    return r.c.fecha_fin - r.c.fecha_inicio
+
+
+def _select_por_reserva(dialecto, clientes=None, reservas=None):
+    """Una fila por reserva viva con su aportación a cada agregado."""
+    # Tablas Core: el resumen es de grupo y no debe filtrarse por el hotel del usuario
+    r = Reserva.__table__
+    d = DetalleReserva.__table__
+    p = Pago.__table__
+
+    def hijas(stmt, columna):
+        if reservas is not None:
+            return stmt.where(columna.in_(reservas))
+        if clientes is None:
+            return stmt
+        return stmt.where(columna.in_(db.select(r.c.id).where(r.c.cliente_id.in_(clientes))))
+
+    habs = hijas(
+        db.select(d.c.reserva_id, db.func.count().label('n')).group_by(d.c.reserva_id),
+        d.c.reserva_id
+    ).subquery()
+    pagos = hijas(
+        db.select(p.c.reserva_id, db.func.sum(p.c.monto).label('monto')).group_by(p.c.reserva_id),
+        p.c.reserva_id
+    ).subquery()
+
+    valida = r.c.estado.notin_(NO_ESTANCIA)
+
+    def si_valida(expr, defecto=0):
+        return db.case((valida, expr), else_=defecto)
+
+    stmt = db.select(
+        r.c.cliente_id,
+        si_valida(1).label('estancias'),
+        si_valida(_noches(r, dialecto) * db.func.coalesce(habs.c.n, 0)).label('noches'),
+        # total ya incluye los servicios cargados (services.consumos)
+        si_valida(db.func.coalesce(r.c.total, 0.0), 0.0).label('ingresos'),
+        db.func.coalesce(pagos.c.monto, 0.0).label('pagado'),
+        si_valida(r.c.fecha_inicio, None).label('primera_estancia'),
+        si_valida(r.c.fecha_inicio, None).label('ultima_estancia'),
+    ).select_from(
+        r.outerjoin(habs, habs.c.reserva_id == r.c.id)
+        .outerjoin(pagos, pagos.c.reserva_id == r.c.id)
+    ).where(r.c.cliente_id.isnot(None))
+
+    if reservas is not None:
+        stmt = stmt.where(r.c.id.in_(reservas))
+    if clientes is not None:
+        stmt = stmt.where(r.c.cliente_id.in_(clientes))
+    return stmt
+
+
+def _sumar(filas, *extra):
+    """Agrega por cliente las filas de ``filas`` (subconsulta con las columnas del resumen)."""
+    return db.select(
+        filas.c.cliente_id,
+        db.func.sum(filas.c.estancias).label('estancias'),
+        db.func.sum(filas.c.noches).label('noches'),
+        db.func.sum(filas.c.ingresos).label('ingresos'),
+        db.func.sum(filas.c.pagado).label('pagado'),
+        db.func.min(filas.c.primera_estancia).label('primera_estancia'),
+        db.func.max(filas.c.ultima_estancia).label('ultima_estancia'),
+        *extra
+    ).group_by(filas.c.cliente_id)
+
+
+def _select_agregados(dialecto, clientes=None):
+    a = ResumenClienteArchivo.__table__
+    archivadas = db.select(
+        a.c.cliente_id, a.c.estancias, a.c.noches, a.c.ingresos, a.c.pagado,
+        a.c.primera_estancia, a.c.ultima_estancia
+    )
+    if clientes is not None:
+        archivadas = archivadas.where(a.c.cliente_id.in_(clientes))
+    filas = db.union_all(_select_por_reserva(dialecto, clientes), archivadas).subquery()
+    return _sumar(
+        filas,
+        db.literal(1).label('revision'),
+        db.literal(datetime.utcnow(), db.DateTime).label('actualizado'),
+    )
+
+
+def recalcular(clientes=None, sesion=None):
+    """Recalcula el resumen de ``clientes`` (todos si es None). No hace commit."""
+    sesion = sesion or db.session
+    dialecto = db.engine.dialect.name
+    if clientes is not None:
+        clientes = sorted(set(clientes))
+        if not clientes:
+            return 0
+
+    t = ResumenCliente.__table__
+    seleccion = _select_agregados(dialecto, clientes)
+    columnas = [c.name for c in seleccion.selected_columns]
+    stmt = _insert(dialecto).from_select(columnas, seleccion)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[t.c.cliente_id],
+        set_={
+            **{c: stmt.excluded[c] for c in columnas if c not in ('cliente_id', 'revision')},
+            'revision': t.c.revision + 1
+        }
+    )
+    sesion.execute(stmt)
+
+    # Clientes que se quedaron sin reservas: a cero, sin borrar la fila (revision no retrocede)
+    a = ResumenClienteArchivo.__table__
+    a_cero = db.update(t).where(
+        ~db.exists().where(Reserva.__table__.c.cliente_id == t.c.cliente_id),
+        ~db.exists().where(a.c.cliente_id == t.c.cliente_id),
+        db.or_(t.c.estancias != 0, t.c.noches != 0, t.c.ingresos != 0, t.c.pagado != 0,
+               t.c.primera_estancia.isnot(None))
+    ).values(
+        estancias=0, noches=0, ingresos=0.0, pagado=0.0, primera_estancia=None, ultima_estancia=None,
+        revision=t.c.revision + 1, actualizado=datetime.utcnow()
+    )
+    if clientes is not None:
+        a_cero = a_cero.where(t.c.cliente_id.in_(clientes))
+    sesion.execute(a_cero)
+    return len(clientes) if clientes is not None else None
+
+
+def archivar(reserva_ids, sesion=None):
+    """Acumula en resumen_clientes_archivo lo que aportan ``reserva_ids``, antes de borrarlas.
+
+    Lo llama services.archivo en la misma transacción; resumen_clientes no cambia.
+    """
+    sesion = sesion or db.session
+    if not reserva_ids:
+        return
+    dialecto = db.engine.dialect.name
+    a = ResumenClienteArchivo.__table__
+    seleccion = _sumar(_select_por_reserva(dialecto, reservas=list(reserva_ids)).subquery())
+    columnas = [c.name for c in seleccion.selected_columns]
+    stmt = _insert(dialecto, a).from_select(columnas, seleccion)
+    # LEAST/GREATEST en Postgres; en SQLite min()/max() con dos argumentos son escalares
+    menor = db.func.least if dialecto == 'postgresql' else db.func.min
+    mayor = db.func.greatest if dialecto == 'postgresql' else db.func.max
+
+    def extremo(f, actual, nuevo):
+        # Con un NULL el de SQLite devuelve NULL: se compara cada uno consigo mismo en su lugar
+        return f(db.func.coalesce(actual, nuevo), db.func.coalesce(nuevo, actual))
+
+    sesion.execute(stmt.on_conflict_do_update(
+        index_elements=[a.c.cliente_id],
+        set_={
+            'estancias': a.c.estancias + stmt.excluded.estancias,
+            'noches': a.c.noches + stmt.excluded.noches,
+            'ingresos': a.c.ingresos + stmt.excluded.ingresos,
+            'pagado': a.c.pagado + stmt.excluded.pagado,
+            'primera_estancia': extremo(menor, a.c.primera_estancia, stmt.excluded.primera_estancia),
+            'ultima_estancia': extremo(mayor, a.c.ultima_estancia, stmt.excluded.ultima_estancia),
+        }
+    ))
+
+
+def olvidar(cliente_id, sesion=None):
+    """Borra las filas de resumen de ``cliente_id``, vivas y de archivo, antes de borrar el cliente. No hace commit."""
+    sesion = sesion or db.session
+    for tabla in (ResumenCliente.__table__, ResumenClienteArchivo.__table__):
+        sesion.execute(db.delete(tabla).where(tabla.c.cliente_id == cliente_id))
+
+
+def reconstruir():
+    recalcular()
+    db.session.commit()
+    return db.session.query(ResumenCliente).count()
+
+
+def marcar_reservas(reserva_ids, sesion=None):
+    """Para escrituras Core: anota reservas cuyo cliente hay que recalcular al hacer commit."""
+    (sesion or db.session()).info.setdefault(_CLAVE_RESERVAS, set()).update(reserva_ids)
+
+
+def _anotar(session, flush_context):
+    clientes = session.info.setdefault(_CLAVE_CLIENTES, set())
+    reservas = session.info.setdefault(_CLAVE_RESERVAS, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Reserva):
+            clientes.add(obj.cliente_id)
+            # Si cambió de cliente, el anterior también
+            clientes.update(inspect(obj).attrs.cliente_id.history.deleted or ())
+        elif isinstance(obj, (DetalleReserva, ReservaServicio, Pago)):
+            reservas.add(obj.reserva_id)
+
+
+def _antes_de_commit(session):
+    session.flush()
+    clientes = session.info.pop(_CLAVE_CLIENTES, set())
+    reservas = session.info.pop(_CLAVE_RESERVAS, set())
+    reservas.discard(None)
+    if reservas:
+        r = Reserva.__table__
+        clientes.update(session.execute(
+            db.select(r.c.cliente_id).where(r.c.id.in_(reservas))
+        ).scalars())
+    clientes.discard(None)
+    if clientes:
+        recalcular(clientes, sesion=session)
+
+
+def _descartar(session, transaccion_previa):
+    session.info.pop(_CLAVE_CLIENTES, None)
+    session.info.pop(_CLAVE_RESERVAS, None)
+
+
+def init_huespedes(app):
+    event.listen(Session, 'after_flush', _anotar)
+    event.listen(Session, 'before_commit', _antes_de_commit)
+    event.listen(Session, 'after_soft_rollback', _descartar)
@@ -0,0 +1,182 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Cliente
+from services.carga import comprobar_plazo
+
+CAMPOS_CLIENTE = ('nombre', 'email', 'telefono', 'dni')
+MAX_ERRORES = 100
+
+
+def leer_filas(flujo, formato):
+    """Itera ``(linea, dict)`` desde un flujo binario CSV o NDJSON sin cargarlo entero."""
+    texto = io.TextIOWrapper(flujo, encoding='utf-8', newline='')
+    if formato == 'csv':
+        lector = csv.DictReader(texto)
+        for fila in lector:
+            yield lector.line_num, fila
+        return
+
+    for linea, contenido in enumerate(texto, start=1):
+        contenido = contenido.strip()
+        if not contenido:
+            continue
+        try:
+            fila = json.loads(contenido)
+        except ValueError:
+            fila = None
+        yield linea, fila if isinstance(fila, dict) else None
+
+
+def normalizar_email(email):
+    """Forma canónica del email: la unicidad se comprueba sobre ella al importar y al crear."""
+    return email.strip().lower() if email else email
+
+
+def _limpiar(fila):
+    datos = {}
+    for campo in CAMPOS_CLIENTE:
+        valor = fila.get(campo)
+        valor = str(valor).strip() if valor is not None else ''
+        datos[campo] = valor or None
+    datos['email'] = normalizar_email(datos['email'])
+    return datos
+
+
+def _insert(dialecto):
+    if dialecto == 'postgresql':
+        return postgresql.insert(Cliente.__table__)
+    if dialecto == 'sqlite':
+        return sqlite.insert(Cliente.__table__)
+    raise RuntimeError(f'Upsert no soportado para {dialecto}')
+
+
+def _upsert(filas, clave):
+    if not filas:
+        return
+    stmt = _insert(db.engine.dialect.name)
+    tabla = Cliente.__table__
+    # Un campo vacío en el fichero no borra lo que ya tenía el cliente
+    set_ = {c: db.func.coalesce(stmt.excluded[c], tabla.c[c]) for c in CAMPOS_CLIENTE if c != clave}
+    set_['version'] = tabla.c.version + 1
+    # Los índices únicos son parciales (solo clientes activos): el ON CONFLICT debe decirlo
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[clave], index_where=tabla.c.activo, set_=set_
+    )
+    # executemany: la sentencia se compila una vez y el driver agrupa las filas
+    db.session.execute(stmt, filas)
+
+
+def _procesar_lote(lote, resumen):
+    # 1) validar y deduplicar dentro del lote (gana la última aparición)
+    por_email = {}
+    for linea, fila in lote:
+        datos = _limpiar(fila) if fila is not None else None
+        if not datos or not datos['nombre'] or not datos['email']:
+            resumen.rechazar(linea, 'Nombre y email son obligatorios')
+            continue
+        if datos['email'] in por_email:
+            resumen.fusionados += 1
+        por_email[datos['email']] = (linea, datos)
+
+    por_dni = {}
+    for email, (linea, datos) in list(por_email.items()):
+        if datos['dni']:
+            previo = por_dni.get(datos['dni'])
+            if previo is not None:
+                resumen.rechazar(previo[0], 'DNI repetido en el lote')
+                del por_email[previo[1]['email']]
+            por_dni[datos['dni']] = (linea, datos)
+
+    if not por_email:
+        return
+
+    # 2) una consulta por clave para saber qué existe ya
+    existentes_email = dict(db.session.execute(
+        db.select(Cliente.email, Cliente.id).where(Cliente.email.in_(list(por_email)))
+    ).all())
+    existentes_dni = dict(db.session.execute(
+        db.select(Cliente.dni, Cliente.id).where(Cliente.dni.in_(list(por_dni)))
+    ).all()) if por_dni else {}
+
+    # 3) clasificar: por email (inserta o actualiza) o por dni (actualiza email)
+    filas_email, filas_dni = [], []
+    creados = actualizados = 0
+    tocados = set()
+    for email, (linea, datos) in por_email.items():
+        id_email = existentes_email.get(email)
+        id_dni = existentes_dni.get(datos['dni']) if datos['dni'] else None
+        if id_email and id_dni and id_email != id_dni:
+            resumen.rechazar(linea, 'El email y el DNI pertenecen a clientes distintos')
+            continue
+        objetivo = id_email or id_dni
+        if objetivo in tocados:
+            resumen.rechazar(linea, 'El cliente aparece dos veces en el lote')
+            continue
+        if objetivo:
+            tocados.add(objetivo)
+        if id_email or not id_dni:
+            filas_email.append(datos)
+        else:
+            filas_dni.append(datos)
+        if objetivo:
+            actualizados += 1
+        else:
+            creados += 1
+
+    # 4) upsert set-based; si otra transacción choca, el lote entero se rechaza
+    try:
+        with db.session.begin_nested():
+            _upsert(filas_email, 'email')
+            _upsert(filas_dni, 'dni')
+    except IntegrityError:
+        for datos in filas_email + filas_dni:
+            resumen.rechazar(None, f"Conflicto concurrente con {datos['email']}")
+        return
+
+    resumen.creados += creados
+    resumen.actualizados += actualizados
+
+
+class ResumenImportacion:
+    def __init__(self):
+        self.creados = 0
+        self.actualizados = 0
+        # Filas repetidas por email en un mismo lote: cuenta la última
+        self.fusionados = 0
+        self.rechazados = 0
+        self.errores = []
+
+    def rechazar(self, linea, msg):
+        self.rechazados += 1
+        if len(self.errores) < MAX_ERRORES:
+            self.errores.append({'linea': linea, 'msg': msg})
+
+    def a_dict(self):
+        return {
+            'creados': self.creados,
+            'actualizados': self.actualizados,
+            'fusionados': self.fusionados,
+            'rechazados': self.rechazados,
+            'errores': self.errores,
+        }
+
+
+def importar_clientes(filas, lote=5000):
+    """Upsert masivo de clientes por email/dni en lotes con ``INSERT ... ON CONFLICT``."""
+    resumen = ResumenImportacion()
+    filas = iter(filas)
+    while True:
+        bloque = list(islice(filas, lote))
+        if not bloque:
+            break
+        # Los lotes anteriores ya quedaron confirmados; el resto se corta con 504
+        comprobar_plazo()
+        _procesar_lote(bloque, resumen)
+        db.session.commit()
+    return resumen
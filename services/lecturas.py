@@ -0,0 +1,132 @@
+"""Modelo de lectura: consultas Core de solo las columnas que devuelve cada ruta.
+
+Evita construir entidades ORM (identity map, instrumentación, lazy loads)
+para objetos que solo se copian a dicts. Las fechas se dejan como ``date``;
+el proveedor JSON de la app las serializa en ISO 8601.
+"""
+from datetime import timedelta
+
+from models import db, Reserva, Cliente, Habitacion, TipoHabitacion, DetalleReserva, hotel_actual
+from services.catalogo import catalogo
+
+_COLUMNAS_RESERVA = (
+    Reserva.id,
+    Reserva.cliente_id,
+    Reserva.fecha_inicio,
+    Reserva.fecha_fin,
+    Reserva.estado,
+    Reserva.total,
+    Reserva.pagado,
+    Reserva.saldo,
+)
+
+_COLUMNAS_HABITACION = (
+    Habitacion.id,
+    Habitacion.numero,
+    Habitacion.tipo_id,
+    TipoHabitacion.nombre.label('tipo'),
+    Habitacion.precio,
+    Habitacion.estado,
+)
+
+
+def _habitaciones_por_reserva(filtro=None):
+    stmt = db.select(
+        DetalleReserva.reserva_id,
+        Habitacion.id,
+        Habitacion.numero,
+        DetalleReserva.precio
+    ).join(Habitacion, Habitacion.id == DetalleReserva.habitacion_id).order_by(DetalleReserva.id)
+    if filtro is not None:
+        stmt = stmt.where(filtro)
+
+    agrupadas = {}
+    for reserva_id, hab_id, numero, precio in db.session.execute(stmt):
+        agrupadas.setdefault(reserva_id, []).append({
+            "id": hab_id,
+            "numero": numero,
+            "precio": precio
+        })
+    return agrupadas
+
+
+def listar_reservas():
+    filas = db.session.execute(
+        db.select(*_COLUMNAS_RESERVA, Cliente.nombre.label('cliente'))
+        .outerjoin(Cliente, Cliente.id == Reserva.cliente_id)
+        .order_by(Reserva.id)
+    ).mappings()
+
+    habitaciones = _habitaciones_por_reserva()
+    data = []
+    for fila in filas:
+        r = dict(fila)
+        r["habitaciones"] = habitaciones.get(r["id"], [])
+        data.append(r)
+    return data
+
+
+def obtener_reserva(id):
+    """Fila principal de la reserva (con ``version``) sin sus habitaciones."""
+    fila = db.session.execute(
+        db.select(*_COLUMNAS_RESERVA, Reserva.version).where(Reserva.id == id)
+    ).mappings().first()
+    return dict(fila) if fila is not None else None
+
+
+def habitaciones_de_reserva(id):
+    return _habitaciones_por_reserva(DetalleReserva.reserva_id == id).get(id, [])
+
+
+def reservas_por_ids(ids):
+    """{id: reserva con version y habitaciones} para los ids que aún existen."""
+    filas = db.session.execute(
+        db.select(*_COLUMNAS_RESERVA, Reserva.version).where(Reserva.id.in_(ids))
+    ).mappings()
+    habitaciones = _habitaciones_por_reserva(DetalleReserva.reserva_id.in_(ids))
+    out = {}
+    for fila in filas:
+        r = dict(fila)
+        r["habitaciones"] = habitaciones.get(r["id"], [])
+        out[r["id"]] = r
+    return out
+
+
+def habitaciones_por_ids(ids):
+    """Incluye las inactivas: para quien sincroniza también son un cambio."""
+    stmt = db.select(*_COLUMNAS_HABITACION, Habitacion.version).outerjoin(
+        TipoHabitacion, TipoHabitacion.id == Habitacion.tipo_id
+    ).where(Habitacion.id.in_(ids)).execution_options(incluir_borrados=True)
+    return {f["id"]: dict(f) for f in db.session.execute(stmt).mappings()}
+
+
+def listar_habitaciones():
+    """Desde el catálogo compartido (services.catalogo), sin ir a la base."""
+    return catalogo().filas(hotel_actual())
+
+
+def habitaciones_disponibles(start_date, end_date):
+    """Habitaciones libres las noches [start_date, end_date), con la regla de services.conflictos."""
+    # Una estancia de cero noches ocupa igualmente su día de llegada; la consulta también
+    end_date = max(end_date, start_date + timedelta(days=1))
+    ocupadas = set(db.session.execute(
+        db.select(DetalleReserva.habitacion_id).join(
+            Reserva, Reserva.id == DetalleReserva.reserva_id
+        ).where(
+            Reserva.estado != 'cancelada',
+            Reserva.fecha_inicio < end_date,
+            db.or_(Reserva.fecha_fin > start_date, Reserva.fecha_inicio >= start_date)
+        ).distinct()
+    ).scalars())
+    return [h for h in catalogo().filas(hotel_actual()) if h["id"] not in ocupadas]
+
+
+def listar_clientes():
+    stmt = db.select(
+        Cliente.id,
+        Cliente.nombre,
+        Cliente.email,
+        Cliente.telefono,
+        Cliente.dni
+    ).order_by(Cliente.id)
+    return [dict(f) for f in db.session.execute(stmt).mappings()]
@@ -0,0 +1,226 @@
+import math
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, jsonify, request
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - dependencia opcional
+    redis = None
+
+
+class BackendMemoria:
+    """Cubetas de tokens en el propio proceso (cada worker de gunicorn lleva las suyas).
+
+    También hace de sustituto local del backend compartido: misma interfaz.
+    Como las claves de Redis con EXPIRE, cada entrada guarda cuándo deja de
+    importar (cubeta llena otra vez, fallos olvidados) y un barrido cada
+    ``barrido`` segundos las borra: nombres de usuario inventados no hacen
+    crecer la memoria sin límite.
+    """
+
+    def __init__(self, barrido=60):
+        self._lock = threading.Lock()
+        self._cubetas = {}   # clave -> [tokens, instante, caduca]
+        self._fallos = {}    # clave -> [fallos, bloqueado_hasta, instante, caduca]
+        self._barrido = barrido
+        self._proximo_barrido = None
+
+    def _barrer(self, ahora):
+        # Se llama con el lock tomado
+        if self._proximo_barrido is None:
+            self._proximo_barrido = ahora + self._barrido
+        if ahora < self._proximo_barrido:
+            return
+        self._proximo_barrido = ahora + self._barrido
+        for tabla in (self._cubetas, self._fallos):
+            for clave in [k for k, v in tabla.items() if v[-1] <= ahora]:
+                del tabla[clave]
+
+    def consumir(self, clave, capacidad, tasa, ahora=None):
+        """Resta un token. Devuelve los segundos a esperar (0 si se admite)."""
+        ahora = time.monotonic() if ahora is None else ahora
+        with self._lock:
+            self._barrer(ahora)
+            tokens, antes, _ = self._cubetas.get(clave, (capacidad, ahora, None))
+            tokens = min(capacidad, tokens + (ahora - antes) * tasa)
+            espera = 0
+            if tokens < 1:
+                espera = (1 - tokens) / tasa
+            else:
+                tokens -= 1
+            # Llena de nuevo equivale a no tenerla
+            self._cubetas[clave] = [tokens, ahora, ahora + (capacidad - tokens) / tasa]
+            return espera
+
+    def bloqueo(self, clave, ahora=None):
+        """Segundos que le quedan de bloqueo a ``clave`` (0 si no lo está)."""
+        ahora = time.monotonic() if ahora is None else ahora
+        with self._lock:
+            estado = self._fallos.get(clave)
+            return max(0, estado[1] - ahora) if estado else 0
+
+    def registrar_fallo(self, clave, umbral, base, maximo, olvido, ahora=None):
+        """Suma un fallo; a partir de ``umbral`` bloquea base·2^(n-umbral) segundos."""
+        ahora = time.monotonic() if ahora is None else ahora
+        with self._lock:
+            self._barrer(ahora)
+            fallos, hasta, antes, _ = self._fallos.get(clave, (0, 0, ahora, None))
+            if ahora - antes > olvido:
+                fallos = 0
+            fallos += 1
+            if fallos >= umbral:
+                hasta = ahora + min(maximo, base * 2 ** (fallos - umbral))
+            self._fallos[clave] = [fallos, hasta, ahora, max(ahora + olvido, hasta)]
+            return max(0, hasta - ahora)
+
+    def limpiar_fallos(self, clave):
+        with self._lock:
+            self._fallos.pop(clave, None)
+
+
+# La cubeta se evalúa en el servidor Redis para que sea atómica entre workers
+_LUA_CONSUMIR = """
+local capacidad = tonumber(ARGV[1])
+local tasa = tonumber(ARGV[2])
+local ahora = tonumber(ARGV[3])
+local estado = redis.call('HMGET', KEYS[1], 't', 'a')
+local tokens = tonumber(estado[1]) or capacidad
+local antes = tonumber(estado[2]) or ahora
+tokens = math.min(capacidad, tokens + (ahora - antes) * tasa)
+local espera = 0
+if tokens < 1 then
+  espera = (1 - tokens) / tasa
+else
+  tokens = tokens - 1
+end
+redis.call('HSET', KEYS[1], 't', tokens, 'a', ahora)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacidad / tasa) + 1)
+return tostring(espera)
+"""
+
+_LUA_FALLO = """
+local umbral = tonumber(ARGV[1])
+local base = tonumber(ARGV[2])
+local maximo = tonumber(ARGV[3])
+local olvido = tonumber(ARGV[4])
+local ahora = tonumber(ARGV[5])
+local fallos = redis.call('HINCRBY', KEYS[1], 'f', 1)
+local hasta = tonumber(redis.call('HGET', KEYS[1], 'h')) or 0
+if fallos >= umbral then
+  hasta = ahora + math.min(maximo, base * 2 ^ (fallos - umbral))
+  redis.call('HSET', KEYS[1], 'h', hasta)
+end
+redis.call('EXPIRE', KEYS[1], math.ceil(math.max(olvido, hasta - ahora)))
+return tostring(math.max(0, hasta - ahora))
+"""
+
+
+class BackendRedis:
+    """Cubetas compartidas por todos los workers y nodos a través de Redis."""
+
+    def __init__(self, url, prefijo='limite:'):
+        if redis is None:
+            raise RuntimeError('LIMITE_REDIS_URL requiere el paquete redis')
+        self._r = redis.Redis.from_url(url)
+        self._prefijo = prefijo
+        self._consumir = self._r.register_script(_LUA_CONSUMIR)
+        self._fallo = self._r.register_script(_LUA_FALLO)
+
+    def consumir(self, clave, capacidad, tasa, ahora=None):
+        ahora = time.time() if ahora is None else ahora
+        return float(self._consumir(keys=[self._prefijo + 'c:' + clave], args=[capacidad, tasa, ahora]))
+
+    def bloqueo(self, clave, ahora=None):
+        ahora = time.time() if ahora is None else ahora
+        hasta = self._r.hget(self._prefijo + 'f:' + clave, 'h')
+        return max(0, float(hasta) - ahora) if hasta else 0
+
+    def registrar_fallo(self, clave, umbral, base, maximo, olvido, ahora=None):
+        ahora = time.time() if ahora is None else ahora
+        return float(self._fallo(
+            keys=[self._prefijo + 'f:' + clave], args=[umbral, base, maximo, olvido, ahora]
+        ))
+
+    def limpiar_fallos(self, clave):
+        self._r.delete(self._prefijo + 'f:' + clave)
+
+
+backend = BackendMemoria()
+
+
+def init_limites(app):
+    global backend
+    url = app.config.get('LIMITE_REDIS_URL')
+    backend = BackendRedis(url) if url else BackendMemoria(app.config.get('LIMITE_BARRIDO', 60))
+
+
+# --- claves ---
+def por_ip():
+    return 'ip:' + (request.remote_addr or '-')
+
+
+def por_usuario():
+    data = request.get_json(silent=True) or {}
+    usuario = data.get('email') or data.get('username')
+    return 'usuario:' + str(usuario).strip().lower() if usuario else None
+
+
+def _rechazo(espera, msg):
+    resp = jsonify({'ok': False, 'msg': msg})
+    resp.status_code = 429
+    resp.headers['Retry-After'] = str(max(1, math.ceil(espera)))
+    return resp
+
+
+def limitar(nombre, capacidad, por_minuto, claves=(por_ip,), bloquear_en=()):
+    """Limita una ruta con cubetas de tokens, una por cada función de ``claves``.
+
+    ``capacidad`` y ``por_minuto`` pueden ser números o nombres de claves de
+    ``app.config``, que se leen en cada petición.
+
+    Se evalúa antes de ejecutar la vista, así que un intento rechazado no
+    llega a tocar la base ni a calcular hashes. Si la vista responde con un
+    estado de ``bloquear_en`` (p. ej. 401) cuenta como fallo para el bloqueo
+    progresivo; una respuesta 2xx lo reinicia (salvo el de la IP).
+    """
+    def decorador(f):
+        @wraps(f)
+        def envoltura(*args, **kwargs):
+            if not current_app.config.get('LIMITE_ACTIVO', True):
+                return f(*args, **kwargs)
+            cupo = current_app.config[capacidad] if isinstance(capacidad, str) else capacidad
+            tasa = (current_app.config[por_minuto] if isinstance(por_minuto, str) else por_minuto) / 60.0
+
+            ids = [k for k in (clave() for clave in claves) if k]
+            for k in ids:
+                espera = backend.bloqueo(f'{nombre}:{k}')
+                if espera:
+                    return _rechazo(espera, 'Demasiados intentos fallidos, reintente más tarde')
+            for k in ids:
+                espera = backend.consumir(f'{nombre}:{k}', cupo, tasa)
+                if espera:
+                    return _rechazo(espera, 'Demasiadas solicitudes')
+
+            resp = current_app.make_response(f(*args, **kwargs))
+            if resp.status_code in bloquear_en:
+                cfg = current_app.config
+                for k in ids:
+                    backend.registrar_fallo(
+                        f'{nombre}:{k}',
+                        cfg.get('LIMITE_FALLOS_UMBRAL', 5),
+                        cfg.get('LIMITE_BLOQUEO_BASE', 30),
+                        cfg.get('LIMITE_BLOQUEO_MAXIMO', 3600),
+                        cfg.get('LIMITE_FALLOS_OLVIDO', 900),
+                    )
+            elif bloquear_en and 200 <= resp.status_code < 300:
+                # El bloqueo por IP no se perdona con un acierto: con una cuenta
+                # válida se podría reiniciar tras cada intento contra otras
+                for k in ids:
+                    if not k.startswith('ip:'):
+                        backend.limpiar_fallos(f'{nombre}:{k}')
+            return resp
+        return envoltura
+    return decorador
@@ -0,0 +1,57 @@
+from models import db, Pago, Reserva
+from services.cambios import registrar_cambios
+
+
+def registrar_movimiento(reserva_id, monto, metodo=None, tipo='pago'):
+    """Inserta un Pago y ajusta pagado/saldo de la reserva en la misma transacción.
+
+    ``monto`` es positivo para pagos y negativo para reembolsos. Devuelve
+    ``(pago, pagado, saldo)`` o ``None`` si la reserva no existe o el reembolso
+    supera lo pagado. No hace commit.
+    """
+    stmt = db.update(Reserva).where(Reserva.id == reserva_id)
+    if monto < 0:
+        stmt = stmt.where(Reserva.pagado + monto >= 0)
+
+    fila = db.session.execute(
+        stmt.values(
+            pagado=Reserva.pagado + monto,
+            saldo=Reserva.saldo - monto,
+            version=Reserva.version + 1
+        ).returning(Reserva.pagado, Reserva.saldo, Reserva.hotel_id)
+    ).first()
+
+    if fila is None:
+        return None
+
+    pago = Pago(reserva_id=reserva_id, monto=monto, metodo=metodo, tipo=tipo, hotel_id=fila.hotel_id)
+    db.session.add(pago)
+    db.session.flush()
+    return pago, fila.pagado, fila.saldo
+
+
+def conciliar_saldos():
+    """Recalcula pagado/saldo desde ``pagos`` en un único UPDATE set-based.
+
+    Solo toca las reservas descuadradas y devuelve cuántas se corrigieron.
+    """
+    suma = (
+        db.select(db.func.coalesce(db.func.sum(Pago.monto), 0.0))
+        .where(Pago.reserva_id == Reserva.id)
+        .scalar_subquery()
+    )
+    total = db.func.coalesce(Reserva.total, 0.0)
+
+    filas = db.session.execute(
+        db.update(Reserva)
+        .where(db.or_(
+            db.func.abs(Reserva.pagado - suma) > 0.005,
+            db.func.abs(Reserva.saldo - (total - suma)) > 0.005
+        ))
+        .values(pagado=suma, saldo=total - suma, version=Reserva.version + 1)
+        .returning(Reserva.id, Reserva.hotel_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    registrar_cambios('reserva', filas, 'modificacion')
+    db.session.commit()
+    return len(filas)
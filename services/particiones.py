@@ -0,0 +1,41 @@
+from datetime import date
+
+from models import db
+
+TABLAS_PARTICIONADAS = ('pagos',)
+
+
+def _mes_siguiente(d):
+    return date(d.year + (d.month == 12), d.month % 12 + 1, 1)
+
+
+def esta_particionada(tabla):
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return db.session.execute(
+        db.text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:t)"),
+        {'t': tabla}
+    ).scalar() is not None
+
+
+def crear_particiones(meses=12, desde=None):
+    """Crea (si faltan) las particiones mensuales de los próximos ``meses`` meses."""
+    creadas = []
+    inicio = desde or date.today().replace(day=1)
+    for tabla in TABLAS_PARTICIONADAS:
+        if not esta_particionada(tabla):
+            continue
+        mes = inicio
+        for _ in range(meses):
+            siguiente = _mes_siguiente(mes)
+            nombre = f"{tabla}_p{mes:%Y%m}"
+            existe = db.session.execute(db.text("SELECT to_regclass(:n)"), {'n': nombre}).scalar()
+            if existe is None:
+                db.session.execute(db.text(
+                    f"CREATE TABLE {nombre} PARTITION OF {tabla} "
+                    f"FOR VALUES FROM ('{mes.isoformat()}') TO ('{siguiente.isoformat()}')"
+                ))
+                creadas.append(nombre)
+            mes = siguiente
+    db.session.commit()
+    return creadas
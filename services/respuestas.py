@@ -0,0 +1,110 @@
+import gzip
+from datetime import date
+from decimal import Decimal
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependencia opcional
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependencia opcional
+    brotli = None
+
+TIPOS_COMPRIMIBLES = ('application/json', 'text/')
+
+
+def _default(o):
+    # Fechas en ISO 8601 (igual que orjson) y Decimal como texto, sin perder precisión
+    if isinstance(o, date):
+        return o.isoformat()
+    if isinstance(o, Decimal):
+        return str(o)
+    return DefaultJSONProvider.default(o)
+
+
+class JSONProviderEstandar(DefaultJSONProvider):
+    """Proveedor de la stdlib con el mismo formato de fechas que el rápido."""
+
+    default = staticmethod(_default)
+
+
+class JSONProviderRapido(DefaultJSONProvider):
+    """Serializa con orjson y entrega bytes directamente a la respuesta."""
+
+    default = staticmethod(_default)
+
+    def _opciones(self, sort_keys):
+        opciones = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if sort_keys:
+            opciones |= orjson.OPT_SORT_KEYS
+        return opciones
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(
+            obj, default=_default, option=self._opciones(kwargs.get('sort_keys', self.sort_keys))
+        ).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        cuerpo = orjson.dumps(obj, default=_default, option=self._opciones(self.sort_keys))
+        return self._app.response_class(cuerpo, mimetype=self.mimetype)
+
+
+def _elegir_codificacion(app):
+    aceptadas = request.accept_encodings
+    if brotli is not None and app.config['COMPRESION_BROTLI'] and aceptadas['br']:
+        return 'br'
+    if aceptadas['gzip']:
+        return 'gzip'
+    return None
+
+
+def init_respuestas(app):
+    if app.config['JSON_RAPIDO'] and orjson is not None:
+        app.json = JSONProviderRapido(app)
+    else:
+        app.json = JSONProviderEstandar(app)
+
+    minimo = app.config['COMPRESION_MINIMO']
+    if minimo <= 0:
+        return
+
+    @app.after_request
+    def comprimir(response):
+        response.vary.add('Accept-Encoding')
+        if (
+            response.direct_passthrough
+            or response.is_streamed
+            or response.status_code < 200 or response.status_code >= 300
+            or 'Content-Encoding' in response.headers
+            or not (response.mimetype or '').startswith(TIPOS_COMPRIMIBLES)
+        ):
+            return response
+
+        cuerpo = response.get_data()
+        if len(cuerpo) < minimo:
+            return response
+
+        codificacion = _elegir_codificacion(app)
+        if codificacion == 'br':
+            comprimido = brotli.compress(cuerpo, quality=app.config['COMPRESION_NIVEL_BROTLI'])
+        elif codificacion == 'gzip':
+            comprimido = gzip.compress(cuerpo, compresslevel=app.config['COMPRESION_NIVEL_GZIP'], mtime=0)
+        else:
+            return response
+
+        response.set_data(comprimido)
+        response.headers['Content-Encoding'] = codificacion
+        # Otros bytes con el mismo contenido: el ETag ya no puede ser fuerte
+        etag, debil = response.get_etag()
+        if etag and not debil:
+            response.set_etag(etag, weak=True)
+        return response
@@ -0,0 +1,142 @@
+"""Ritmo de reservas (pace/pickup): room-nights en cartera por fecha de estancia y antelación.
+
+Una sola consulta agregada trae las reservas que tocan la ventana
+[hoy - 364, hoy + dias); con NumPy se expanden a noches y se construye la
+matriz ``curva[estancia, antelacion]`` = room-nights en cartera ``antelacion``
+días antes de cada fecha de estancia. Una reserva cuenta desde que se creó
+hasta que se canceló.
+"""
+import threading
+from datetime import date, timedelta
+
+from models import db, Reserva, DetalleReserva, Habitacion, hotel_actual
+from services.carga import comprobar_plazo
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - dependencia opcional
+    np = None
+
+# 52 semanas: la fecha comparable del año pasado cae en el mismo día de la semana
+DESFASE_ANIO = 364
+PICKUP_DIAS = 7
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def disponible():
+    return np is not None
+
+
+def _filas(desde, hasta):
+    creada = db.func.date(Reserva.fecha_creacion)
+    cancelada = db.func.date(Reserva.fecha_cancelacion)
+    return db.session.execute(
+        db.select(Reserva.fecha_inicio, Reserva.fecha_fin, creada, cancelada, db.func.count(DetalleReserva.id))
+        .join(DetalleReserva, DetalleReserva.reserva_id == Reserva.id)
+        .where(
+            Reserva.fecha_inicio < hasta,
+            Reserva.fecha_fin > desde,
+            # Canceladas sin fecha de cancelación: no se sabe cuándo salieron, se ignoran
+            db.or_(Reserva.estado != 'cancelada', Reserva.fecha_cancelacion.isnot(None))
+        )
+        .group_by(Reserva.fecha_inicio, Reserva.fecha_fin, creada, cancelada)
+    ).all()
+
+
+def curvas(desde, dias, max_antelacion):
+    """Matriz (dias x max_antelacion+1) de room-nights en cartera.
+
+    Las antelaciones mayores que ``max_antelacion`` se acumulan en la última columna.
+    """
+    diferencias = np.zeros((dias, max_antelacion + 2), dtype=np.int64)
+    filas = _filas(desde, desde + timedelta(days=dias))
+    # La consulta ya gastó parte del plazo; la expansión en NumPy no se puede cortar a medias
+    comprobar_plazo()
+    if filas:
+        inicio, fin, creada, cancelada, peso = (list(c) for c in zip(*filas))
+        inicio = np.array(inicio, dtype='datetime64[D]')
+        fin = np.array(fin, dtype='datetime64[D]')
+        creada = np.array(creada, dtype='datetime64[D]')
+        cancelada = np.array(cancelada, dtype='datetime64[D]')
+        peso = np.array(peso, dtype=np.int64)
+        base = np.datetime64(desde, 'D')
+
+        # Una entrada por noche dentro de la ventana
+        i0 = np.maximum((inicio - base).astype(np.int64), 0)
+        i1 = np.minimum((fin - base).astype(np.int64), dias)
+        noches = np.maximum(i1 - i0, 0)
+        fila = np.repeat(np.arange(len(noches)), noches)
+        estancia = i0[fila] + np.arange(noches.sum()) - np.repeat(np.cumsum(noches) - noches, noches)
+        fecha = base + estancia
+
+        reservada = np.where(
+            np.isnat(creada[fila]), max_antelacion,
+            np.clip((fecha - creada[fila]).astype(np.int64), 0, max_antelacion)
+        )
+        cancelacion = np.where(
+            np.isnat(cancelada[fila]), -1,
+            np.clip((fecha - cancelada[fila]).astype(np.int64), -1, max_antelacion)
+        )
+
+        # En cartera para antelaciones en (cancelacion, reservada]
+        np.add.at(diferencias, (estancia, reservada), peso[fila])
+        # Cancelada el mismo día que se creó (cancelacion == reservada): no llega a estar en cartera
+        baja = (cancelacion >= 0) & (cancelacion <= reservada)
+        np.add.at(diferencias, (estancia[baja], cancelacion[baja]), -peso[fila][baja])
+
+    return np.cumsum(diferencias[:, ::-1], axis=1)[:, ::-1][:, :max_antelacion + 1]
+
+
+def informe_ritmo(dias, hoy=None):
+    """Cartera de los próximos ``dias`` frente a la misma antelación del año anterior.
+
+    Se calcula una vez por día (y hotel); es una foto diaria, no un dato en vivo.
+    """
+    hoy = hoy or date.today()
+    clave = (hotel_actual(), hoy, dias)
+    with _cache_lock:
+        if clave in _cache:
+            return _cache[clave]
+
+    max_antelacion = dias + PICKUP_DIAS
+    curva = curvas(hoy - timedelta(days=DESFASE_ANIO), DESFASE_ANIO + dias, max_antelacion)
+    capacidad = Habitacion.query.filter(Habitacion.estado != 'inactivo').count()
+
+    i = np.arange(dias)
+    actual = curva[DESFASE_ANIO + i, i]
+    hace_pickup = curva[DESFASE_ANIO + i, i + PICKUP_DIAS]
+    anterior = curva[i, i]
+    anterior_final = curva[i, 0]
+
+    fechas = []
+    for k, (a, p, ly, lyf) in enumerate(zip(actual.tolist(), (actual - hace_pickup).tolist(),
+                                             anterior.tolist(), anterior_final.tolist())):
+        fechas.append({
+            'fecha': hoy + timedelta(days=k),
+            'en_cartera': a,
+            'pickup': p,
+            'anio_anterior': ly,
+            'anio_anterior_final': lyf,
+            'ocupacion': round(a / capacidad, 4) if capacidad else None
+        })
+
+    resultado = {
+        'fecha': hoy,
+        'dias': dias,
+        'capacidad': capacidad,
+        'pickup_dias': PICKUP_DIAS,
+        'totales': {
+            'en_cartera': int(actual.sum()),
+            'pickup': int((actual - hace_pickup).sum()),
+            'anio_anterior': int(anterior.sum()),
+            'anio_anterior_final': int(anterior_final.sum())
+        },
+        'fechas': fechas
+    }
+    with _cache_lock:
+        for k in [k for k in _cache if k[1] != hoy]:
+            del _cache[k]
+        _cache[clave] = resultado
+    return resultado
@@ -0,0 +1,126 @@
+from datetime import date
+
+from flask import g, request, jsonify
+from flask_jwt_extended import verify_jwt_in_request, get_jwt
+from sqlalchemy import event
+from sqlalchemy.orm import Session, with_loader_criteria
+
+from models import (
+    db, HotelMixin, hotel_actual, Hotel, Cliente, TipoHabitacion, Habitacion, Reserva, DetalleReserva, Pago
+)
+
+
+def _resolver_hotel():
+    """Hotel del JWT; los usuarios de grupo (sin hotel) pueden elegirlo con X-Hotel-Id."""
+    try:
+        if verify_jwt_in_request(optional=True) is None:
+            return None
+        hotel_id = get_jwt().get('hotel_id')
+    except Exception:
+        # Token ausente o inválido: jwt_required se encargará de rechazarlo
+        return None
+
+    if hotel_id is not None:
+        return hotel_id
+
+    cabecera = request.headers.get('X-Hotel-Id')
+    if cabecera:
+        return int(cabecera) if cabecera.isdigit() else False
+    return None
+
+
+def _filtrar_por_hotel(estado):
+    hotel_id = hotel_actual()
+    if hotel_id is None or estado.is_column_load or estado.is_relationship_load:
+        return
+    if not (estado.is_select or estado.is_update or estado.is_delete):
+        return
+    if estado.execution_options.get('todos_los_hoteles', False):
+        return
+
+    estado.statement = estado.statement.options(
+        with_loader_criteria(
+            HotelMixin,
+            lambda cls: cls.hotel_id == hotel_id,
+            include_aliases=True,
+            propagate_to_loaders=True
+        )
+    )
+
+
+def comprobar_aislamiento():
+    """Crea dos hoteles de prueba, comprueba que cada uno solo ve lo suyo y lo deshace todo.
+
+    Devuelve la lista de fallos (vacía si el aislamiento se cumple). Corre
+    contra la base configurada, así que sirve igual para SQLite que para un
+    Postgres local: ``DATABASE_URL=... flask comprobar-tenencia``.
+    """
+    modelos = (TipoHabitacion, Habitacion, Reserva, DetalleReserva, Pago)
+    fallos = []
+    previo = g.get('hotel_id')
+    g.hotel_id = None
+    try:
+        cliente = Cliente(nombre='Aislamiento', email='aislamiento@prueba.invalid')
+        db.session.add(cliente)
+        propios = {}
+        for sufijo in ('a', 'b'):
+            hotel = Hotel(codigo=f'_aislamiento_{sufijo}', nombre=f'Aislamiento {sufijo}')
+            db.session.add(hotel)
+            db.session.flush()
+            tipo = TipoHabitacion(nombre='Prueba', hotel_id=hotel.id)
+            db.session.add(tipo)
+            db.session.flush()
+            # Mismo número en los dos hoteles: solo es único dentro de cada uno
+            habitacion = Habitacion(numero='1', tipo_id=tipo.id, precio=1, hotel_id=hotel.id)
+            reserva = Reserva(cliente_id=cliente.id, fecha_inicio=date.today(), fecha_fin=date.today(),
+                              hotel_id=hotel.id)
+            db.session.add_all([habitacion, reserva])
+            db.session.flush()
+            detalle = DetalleReserva(reserva_id=reserva.id, habitacion_id=habitacion.id, precio=1,
+                                     hotel_id=hotel.id)
+            pago = Pago(reserva_id=reserva.id, monto=1, hotel_id=hotel.id)
+            db.session.add_all([detalle, pago])
+            db.session.flush()
+            propios[hotel.id] = {m: {o.id} for m, o in zip(modelos, (tipo, habitacion, reserva, detalle, pago))}
+        # Sin identity map: cada lectura tiene que ir a la base
+        db.session.expunge_all()
+
+        todos = {m: set().union(*(p[m] for p in propios.values())) for m in modelos}
+        for hotel_id, suyos in [(None, todos)] + [(h, p) for h, p in propios.items()]:
+            g.hotel_id = hotel_id
+            quien = f'hotel {hotel_id}' if hotel_id is not None else 'grupo'
+            for modelo in modelos:
+                vistos = set(db.session.execute(
+                    db.select(modelo.id).where(modelo.id.in_(todos[modelo]))
+                ).scalars())
+                if vistos != suyos[modelo]:
+                    fallos.append(f'{quien}: SELECT {modelo.__tablename__} ve {sorted(vistos)}, '
+                                  f'esperado {sorted(suyos[modelo])}')
+            for reserva_id in todos[Reserva] - suyos[Reserva]:
+                if db.session.get(Reserva, reserva_id) is not None:
+                    fallos.append(f'{quien}: get() devuelve la reserva ajena {reserva_id}')
+            tocadas = db.session.execute(
+                db.update(Reserva).where(Reserva.id.in_(todos[Reserva]))
+                .values(estado=Reserva.estado)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if tocadas != len(suyos[Reserva]):
+                fallos.append(f'{quien}: UPDATE reservas toca {tocadas} filas, esperado {len(suyos[Reserva])}')
+            db.session.expunge_all()
+    finally:
+        db.session.rollback()
+        g.hotel_id = previo
+    return fallos
+
+
+def init_tenencia(app):
+    # create_app puede llamarse varias veces (tests, scripts): el listener es global a Session
+    if not event.contains(Session, 'do_orm_execute', _filtrar_por_hotel):
+        event.listen(Session, 'do_orm_execute', _filtrar_por_hotel)
+
+    @app.before_request
+    def asignar_hotel():
+        hotel_id = _resolver_hotel()
+        if hotel_id is False:
+            return jsonify({'ok': False, 'msg': 'X-Hotel-Id inválido'}), 400
+        g.hotel_id = hotel_id
@@ -0,0 +1,45 @@
+from flask import request, current_app, jsonify
+
+
+def etag_de(version, detalle=None):
+    """ETag de la versión; ``detalle`` distingue datos derivados que cambian sin tocar la fila."""
+    return f"v{version}" if detalle is None else f"v{version}.{detalle}"
+
+
+def no_modificado(version, detalle=None):
+    """Devuelve una respuesta 304 si el If-None-Match del cliente coincide con la versión.
+
+    Comparación débil (RFC 7232): las respuestas comprimidas llevan el ETag como W/.
+    """
+    if version is not None and request.if_none_match.contains_weak(etag_de(version, detalle)):
+        resp = current_app.response_class(status=304)
+        resp.set_etag(etag_de(version, detalle))
+        return resp
+    return None
+
+
+def con_etag(response, version, detalle=None):
+    response.set_etag(etag_de(version, detalle))
+    return response
+
+
+def precondicion_fallida(version):
+    """Devuelve una respuesta 412 si el If-Match enviado no es la versión actual.
+
+    Solo cuenta la versión de la fila: un ETag con detalle (p. ej. el de un
+    GET con datos agregados) sigue valiendo para actualizarla. También vale en
+    su forma débil: el ETag identifica la versión de la fila, no los bytes, y
+    el que se recibe de una respuesta comprimida es W/.
+    """
+    if not request.if_match or request.if_match.star_tag:
+        return None
+    versiones = {etag.split('.', 1)[0] for etag in request.if_match.as_set(include_weak=True)}
+    if etag_de(version) not in versiones:
+        return conflicto_version()
+    return None
+
+
+def conflicto_version():
+    resp = jsonify({'ok': False, 'msg': 'El recurso fue modificado por otro usuario'})
+    resp.status_code = 412
+    return resp